@@ -40,15 +40,64 @@
 #############################################################################
 
 import gdb.printing
-from . import core
+import os.path
 
 """Qt5 Pretty Printers for GDB.
 
 The printers are split into submodules, one for each Qt library. Each
 submodule has a "printer" attribute that contains a pretty-printer for
 that library.
+
+The submodules are only imported when they are needed, so that loading
+this package does not slow down debugging programs that do not use Qt.
 """
 
 def register_printers(obj):
-    """Registers all known Qt5 pretty-printers."""
+    """Registers all known Qt5 pretty-printers.
+
+    The qt-* commands are not part of this; see register_commands().
+    """
+    from . import core
     gdb.printing.register_pretty_printer(obj, core.printer)
+    core.connect_events()
+
+def register_commands():
+    """Registers the qt-* commands, which are defined in the commands submodule."""
+    from . import core, commands
+    core.connect_events()
+
+_activated_progspaces = []
+
+def _is_qtcore(filename):
+    return filename is not None and os.path.basename(filename).startswith('libQt5Core.so')
+
+def _activate(objfile):
+    if not _is_qtcore(objfile.filename):
+        return
+    progspace = objfile.progspace
+    if progspace in _activated_progspaces:
+        return
+    _activated_progspaces.append(progspace)
+    from . import core
+    gdb.printing.register_pretty_printer(progspace, core.printer)
+    core.connect_events()
+
+def _on_new_objfile(event):
+    _activate(event.new_objfile)
+
+_on_load_connected = False
+
+def register_printers_on_load():
+    """Registers the Qt5Core pretty-printer once libQt5Core is loaded.
+
+    Unlike register_printers(), nothing is imported or registered until
+    libQt5Core.so.5 appears in a program space, and the printer is then
+    registered once for that program space. Note that this will not
+    detect a statically-linked Qt; use register_printers() for that.
+    """
+    global _on_load_connected
+    for objfile in gdb.objfiles():
+        _activate(objfile)
+    if not _on_load_connected:
+        gdb.events.new_objfile.connect(_on_new_objfile)
+        _on_load_connected = True
@@ -0,0 +1,2981 @@
+#############################################################################
+##
+## Copyright (C) 2026 The qt5printers contributors
+##
+## This file is part of the GDB pretty printers for the Qt Toolkit.
+##
+## It is new code, not taken from the Qt Project, and may be used under the
+## same terms as the rest of this package: the GNU Lesser General Public
+## License version 2.1 (http://www.gnu.org/licenses/old-licenses/lgpl-2.1.html)
+## or the GNU General Public License version 3.0
+## (http://www.gnu.org/copyleft/gpl.html).
+##
+#############################################################################
+
+
+import gdb
+import array
+import csv
+import itertools
+import json
+import math
+import os
+import re
+import signal
+import struct
+import threading
+import time
+import zlib
+from . import core
+from . import settings
+from . import version
+
+"""Qt5 gdb commands
+
+Commands that inspect Qt values in bulk, building on the printers in the
+core module.
+"""
+
+def _parse_and_eval(expression):
+    val = gdb.parse_and_eval(expression)
+    if val.type.code == gdb.TYPE_CODE_REF:
+        val = val.referenced_value()
+    return val
+
+def _printer(val):
+    pp = core.printer.lookup(val)
+    if pp is None:
+        raise gdb.GdbError('{:} is not a supported Qt type'.format(val.type))
+    return pp
+
+class CommandBudget(core.Budget):
+    """Limits the memory read by one command.
+
+    Commands go through whole containers because they were asked to, so
+    the per-value limits of the printers do not apply: there is no time
+    limit (the command can be interrupted), and the bytes read are limited
+    by the "qt5printers command-bytes-limit" setting, unlimited by default.
+    """
+
+    byte_limit_reason = 'qt5printers command-bytes-limit reached'
+
+    def __init__(self):
+        core.Budget.__init__(self)
+        self.deadline = None
+        self.bytes_left = settings.command_bytes_limit.value
+
+def _crc(data):
+    return zlib.crc32(data) & 0xffffffff
+
+def _text_crc(value):
+    return _crc(str(value).encode('utf-8', 'replace'))
+
+class Snapshot:
+    """The state of a container, as recorded by qt-diff.
+
+    For arrays and other sequences, entries is an array of element
+    checksums (and chunks holds a checksum per chunk_size bytes of payload,
+    for arrays of trivially copyable types). For maps, entries maps (text
+    of the key, occurrence of that key) to a checksum of the value, so
+    that the repeated keys of a QMultiMap or QMultiHash are told apart.
+    For sets, entries maps the text of each element to 0.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, expression, kind):
+        self.expression = expression
+        self.kind = kind
+        self.entries = None
+        self.chunks = None
+        self.el_size = 0
+        self.partial = None
+
+def _array_data(pp):
+    """Returns (pointer to elements, size) for a contiguous array, or None."""
+    if isinstance(pp, core.QVectorPrinter):
+        data, size, error = pp.data()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        return (data, size)
+    if isinstance(pp, core.QVarLengthArrayPrinter):
+        error = pp.check()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        return (pp.val['ptr'], int(pp.val['s']))
+    return None
+
+def take_snapshot(expression, previous=None):
+    """Record the state of the container expression evaluates to.
+
+    If previous is a Snapshot of the same container, unchanged chunks of
+    arrays of trivially copyable types reuse its element checksums.
+    """
+    val = _parse_and_eval(expression)
+    pp = _printer(val)
+    budget = CommandBudget()
+    hint = pp.display_hint() if hasattr(pp, 'display_hint') else None
+
+    array_data = _array_data(pp)
+    if array_data is not None:
+        data, size = array_data
+        snapshot = Snapshot(expression, 'array')
+        el_type = data.type.target()
+        if size and core.is_trivially_copyable(el_type) and el_type.sizeof:
+            _snapshot_raw_array(snapshot, int(data), el_type.sizeof, size,
+                    previous, budget)
+        else:
+            snapshot.entries = array.array('L')
+            for i in range(size):
+                if not budget.charge(el_type.sizeof):
+                    snapshot.partial = budget.exhausted
+                    break
+                snapshot.entries.append(_text_crc(data[i]))
+        return snapshot
+
+    if isinstance(pp, core.QListPrinter):
+        snapshot = Snapshot(expression, 'array')
+        snapshot.entries = array.array('L')
+        header, error = pp.header()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        if header['begin'] == header['end']:
+            return snapshot
+        it = core.QListPrinter.Iter(pp.val['d']['array'], header['begin'],
+                header['end'], pp.val.type.strip_typedefs())
+        for index in range(header['begin'], header['end']):
+            if not budget.charge(it.el_type.sizeof):
+                snapshot.partial = budget.exhausted
+                break
+            snapshot.entries.append(_text_crc(it.value(index)))
+        return snapshot
+
+    if isinstance(pp, core.QByteArrayPrinter):
+        d = pp.val['d']
+        header, error = core.check_array_data(d, 1)
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        snapshot = Snapshot(expression, 'array')
+        _snapshot_raw_array(snapshot, int(d) + header['offset'], 1, header['size'],
+                previous, budget)
+        return snapshot
+
+    # The other containers are read element by element with entries(), not
+    # through the children of their printers, which collapse repeated
+    # elements and stop at the printers' own limits.
+    if hint == 'map':
+        snapshot = Snapshot(expression, 'map')
+        snapshot.entries = {}
+        for key, child in _map_items(pp, budget):
+            snapshot.entries[key] = _text_crc(child)
+    elif isinstance(pp, core.QSetPrinter):
+        # the elements of a set are unique, and their order means nothing
+        snapshot = Snapshot(expression, 'set')
+        snapshot.entries = {}
+        for i, child in entries(pp, budget):
+            snapshot.entries[str(child)] = 0
+    else:
+        # any other container (eg: QLinkedList) is compared by index
+        snapshot = Snapshot(expression, 'sequence')
+        snapshot.entries = array.array('L')
+        for i, child in entries(pp, budget):
+            snapshot.entries.append(_text_crc(child))
+    if budget.exhausted:
+        snapshot.partial = budget.exhausted
+    return snapshot
+
+def _map_items(pp, budget):
+    """Yields ((key text, occurrence), value) for the entries of a map."""
+    occurrences = {}
+    for key, value in entries(pp, budget):
+        text = str(key)
+        occurrence = occurrences.get(text, 0)
+        occurrences[text] = occurrence + 1
+        yield ((text, occurrence), value)
+
+def _snapshot_raw_array(snapshot, address, el_size, size, previous, budget):
+    snapshot.el_size = el_size
+    snapshot.entries = array.array('L')
+    snapshot.chunks = array.array('L')
+    per_chunk = max(1, Snapshot.chunk_size // el_size)
+    reuse = (previous is not None and previous.chunks is not None and
+            previous.el_size == el_size)
+    for chunk, start in enumerate(range(0, size, per_chunk)):
+        count = min(per_chunk, size - start)
+        if not budget.charge(count * el_size):
+            snapshot.partial = budget.exhausted
+            return
+        data = core.read_memory(address + start * el_size, count * el_size)
+        checksum = _crc(data)
+        snapshot.chunks.append(checksum)
+        if (reuse and chunk < len(previous.chunks) and
+                previous.chunks[chunk] == checksum and
+                start + count <= len(previous.entries)):
+            # unchanged chunk: no need to look at the elements
+            snapshot.entries.extend(previous.entries[start:start + count])
+            continue
+        for offset in range(0, count * el_size, el_size):
+            snapshot.entries.append(_crc(data[offset:offset + el_size]))
+
+def diff_snapshots(old, new):
+    """Returns (added, removed, changed) keys or indices between two snapshots."""
+    if old.kind != new.kind:
+        raise gdb.GdbError('the container changed type since the snapshot')
+    if new.kind in ('array', 'sequence'):
+        common = min(len(old.entries), len(new.entries))
+        changed = [i for i in range(common) if old.entries[i] != new.entries[i]]
+        added = list(range(common, len(new.entries)))
+        removed = list(range(common, len(old.entries)))
+        return (added, removed, changed)
+    added = [k for k in new.entries if k not in old.entries]
+    removed = [k for k in old.entries if k not in new.entries]
+    changed = [k for k in new.entries
+            if k in old.entries and old.entries[k] != new.entries[k]]
+    return (added, removed, changed)
+
+def _limit():
+    """The number of differences to list, following "print elements"."""
+    limit = gdb.parameter('print elements')
+    if limit is None or limit <= 0:
+        return None
+    return limit
+
+class _QtDiffPrefix(gdb.Command):
+    """Compare Qt containers between two stops.
+
+Usage: qt-diff save NAME EXPRESSION
+       qt-diff show NAME
+       qt-diff list
+       qt-diff delete NAME
+
+"qt-diff save" records a snapshot of the container EXPRESSION evaluates
+to. "qt-diff show" evaluates the same expression again and lists the
+entries that were added, removed or changed since the snapshot, then
+makes the current state the new snapshot.
+
+Arrays and other sequences (QVector, QList, QLinkedList, ...) are compared
+by index, maps and hashes by key (telling repeated keys apart by their
+order), and sets by element. Elements are
+compared by checksums, so the snapshot does not keep a copy of the data."""
+
+    def __init__(self):
+        super(_QtDiffPrefix, self).__init__('qt-diff', gdb.COMMAND_DATA,
+                gdb.COMPLETE_NONE, True)
+
+class _QtDiffSave(gdb.Command):
+    """Record a snapshot of a Qt container.
+
+Usage: qt-diff save NAME EXPRESSION"""
+
+    def __init__(self):
+        super(_QtDiffSave, self).__init__('qt-diff save', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        parts = arg.split(None, 1)
+        if len(parts) != 2:
+            raise gdb.GdbError('usage: qt-diff save NAME EXPRESSION')
+        name, expression = parts
+        snapshot = take_snapshot(expression)
+        snapshots[name] = snapshot
+        gdb.write('Saved {:} entries of {:} as "{:}".\n'.format(
+            len(snapshot.entries), expression, name))
+        if snapshot.partial:
+            gdb.write('warning: the snapshot is incomplete ({:})\n'.format(snapshot.partial))
+
+class _QtDiffShow(gdb.Command):
+    """List the changes to a Qt container since its snapshot.
+
+Usage: qt-diff show NAME"""
+
+    def __init__(self):
+        super(_QtDiffShow, self).__init__('qt-diff show', gdb.COMMAND_DATA,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        name = arg.strip()
+        if name not in snapshots:
+            raise gdb.GdbError('no snapshot named "{:}"'.format(name))
+        old = snapshots[name]
+        new = take_snapshot(old.expression, old)
+        added, removed, changed = diff_snapshots(old, new)
+        snapshots[name] = new
+
+        gdb.write('{:}: {:d} added, {:d} removed, {:d} changed ({:d} entries)\n'.format(
+            old.expression, len(added), len(removed), len(changed), len(new.entries)))
+        if old.partial or new.partial:
+            gdb.write('warning: a snapshot is incomplete ({:})\n'.format(
+                new.partial or old.partial))
+        if not (added or removed or changed):
+            return
+
+        if new.kind == 'array':
+            values = _parse_and_eval(old.expression)
+            value = lambda i: _element(values, i)
+        elif new.kind == 'sequence':
+            value = _sequence_values(old.expression, set(added) | set(changed)).get
+        elif new.kind == 'map':
+            value = _map_values(old.expression, set(added) | set(changed)).get
+        else:
+            value = None
+        lines = ([('added', k) for k in added] + [('removed', k) for k in removed] +
+                [('changed', k) for k in changed])
+        limit = _limit()
+        for what, key in lines[:limit]:
+            if new.kind in ('array', 'sequence'):
+                key_text = '[{:d}]'.format(key)
+            elif new.kind == 'map':
+                text, occurrence = key
+                key_text = '[{:}]'.format(text)
+                if occurrence:
+                    key_text += ' (#{:d})'.format(occurrence + 1)
+            else:
+                key_text = '[{:}]'.format(key)
+            if what != 'removed' and value is not None:
+                gdb.write('  {:} {:} = {:}\n'.format(what, key_text, value(key)))
+            else:
+                gdb.write('  {:} {:}\n'.format(what, key_text))
+        if limit is not None and len(lines) > limit:
+            gdb.write('  ... {:d} more\n'.format(len(lines) - limit))
+
+class _QtDiffList(gdb.Command):
+    """List the qt-diff snapshots.
+
+Usage: qt-diff list"""
+
+    def __init__(self):
+        super(_QtDiffList, self).__init__('qt-diff list', gdb.COMMAND_DATA,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        if not snapshots:
+            gdb.write('No snapshots.\n')
+        for name in sorted(snapshots):
+            snapshot = snapshots[name]
+            gdb.write('{:}: {:} ({:d} entries{:})\n'.format(name, snapshot.expression,
+                len(snapshot.entries), ', incomplete' if snapshot.partial else ''))
+
+class _QtDiffDelete(gdb.Command):
+    """Delete a qt-diff snapshot.
+
+Usage: qt-diff delete NAME"""
+
+    def __init__(self):
+        super(_QtDiffDelete, self).__init__('qt-diff delete', gdb.COMMAND_DATA,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        name = arg.strip()
+        if name not in snapshots:
+            raise gdb.GdbError('no snapshot named "{:}"'.format(name))
+        del snapshots[name]
+
+def _map_values(expression, keys):
+    """Returns the values of the given (key text, occurrence) keys of a map."""
+    pp = _printer(_parse_and_eval(expression))
+    return dict((key, child) for key, child in _map_items(pp, CommandBudget())
+            if key in keys)
+
+def _sequence_values(expression, indices):
+    """Returns the elements at the given indices of a container."""
+    pp = _printer(_parse_and_eval(expression))
+    values = {}
+    last = max(indices) if indices else -1
+    for i, child in entries(pp, CommandBudget()):
+        if i > last:
+            break
+        if i in indices:
+            values[i] = child
+    return values
+
+def _element(val, index):
+    """Returns element index of the array-like container val."""
+    pp = _printer(val)
+    array_data = _array_data(pp)
+    if array_data is not None:
+        return array_data[0][index]
+    header, error = pp.header()
+    it = core.QListPrinter.Iter(pp.val['d']['array'], header['begin'],
+            header['end'], pp.val.type.strip_typedefs())
+    return it.value(header['begin'] + index)
+
+snapshots = {}
+"""The qt-diff snapshots, by name."""
+
+_QtDiffPrefix()
+_QtDiffSave()
+_QtDiffShow()
+_QtDiffList()
+_QtDiffDelete()
+
+def _read_vptr(address):
+    """Reads the vtable pointer of the object at address."""
+    return core.unpack_pointers(core.read_memory(address, core.target_abi()[1]))[0]
+
+def _array_data_el_size(typ):
+    """Returns the element size if typ is just a pointer to a QArrayData, or None.
+
+    Values of these types (QString, QByteArray and QVector of trivially
+    copyable types) own nothing but their QArrayData block, so they can be
+    measured from the block headers alone.
+    """
+    typ = typ.strip_typedefs().unqualified()
+    name = typ.tag or typ.name
+    if name == 'QString':
+        return 2
+    if name == 'QByteArray':
+        return 1
+    if name and (name.startswith('QVector<') or name.startswith('QStack<')):
+        el_type = typ.template_argument(0)
+        if core.is_trivially_copyable(el_type):
+            return el_type.sizeof
+    return None
+
+def _has_printer(typ):
+    typ = typ.strip_typedefs()
+    name = typ.tag or typ.name
+    return bool(name) and name.startswith('Q')
+
+class Footprint:
+    """Measures the heap memory owned by Qt values.
+
+    Every heap block is recorded by address, so that implicitly shared
+    blocks are only counted once. used is the number of bytes in use,
+    slack the number of bytes allocated but not in use (spare capacity),
+    and shared the part of both that is in blocks with a reference count
+    above one.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.seen = set()
+        self.blocks = 0
+        self.used = 0
+        self.slack = 0
+        self.shared = 0
+        self.by_type = {}
+        self.uncounted = set()
+
+    def block(self, address, used, slack, typename, ref=1):
+        """Records a heap block; returns False if it was already counted."""
+        if address in self.seen:
+            return False
+        self.seen.add(address)
+        self.blocks += 1
+        self.used += used
+        self.slack += slack
+        if ref > 1:
+            self.shared += used + slack
+        self.by_type[typename] = self.by_type.get(typename, 0) + used + slack
+        return True
+
+    def array_blocks(self, addresses, el_size, typename):
+        """Records the QArrayData blocks at the given addresses.
+
+        The headers are fetched in bulk. Returns the (address, header) pairs
+        of the blocks that had not been counted yet.
+        """
+        layout = core.qarraydata_layout
+        addresses = [a for a in addresses if a and a not in self.seen]
+        reader = core.PageReader(self.budget)
+        reader.prefetch(addresses, layout.sizeof())
+        result = []
+        for address in addresses:
+            data = reader.read(address, layout.sizeof())
+            if data is None:
+                self.budget.fail('unreadable data')
+                continue
+            header = layout.unpack(data)
+            alloc = header['alloc'] & 0x7fffffff
+            # static data (such as the shared null) is not on the heap
+            if header['ref'] == -1 or alloc == 0 or header['size'] > alloc:
+                continue
+            if self.block(address, header['offset'] + header['size'] * el_size,
+                    (alloc - header['size']) * el_size, typename, header['ref']):
+                result.append((address, header))
+        return result
+
+    def add_elements(self, values, el_type):
+        """Records the heap memory owned by the values (gdb.Values of el_type)."""
+        if not _has_printer(el_type):
+            return
+        for value in values:
+            if not self.budget.charge(el_type.sizeof):
+                return
+            self.add(value)
+
+    def add_array_elements(self, address, count, el_type):
+        """Records the heap memory owned by count values of el_type at address."""
+        el_size = _array_data_el_size(el_type)
+        if el_size is not None and el_type.sizeof == core.target_abi()[1]:
+            if not self.budget.charge(count * el_type.sizeof):
+                return
+            pointers = core.unpack_pointers(core.read_memory(address, count * el_type.sizeof))
+            self.array_blocks(pointers, el_size, str(el_type.strip_typedefs()))
+            return
+        array = gdb.Value(address).cast(el_type.pointer())
+        self.add_elements((array[i] for i in range(count)), el_type)
+
+    def add(self, val):
+        """Records the heap memory owned by val."""
+        pp = core.printer.lookup(val)
+        if pp is None:
+            return
+        typename = str(val.type.strip_typedefs().unqualified())
+        el_size = _array_data_el_size(val.type)
+        if el_size is not None:
+            self.array_blocks([int(val['d'])], el_size, typename)
+        elif isinstance(pp, core.QVectorPrinter):
+            el_type = val.type.strip_typedefs().template_argument(0)
+            for address, header in self.array_blocks([int(val['d'])], el_type.sizeof, typename):
+                self.add_array_elements(address + header['offset'], header['size'], el_type)
+        elif isinstance(pp, core.QVarLengthArrayPrinter):
+            el_type = val['ptr'].type.target()
+            size = int(val['s'])
+            ptr = int(val['ptr'])
+            if ptr != int(val['array'].address):
+                alloc = int(val['a'])
+                self.block(ptr, size * el_type.sizeof, (alloc - size) * el_type.sizeof, typename)
+            self.add_array_elements(ptr, size, el_type)
+        elif isinstance(pp, core.QBitArrayPrinter):
+            self.add(val['d'])
+        elif isinstance(pp, core.QListPrinter):
+            self.add_list(pp, typename)
+        elif isinstance(pp, core.QHashPrinter):
+            self.add_hash(pp, typename)
+        elif isinstance(pp, core.QSetPrinter):
+            self.add_hash(core.QHashPrinter(val['q_hash']), typename)
+        elif isinstance(pp, core.QMapPrinter):
+            self.add_map(pp, typename)
+        elif isinstance(pp, core.QLinkedListPrinter):
+            self.add_linked_list(pp, typename)
+        elif isinstance(pp, core.QVariantPrinter):
+            self.add_variant(pp, typename)
+        elif hasattr(pp, 'children'):
+            self.uncounted.add(typename)
+
+    def add_list(self, pp, typename):
+        header, error = pp.header()
+        d = int(pp.val['d'])
+        if error:
+            self.budget.fail(error)
+            return
+        if header['ref'] == -1 or header['alloc'] == 0:
+            return
+        ptr_size = core.target_abi()[1]
+        array_offset = pp._d_layout.offsetof('array')
+        count = header['end'] - header['begin']
+        if not self.block(d, array_offset + count * ptr_size,
+                (header['alloc'] - count) * ptr_size, typename, header['ref']):
+            return
+        if not count:
+            return
+        it = core.QListPrinter.Iter(pp.val['d']['array'], header['begin'],
+                header['end'], pp.val.type.strip_typedefs())
+        el_type = it.el_type
+        slots = array_offset + header['begin'] * ptr_size + d
+        if not it.is_pointer:
+            if el_type.sizeof == ptr_size:
+                self.add_array_elements(slots, count, el_type)
+            else:
+                self.add_elements((it.value(i) for i in
+                    range(header['begin'], header['end'])), el_type)
+            return
+        # each element is in a heap node of its own
+        if not self.budget.charge(count * ptr_size):
+            return
+        nodes = core.unpack_pointers(core.read_memory(slots, count * ptr_size))
+        el_name = str(el_type.strip_typedefs())
+        for node in nodes:
+            self.block(node, el_type.sizeof, 0, el_name)
+        self.add_elements((gdb.Value(node).cast(el_type.pointer()).dereference()
+            for node in nodes), el_type)
+
+    def add_hash(self, pp, typename):
+        """Records a QHash: its QHashData, bucket array and nodes.
+
+        The bucket array holds numBuckets pointers. A bucket that points
+        back at the QHashData (Qt's end marker) is empty, and counts as
+        slack; the others are in use. Every node is a heap block of
+        nodeSize bytes, as QHashData::allocateNode allocates them.
+        """
+        header, error = pp.header()
+        if error:
+            self.budget.fail(error)
+            return
+        d = int(pp.val['d'])
+        if header['ref'] == -1 or not self.block(d, pp._d_layout.sizeof(), 0,
+                typename, header['ref']):
+            return
+        ptr_size = core.target_abi()[1]
+        size = header['size']
+        num_buckets = header['numBuckets']
+        if num_buckets and header['buckets'] not in self.seen:
+            if not self.budget.charge(num_buckets * ptr_size):
+                return
+            buckets = core.unpack_pointers(core.read_memory(header['buckets'],
+                num_buckets * ptr_size))
+            empty = sum(1 for bucket in buckets if bucket == d)
+            self.block(header['buckets'], (num_buckets - empty) * ptr_size,
+                    empty * ptr_size, typename, header['ref'])
+        self.used += size * header['nodeSize']
+        self.blocks += size
+        self.by_type[typename] += size * header['nodeSize']
+        hash_type = pp.val.type.strip_typedefs()
+        key_type = hash_type.template_argument(0)
+        value_type = hash_type.template_argument(1)
+        if size and (_has_printer(key_type) or _has_printer(value_type)):
+            for name, value in pp.iterator(self.budget):
+                if not self.budget.charge(value.type.sizeof):
+                    return
+                self.add(value)
+
+    def add_map(self, pp, typename):
+        d = pp.val['d']
+        header, error = core.read_header(d, pp._d_layout)
+        if error:
+            self.budget.fail(error)
+            return
+        if header['ref'] == -1 or not self.block(int(d),
+                _map_data_size(), 0, typename, header['ref']):
+            return
+        size = header['size']
+        map_type = pp.val.type.strip_typedefs()
+        key_type = map_type.template_argument(0)
+        value_type = map_type.template_argument(1)
+        node_size = pp.node_type().sizeof
+        self.used += size * node_size
+        self.blocks += size
+        self.by_type[typename] += size * node_size
+        if size and (_has_printer(key_type) or _has_printer(value_type)):
+            for name, value in pp.iterator(self.budget):
+                if not self.budget.charge(value.type.sizeof):
+                    return
+                self.add(value)
+
+    def add_linked_list(self, pp, typename):
+        d = pp.val['d']
+        header, error = core.read_header(d, pp._d_layout)
+        if error:
+            self.budget.fail(error)
+            return
+        if header['ref'] == -1 or not self.block(int(d), pp._d_layout.sizeof(), 0,
+                typename, header['ref']):
+            return
+        size = header['size']
+        node_type = pp.val['e'].type.target()
+        self.used += size * node_type.sizeof
+        self.blocks += size
+        self.by_type[typename] += size * node_type.sizeof
+        el_type = pp.val.type.strip_typedefs().template_argument(0)
+        if size and _has_printer(el_type):
+            self.add_elements((value for name, value in
+                core.QLinkedListPrinter.Iter(pp.val['e'], size, self.budget)), el_type)
+
+    def add_variant(self, pp, typename):
+        value = pp.to_string()
+        if not isinstance(value, gdb.Value) or value.address is None:
+            return
+        d = pp.val['d']
+        if int(d['is_shared']):
+            shared = d['data']['shared']
+            self.block(int(shared), shared.type.target().sizeof, 0, typename)
+            self.block(int(value.address), value.type.sizeof, 0,
+                    str(value.type.strip_typedefs()))
+        self.add(value)
+
+def _map_data_size():
+    """Returns sizeof(QMapDataBase), from the debug info if it has the type."""
+    try:
+        return gdb.lookup_type('QMapDataBase').sizeof
+    except gdb.error:
+        # ref and size, then the header node and mostLeftNode, pointer aligned
+        ptr_size = core.target_abi()[1]
+        counts = -(-core.QMapPrinter._d_layout.sizeof() // ptr_size) * ptr_size
+        return counts + core.QMapPrinter._node_layout.sizeof() + ptr_size
+
+def _format_bytes(n):
+    for unit in ('bytes', 'KiB', 'MiB'):
+        if n < 1024 * 10:
+            return '{:d} {:}'.format(n, unit)
+        n //= 1024
+    return '{:d} GiB'.format(n)
+
+class _QtSizeof(gdb.Command):
+    """Show the heap memory used by a Qt value.
+
+Usage: qt-sizeof EXPRESSION
+
+Adds up the heap blocks owned by the value, recursing into the elements
+of containers: the QArrayData of QString, QByteArray and QVector (header
+plus capacity), the pointer array and the indirectly stored nodes of
+QList, the buckets and nodes of QHash and QSet, and the nodes of QMap and
+QLinkedList. Implicitly shared blocks are only counted once. The slack is
+memory that is allocated but not in use, such as spare capacity."""
+
+    def __init__(self):
+        super(_QtSizeof, self).__init__('qt-sizeof', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        val = _parse_and_eval(arg)
+        _printer(val)
+        footprint = Footprint(CommandBudget())
+        footprint.add(val)
+
+        gdb.write('{:}: {:} on the heap in {:d} blocks (plus {:d} bytes inline)\n'.format(
+            val.type, _format_bytes(footprint.used + footprint.slack),
+            footprint.blocks, val.type.sizeof))
+        gdb.write('  used {:}, slack {:}\n'.format(_format_bytes(footprint.used),
+            _format_bytes(footprint.slack)))
+        if footprint.shared:
+            gdb.write('  in blocks shared with other values: {:}\n'.format(
+                _format_bytes(footprint.shared)))
+        for typename, size in sorted(footprint.by_type.items(), key=lambda item: -item[1]):
+            gdb.write('  {:}: {:}\n'.format(typename, _format_bytes(size)))
+        for typename in sorted(footprint.uncounted):
+            gdb.write('  not counted: {:}\n'.format(typename))
+        if footprint.budget.exhausted:
+            gdb.write('warning: the total is incomplete ({:})\n'.format(
+                footprint.budget.exhausted))
+
+_QtSizeof()
+
+def entries(pp, budget):
+    """Yields the entries of a container as (key, value) pairs of gdb.Values.
+
+    For containers other than maps and hashes, key is the index of the
+    element (an int). The traversal is the one the printer itself uses.
+    The elements of QString and QByteArray sequences are StringSlots.
+    """
+    array_data = _array_data(pp)
+    if array_data is not None:
+        data, size = array_data
+        el_type = data.type.target()
+        if _string_el_size(el_type):
+            for item in _string_slots(int(data), size, el_type, budget):
+                yield item
+        else:
+            for i in range(size):
+                yield (i, data[i])
+    elif isinstance(pp, core.QListPrinter):
+        header, error = pp.header()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        if header['begin'] == header['end']:
+            return
+        typ = pp.val.type.strip_typedefs()
+        el_type = gdb.lookup_type('QString') if typ.name == 'QStringList' else \
+                typ.template_argument(0)
+        if _string_el_size(el_type):
+            # QString and QByteArray are movable and pointer-sized, so
+            # QList stores them in its slots
+            array = int(pp.val['d']) + core.QListPrinter._d_layout.offsetof('array')
+            first = array + header['begin'] * core.target_abi()[1]
+            for item in _string_slots(first, header['end'] - header['begin'],
+                    el_type, budget):
+                yield item
+            return
+        it = core.QListPrinter.Iter(pp.val['d']['array'], header['begin'],
+                header['end'], typ)
+        for i in range(header['end'] - header['begin']):
+            yield (i, it.value(header['begin'] + i))
+    elif isinstance(pp, core.QLinkedListPrinter):
+        header, error = core.read_header(pp.val['d'], pp._d_layout)
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        if header['size']:
+            for name, value in core.QLinkedListPrinter.Iter(pp.val['e'],
+                    header['size'], budget):
+                yield (int(name), value)
+    elif isinstance(pp, core.QSetPrinter):
+        it = core.QHashPrinter(pp.val['q_hash']).iterator(budget)
+        if it is not None:
+            for i, (name, value) in enumerate(itertools.islice(it, 0, None, 2)):
+                yield (i, value)
+    elif isinstance(pp, (core.QHashPrinter, core.QMapPrinter)):
+        it = pp.iterator(budget)
+        if it is not None:
+            for item in _pairs(it):
+                yield item
+    elif isinstance(pp, core.QCachePrinter):
+        header, error = pp.header()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        if header['size']:
+            for item in _pairs(core.QCachePrinter.Iter(pp.val, header, budget)):
+                yield item
+    elif isinstance(pp, core.QContiguousCachePrinter):
+        header, error = pp.header()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        if header['count']:
+            it = core.QContiguousCachePrinter.Iter(pp.data(), header, header['count'],
+                    budget)
+            for item in _pairs(it):
+                yield item
+    elif isinstance(pp, (core.QJsonObjectPrinter, core.QJsonArrayPrinter)):
+        for item in entries(pp.printer, budget):
+            yield item
+    else:
+        raise gdb.GdbError('{:} is not a container'.format(pp.val.type))
+
+def _pairs(it):
+    """Yields (key, value) from a printer iterator of alternating children."""
+    while True:
+        try:
+            key_name, key = next(it)
+            value_name, value = next(it)
+        except StopIteration:
+            return
+        yield (key, value)
+
+_string_codecs = {
+    'QString': 2,
+    'QByteArray': 1,
+}
+
+def _string_el_size(typ):
+    """Returns the size of a character if typ is QString or QByteArray, else None."""
+    typ = typ.strip_typedefs().unqualified()
+    return _string_codecs.get(typ.tag or typ.name)
+
+class StringSlot:
+    """An element of a QString or QByteArray sequence (see entries()).
+
+    d is the address of its QArrayData, read in bulk with those of the
+    other elements; the gdb.Value of the element is only made when it is
+    printed.
+    """
+
+    def __init__(self, address, d, el_type):
+        self.address = address
+        self.d = d
+        self.el_type = el_type
+
+    def value(self):
+        return gdb.Value(self.address).cast(self.el_type.pointer()).dereference()
+
+    def __str__(self):
+        return str(self.value())
+
+def _string_slots(address, size, el_type, budget):
+    """Yields (index, StringSlot) for the size d-pointers at address.
+
+    The d-pointers are fetched with one read, cut short if the budget does
+    not allow reading all of them.
+    """
+    ptr_size = core.target_abi()[1]
+    count = budget.clamp(size * ptr_size) // ptr_size
+    if not count:
+        return
+    ds = core.unpack_pointers(core.read_memory(address, count * ptr_size))
+    for i, d in enumerate(ds):
+        yield (i, StringSlot(address + i * ptr_size, d, el_type))
+
+class StringDecoder:
+    """Decodes many QString and QByteArray values with few memory reads.
+
+    The QArrayData headers of a batch of strings are fetched together, then
+    their payloads, with the reads of neighbouring strings merged by a
+    RangeReader. Other values are converted to text by their printers.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+
+    def decode(self, values):
+        """Returns the text of each of the values (None if unreadable)."""
+        texts = [None] * len(values)
+        strings = []
+        for i, value in enumerate(values):
+            if isinstance(value, StringSlot):
+                strings.append((i, value.d, _string_el_size(value.el_type)))
+                continue
+            if isinstance(value, str):
+                # already text, such as the values of a QCache with costs
+                texts[i] = value
+                continue
+            typ = value.type.strip_typedefs().unqualified()
+            name = typ.tag or typ.name
+            if name in _string_codecs:
+                strings.append((i, int(value['d']), _string_codecs[name]))
+            elif name == 'QLatin1String':
+                size = int(value['m_size'])
+                if size >= 0:
+                    strings.append((i, (int(value['m_data']), size), 1))
+            else:
+                texts[i] = str(value)
+        if strings:
+            self._decode_array_data(strings, texts)
+        return texts
+
+    def _decode_array_data(self, strings, texts):
+        layout = core.qarraydata_layout
+        reader = core.RangeReader(self.budget)
+        arrays = [(i, d, el_size) for i, d, el_size in strings
+                if d and not isinstance(d, tuple)]
+        headers = reader.read_ranges((d, layout.sizeof()) for i, d, el_size in arrays)
+        # QLatin1Strings are (data pointer, size)
+        payloads = [(i, d[0], d[1], el_size) for i, d, el_size in strings
+                if isinstance(d, tuple)]
+        for (i, d, el_size), data in zip(arrays, headers):
+            if data is None:
+                continue
+            header = layout.unpack(data)
+            alloc = header['alloc'] & 0x7fffffff
+            if header['size'] < 0 or (alloc and header['size'] > alloc):
+                continue
+            payloads.append((i, d + header['offset'], header['size'] * el_size, el_size))
+        ranges = [(address, length) for i, address, length, el_size in payloads if length]
+        datas = iter(reader.read_ranges(ranges))
+        utf16 = core.utf16()
+        for i, address, length, el_size in payloads:
+            data = next(datas) if length else b''
+            if data is None:
+                continue
+            if el_size == 2:
+                texts[i] = data.decode(utf16, 'replace')
+            else:
+                texts[i] = data.decode('utf-8', 'replace')
+
+def _split_word(text):
+    """Splits the first word (which may be quoted) off text."""
+    text = text.strip()
+    if text[:1] in ('"', "'"):
+        end = text.find(text[0], 1)
+        if end > 0:
+            return (text[1:end], text[end + 1:].strip())
+    parts = text.split(None, 1)
+    if not parts:
+        return ('', '')
+    return (parts[0], parts[1] if len(parts) > 1 else '')
+
+class _QtGrep(gdb.Command):
+    """Search the strings in a Qt container.
+
+Usage: qt-grep [-max N] [-i] [--] REGEX EXPRESSION
+
+Prints the elements of the container EXPRESSION evaluates to whose text
+matches the Python regular expression REGEX, or for maps and hashes, the
+entries whose key or value matches. QString, QByteArray and QLatin1String
+elements are decoded in bulk; other elements are matched against their
+printed form. Stops after N matches (20 by default); -i ignores case."""
+
+    batch_size = 4096
+
+    def __init__(self):
+        super(_QtGrep, self).__init__('qt-grep', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        max_hits = 20
+        flags = 0
+        option, rest = _split_word(arg)
+        while option.startswith('-'):
+            if option == '--':
+                option, rest = _split_word(rest)
+                break
+            if option == '-i':
+                flags |= re.IGNORECASE
+            elif option == '-max':
+                count, rest = _split_word(rest)
+                try:
+                    max_hits = int(count)
+                except ValueError:
+                    raise gdb.GdbError('qt-grep: -max needs a number')
+            else:
+                raise gdb.GdbError('qt-grep: unknown option ' + option)
+            option, rest = _split_word(rest)
+        regex, expression = option, rest
+        if not regex or not expression:
+            raise gdb.GdbError('usage: qt-grep [-max N] [-i] REGEX EXPRESSION')
+        try:
+            pattern = re.compile(regex, flags)
+        except re.error as e:
+            raise gdb.GdbError('qt-grep: bad regular expression: {:}'.format(e))
+
+        val = _parse_and_eval(expression)
+        pp = _printer(val)
+        is_map = isinstance(pp, (core.QHashPrinter, core.QMapPrinter))
+        budget = CommandBudget()
+        decoder = StringDecoder(budget)
+        hits = 0
+        more = False
+        it = entries(pp, budget)
+        # charging nothing still checks the time limit
+        while not more and budget.charge(0):
+            batch = list(itertools.islice(it, self.batch_size))
+            if not batch:
+                break
+            values = decoder.decode([value for key, value in batch])
+            if is_map:
+                keys = decoder.decode([key for key, value in batch])
+            for n, (key, value) in enumerate(batch):
+                if is_map:
+                    matched = ((keys[n] is not None and pattern.search(keys[n])) or
+                            (values[n] is not None and pattern.search(values[n])))
+                else:
+                    matched = values[n] is not None and pattern.search(values[n])
+                if not matched:
+                    continue
+                if hits >= max_hits:
+                    # only say the search stopped if there was more to find
+                    more = True
+                    gdb.write('(stopped after {:d} matches)\n'.format(hits))
+                    break
+                if is_map:
+                    gdb.write('[{:}] = {:}\n'.format(key, value))
+                else:
+                    gdb.write('[{:d}] = {:}\n'.format(key, value))
+                hits += 1
+        if budget.exhausted:
+            gdb.write('warning: not all elements were searched ({:})\n'.format(
+                budget.exhausted))
+        elif hits == 0:
+            gdb.write('No matches.\n')
+
+_QtGrep()
+
+_numpy_module = []
+
+def _numpy():
+    """Returns the numpy module, or None if it is not installed."""
+    if not _numpy_module:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_module.append(numpy)
+    return _numpy_module[0]
+
+def _numeric_format(typ):
+    """Returns the struct format character for a numeric gdb type, or None."""
+    typ = typ.strip_typedefs()
+    if typ.code == gdb.TYPE_CODE_FLT:
+        return {4: 'f', 8: 'd'}.get(typ.sizeof)
+    if typ.code not in (gdb.TYPE_CODE_INT, gdb.TYPE_CODE_CHAR,
+            gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_ENUM):
+        return None
+    code = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}.get(typ.sizeof)
+    if code is None:
+        return None
+    is_signed = getattr(typ, 'is_signed', None)
+    if is_signed is None:
+        is_signed = typ.code != gdb.TYPE_CODE_BOOL and 'unsigned' not in str(typ)
+    return code if is_signed else code.upper()
+
+class NumericArray:
+    """The elements of a container of numbers, read in fixed-size chunks.
+
+    Elements are either stored contiguously (QVector, QVarLengthArray), in
+    the pointer-sized slots of a QList, or in nodes that the slots of a
+    QList point to.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, address, count, el_type, stride=None, indirect=False,
+            code=None):
+        self.address = address
+        self.count = count
+        self.el_size = el_type.sizeof
+        self.code = code or _numeric_format(el_type)
+        self.stride = stride or self.el_size
+        self.indirect = indirect
+
+    def chunks(self, budget):
+        """Yields the elements as (bytes, stride) chunks."""
+        per_chunk = max(1, self.chunk_size // self.stride)
+        for start in range(0, self.count, per_chunk):
+            count = min(per_chunk, self.count - start)
+            if not budget.charge(count * self.stride):
+                return
+            data = core.read_memory(self.address + start * self.stride, count * self.stride)
+            if not self.indirect:
+                yield (data, self.stride)
+                continue
+            reader = core.PageReader(budget)
+            nodes = core.unpack_pointers(data)
+            reader.prefetch(nodes, self.el_size)
+            values = [reader.read(node, self.el_size) for node in nodes]
+            if None in values:
+                budget.fail('unreadable nodes')
+                return
+            yield (b''.join(values), self.el_size)
+
+    def decode(self, data, stride):
+        """Decodes a chunk, as a numpy array if numpy is available."""
+        byteorder = core.target_abi()[0]
+        count = len(data) // stride
+        np = _numpy()
+        if np is not None:
+            dtype = np.dtype(byteorder + self.code)
+            return np.ndarray((count,), dtype, data, 0, (stride,))
+        padding = '{:d}x'.format(stride - self.el_size) if stride > self.el_size else ''
+        if not padding:
+            return struct.unpack('{:}{:d}{:}'.format(byteorder, count, self.code), data)
+        return struct.unpack(byteorder + (self.code + padding) * count, data)
+
+def _element_array(pp):
+    """Locates the elements of an array-like container.
+
+    Returns a tuple of (address, count, element type, stride, indirect), the
+    arguments of NumericArray, or None if pp is not an array-like container.
+    """
+    array_data = _array_data(pp)
+    if array_data is not None:
+        data, size = array_data
+        return (int(data), size, data.type.target(), None, False)
+    if isinstance(pp, core.QListPrinter):
+        header, error = pp.header()
+        if error:
+            raise gdb.GdbError(core.corrupted(error))
+        it = core.QListPrinter.Iter(pp.val['d']['array'], header['begin'],
+                header['end'], pp.val.type.strip_typedefs())
+        ptr_size = core.target_abi()[1]
+        slots = (int(pp.val['d']) + pp._d_layout.offsetof('array') +
+                header['begin'] * ptr_size)
+        return (slots, header['end'] - header['begin'], it.el_type, ptr_size,
+                it.is_pointer)
+    return None
+
+def numeric_array(pp):
+    """Returns a NumericArray for a container of numbers, or None."""
+    elements = _element_array(pp)
+    if elements is None or _numeric_format(elements[2]) is None:
+        return None
+    return NumericArray(*elements)
+
+class Statistics:
+    """Count, range, mean, standard deviation and histogram of numbers.
+
+    Chunks of numbers are added one at a time, and combined with the
+    parallel variance algorithm of Chan et al. NaNs and infinities are
+    counted, but otherwise left out.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.nans = 0
+        self.infs = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _combine(self, count, low, high, mean, m2):
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def add(self, values):
+        np = _numpy()
+        if np is not None and hasattr(values, 'dtype'):
+            if values.dtype.kind == 'f':
+                finite = np.isfinite(values)
+                nans = int(np.isnan(values).sum())
+                self.nans += nans
+                self.infs += len(values) - int(finite.sum()) - nans
+                values = values[finite]
+            if len(values):
+                values = values.astype(np.float64)
+                mean = float(values.mean())
+                self._combine(len(values), float(values.min()), float(values.max()),
+                        mean, float(((values - mean) ** 2).sum()))
+            return
+        finite = []
+        for value in values:
+            if isinstance(value, float):
+                if math.isnan(value):
+                    self.nans += 1
+                    continue
+                if math.isinf(value):
+                    self.infs += 1
+                    continue
+            finite.append(value)
+        if finite:
+            mean = float(sum(finite)) / len(finite)
+            m2 = sum((value - mean) ** 2 for value in finite)
+            self._combine(len(finite), min(finite), max(finite), mean, m2)
+
+    def stddev(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+class Histogram:
+    """Counts numbers in equal-width bins between low and high."""
+
+    def __init__(self, low, high, bins):
+        self.low = low
+        self.high = high
+        self.counts = [0] * bins
+
+    def add(self, values):
+        bins = len(self.counts)
+        width = float(self.high - self.low) / bins
+        np = _numpy()
+        if np is not None and hasattr(values, 'dtype'):
+            values = values.astype(np.float64)
+            values = values[np.isfinite(values)]
+            if width:
+                indices = ((values - self.low) / width).astype(np.int64)
+                indices = np.clip(indices, 0, bins - 1)
+            else:
+                indices = np.zeros(len(values), np.int64)
+            for i, count in enumerate(np.bincount(indices, minlength=bins)):
+                self.counts[i] += int(count)
+            return
+        for value in values:
+            if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+                continue
+            i = int((value - self.low) / width) if width else 0
+            self.counts[min(max(i, 0), bins - 1)] += 1
+
+class _QtStats(gdb.Command):
+    """Show statistics of a Qt container of numbers.
+
+Usage: qt-stats [-bins N] EXPRESSION
+
+EXPRESSION must be a QVector, QStack, QVarLengthArray or QList of an
+integer or floating-point type. Shows the number of elements, their
+minimum, maximum, mean and standard deviation, the number of NaNs and
+infinities, and a histogram with N bins (10 by default). The elements are
+read in chunks, using numpy if it is installed."""
+
+    bar_width = 40
+
+    def __init__(self):
+        super(_QtStats, self).__init__('qt-stats', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        bins = 10
+        option, rest = _split_word(arg)
+        if option == '-bins':
+            count, arg = _split_word(rest)
+            try:
+                bins = int(count)
+            except ValueError:
+                raise gdb.GdbError('qt-stats: -bins needs a number')
+        val = _parse_and_eval(arg)
+        numbers = numeric_array(_printer(val))
+        if numbers is None:
+            raise gdb.GdbError('qt-stats: {:} is not a container of numbers'.format(val.type))
+        total = numbers.count
+
+        budget = CommandBudget()
+        stats = Statistics()
+        read = 0
+        for data, stride in numbers.chunks(budget):
+            values = numbers.decode(data, stride)
+            stats.add(values)
+            read += len(values)
+        gdb.write('{:}: {:d} numbers'.format(val.type, stats.count))
+        if stats.nans or stats.infs:
+            gdb.write(' (and {:d} NaN, {:d} infinite)'.format(stats.nans, stats.infs))
+        gdb.write('\n')
+        if stats.count:
+            gdb.write('  min {:}, max {:}\n'.format(stats.min, stats.max))
+            gdb.write('  mean {:}, stddev {:}\n'.format(stats.mean, stats.stddev()))
+
+        if stats.count and bins > 0:
+            # the histogram covers the same elements as the statistics,
+            # which are read again with a budget of their own
+            numbers.count = read
+            histogram = Histogram(stats.min, stats.max, bins)
+            for data, stride in numbers.chunks(CommandBudget()):
+                histogram.add(numbers.decode(data, stride))
+            width = float(stats.max - stats.min) / bins
+            most = max(histogram.counts)
+            for i, count in enumerate(histogram.counts):
+                bar = '#' * (count * self.bar_width // most) if most else ''
+                gdb.write('  [{:<12.6g}, {:<12.6g}{:} {:>10d} {:}\n'.format(
+                    stats.min + i * width, stats.min + (i + 1) * width,
+                    ']' if i == bins - 1 else ')', count, bar))
+        if budget.exhausted:
+            gdb.write('warning: only the first {:d} of {:d} elements were read ({:})\n'.format(
+                read, total, budget.exhausted))
+
+_QtStats()
+
+_temporal_ranges = {
+    'QDate': (-784350574879, 784354017364),
+    'QTime': (0, 86400000),
+}
+"""The valid Julian Days of a QDate and msecs of a QTime (see core.jd_is_valid)."""
+
+class TemporalArray:
+    """The elements of a container of QDate, QTime or QDateTime, as numbers.
+
+    QDates are converted to their Julian Day, QTimes to msecs since
+    midnight and QDateTimes to msecs since the UNIX epoch. QDateTimes in
+    local time are kept in local time, as the time zone of the program is
+    not known; the others are converted to UTC. The elements are read in
+    chunks (see NumericArray) and converted with vectorized arithmetic if
+    numpy is available; the private data of QDateTimes that do not fit in
+    the d-pointer is read in bulk.
+    """
+
+    def __init__(self, kind, numbers):
+        self.kind = kind
+        self.numbers = numbers
+
+    def chunks(self, budget):
+        """Yields the elements as (keys, valid, local) chunks.
+
+        local tells which QDateTime keys are in local time rather than
+        UTC; it is None for QDates and QTimes.
+        """
+        for data, stride in self.numbers.chunks(budget):
+            values = self.numbers.decode(data, stride)
+            if self.kind == 'QDateTime':
+                yield self._datetimes(values, budget)
+                continue
+            low, high = _temporal_ranges[self.kind]
+            np = _numpy()
+            if np is not None:
+                values = values.astype(np.int64)
+                yield (values, (values >= low) & (values <= high), None)
+            else:
+                yield (values, [low <= value <= high for value in values], None)
+
+    def _short_datetimes(self, values):
+        """Decodes QDateTimes stored in the d-pointer, as numpy arrays."""
+        dt = core.QDateTimePrinter
+        status = values & 0xff
+        spec = (status & dt._timeSpecMask57) >> dt._timeSpecShift57
+        local = ((status & dt._validDate57) != 0) & ((status & dt._validTime57) != 0)
+        valid = _numpy().where(spec == dt._localTime, local,
+                (status & dt._validDateTime57) != 0)
+        return (values >> 8, valid, spec == dt._localTime)
+
+    def _datetimes(self, values, budget):
+        read = core.QDateTimePrinter.reader()
+        np = _numpy()
+        if np is not None:
+            values = values.astype(np.int64)
+            keys = np.zeros(len(values), np.int64)
+            valid = np.zeros(len(values), np.bool_)
+            local = np.zeros(len(values), np.bool_)
+            if read == core.QDateTimePrinter._read_5_7:
+                short = (values & 1) != 0
+                keys[short], valid[short], local[short] = self._short_datetimes(
+                        values[short])
+                others = np.nonzero(~short)[0].tolist()
+            else:
+                others = range(len(values))
+        else:
+            keys = [0] * len(values)
+            valid = [False] * len(values)
+            local = [False] * len(values)
+            others = range(len(values))
+
+        # the remaining d-pointers point to QDateTimePrivate blocks
+        mask = (1 << (8 * core.target_abi()[1])) - 1
+        pointers = [int(values[i]) & mask for i in others]
+        private_size = max(core.QDateTimePrinter._layout_5_0.sizeof(),
+                core.QDateTimePrinter._layout_5_7.sizeof())
+        pages = core.PageReader(budget)
+        pages.prefetch([d for d in pointers if d and not d & 1], private_size)
+        for i, d in zip(others, pointers):
+            try:
+                fields = read(d, pages)
+            except gdb.MemoryError:
+                continue
+            if fields is not None and fields[4]:
+                msecs, spec, offset_from_utc, time_zone, _ = fields
+                if spec == core.QDateTimePrinter._localTime:
+                    keys[i] = msecs
+                    local[i] = True
+                else:
+                    keys[i] = msecs - offset_from_utc * 1000
+                valid[i] = True
+        return (keys, valid, local)
+
+def temporal_array(pp):
+    """Returns a TemporalArray for a container of dates or times, or None."""
+    elements = _element_array(pp)
+    if elements is None:
+        return None
+    el_type = elements[2].strip_typedefs().unqualified()
+    kind = el_type.tag or str(el_type)
+    if kind in ('QDate', 'QTime'):
+        code = {8: 'q', 4: 'i'}.get(el_type.sizeof)
+    elif kind == 'QDateTime':
+        # the d-pointer, signed so that short data is sign-extended
+        code = {8: 'q', 4: 'i'}.get(core.target_abi()[1])
+    else:
+        return None
+    if code is None:
+        return None
+    return TemporalArray(kind, NumericArray(*elements, code=code))
+
+_temporal_templates = {
+    'QDate': '{:0=4}-{:0=2}-{:0=2}',
+    'QTime': '{:0=2}:{:0=2}:{:0=2}.{:0=3}',
+    'QDateTime': '{:0=4}-{:0=2}-{:0=2} {:0=2}:{:0=2}:{:0=2}.{:0=3}',
+}
+
+def _temporal_parts(kind, key):
+    """Returns the date and/or time components of a TemporalArray key.
+
+    Only integer arithmetic is used, so key may also be a numpy array.
+    """
+    if kind == 'QDate':
+        return list(core.jd_to_date(key))
+    if kind == 'QTime':
+        msecs = key
+        parts = []
+    else:
+        ms_per_day = core.QDateTimePrinter._ms_per_day
+        msecs = key % ms_per_day
+        parts = list(core.jd_to_date(core.QDateTimePrinter._unix_epoch_jd +
+                key // ms_per_day))
+    return parts + [msecs // 3600000 % 24, msecs // 60000 % 60,
+            msecs // 1000 % 60, msecs % 1000]
+
+def format_temporal(kind, keys, valid, local=None):
+    """Formats a chunk of TemporalArray keys.
+
+    QDateTimes are labelled "(Local)" or "(UTC)" after the local flags of
+    the chunk (see TemporalArray.chunks()).
+    """
+    template = _temporal_templates[kind]
+    np = _numpy()
+    if np is not None and hasattr(keys, 'dtype'):
+        parts = _temporal_parts(kind, np.where(valid, keys, 0))
+        rows = zip(*[part.tolist() for part in parts])
+    else:
+        rows = [_temporal_parts(kind, key if ok else 0) for key, ok in zip(keys, valid)]
+    texts = [template.format(*row) if ok else '<invalid>'
+            for row, ok in zip(rows, valid)]
+    if local is None:
+        return texts
+    return [text + (' (Local)' if is_local else ' (UTC)') if ok else text
+            for text, ok, is_local in zip(texts, valid, local)]
+
+class RangeSummary:
+    """First, last, minimum and maximum of a sequence, and how it is ordered.
+
+    Chunks of (keys, valid) are added in order, and the extremes are kept
+    as (index, key) pairs. Invalid elements are counted, but otherwise
+    left out.
+    """
+
+    def __init__(self):
+        self.seen = 0
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.min = None
+        self.max = None
+        self.increases = 0
+        self.decreases = 0
+        self.repeats = 0
+        self.first_decrease = None
+        self.first_increase = None
+
+    def add(self, keys, valid):
+        np = _numpy()
+        if np is not None and hasattr(keys, 'dtype'):
+            indices = np.nonzero(valid)[0]
+            keys = keys[indices]
+            if len(keys):
+                steps = np.diff(keys)
+                rises = np.nonzero(steps > 0)[0]
+                falls = np.nonzero(steps < 0)[0]
+                low = int(keys.argmin())
+                high = int(keys.argmax())
+                self._combine(
+                    [(self.seen + int(indices[i]), int(keys[i])) for i in (0, -1, low, high)],
+                    len(rises), len(falls), len(steps) - len(rises) - len(falls),
+                    self.seen + int(indices[rises[0] + 1]) if len(rises) else None,
+                    self.seen + int(indices[falls[0] + 1]) if len(falls) else None)
+            self.seen += len(valid)
+            return
+
+        pairs = [(self.seen + i, key) for i, (key, ok) in enumerate(zip(keys, valid)) if ok]
+        self.seen += len(valid)
+        if not pairs:
+            return
+        increases = decreases = repeats = 0
+        first_increase = first_decrease = None
+        for (_, previous), (index, key) in zip(pairs, pairs[1:]):
+            if key > previous:
+                increases += 1
+                if first_increase is None:
+                    first_increase = index
+            elif key < previous:
+                decreases += 1
+                if first_decrease is None:
+                    first_decrease = index
+            else:
+                repeats += 1
+        by_key = lambda pair: pair[1]
+        self._combine([pairs[0], pairs[-1], min(pairs, key=by_key), max(pairs, key=by_key)],
+                increases, decreases, repeats, first_increase, first_decrease)
+
+    def _combine(self, extremes, increases, decreases, repeats, first_increase,
+            first_decrease):
+        first, last, low, high = extremes
+        if self.last is not None:
+            # the step from the previous chunk into this one
+            if first[1] > self.last[1]:
+                increases += 1
+                first_increase = first[0]
+            elif first[1] < self.last[1]:
+                decreases += 1
+                first_decrease = first[0]
+            else:
+                repeats += 1
+        if self.first_increase is None:
+            self.first_increase = first_increase
+        if self.first_decrease is None:
+            self.first_decrease = first_decrease
+        self.increases += increases
+        self.decreases += decreases
+        self.repeats += repeats
+        self.count += 1 + increases + decreases + repeats - (self.last is not None)
+        if self.first is None:
+            self.first = first
+        self.last = last
+        if self.min is None or low[1] < self.min[1]:
+            self.min = low
+        if self.max is None or high[1] > self.max[1]:
+            self.max = high
+
+    def ordering(self):
+        """Describes how the sequence is ordered."""
+        if self.count < 2:
+            return 'ordered'
+        if not self.decreases:
+            if not self.repeats:
+                return 'strictly increasing'
+            return 'non-decreasing ({:d} repeats)'.format(self.repeats)
+        if not self.increases:
+            if not self.repeats:
+                return 'strictly decreasing'
+            return 'non-increasing ({:d} repeats)'.format(self.repeats)
+        steps = self.count - 1
+        if self.increases >= self.decreases:
+            return 'unordered ({:d} of {:d} steps go down, the first at [{:d}])'.format(
+                    self.decreases, steps, self.first_decrease)
+        return 'unordered ({:d} of {:d} steps go up, the first at [{:d}])'.format(
+                self.increases, steps, self.first_increase)
+
+class _QtDates(gdb.Command):
+    """Summarize a Qt container of dates or times.
+
+Usage: qt-dates [-list] EXPRESSION
+
+EXPRESSION must be a QVector, QStack, QVarLengthArray or QList of QDate,
+QTime or QDateTime. Shows the number of (valid) elements, the first,
+last, earliest and latest of them and whether they are in order. With
+-list, the elements are listed as well, up to "print elements" of them.
+The elements are read in chunks and converted using numpy if it is
+installed. QDateTimes are compared and shown in UTC, except those in
+local time: the time zone of the program is not known, so they are shown
+as they are stored, labelled "(Local)", and compared as if they were
+UTC."""
+
+    def __init__(self):
+        super(_QtDates, self).__init__('qt-dates', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        option, rest = _split_word(arg)
+        listing = option == '-list'
+        if listing:
+            arg = rest
+        val = _parse_and_eval(arg)
+        elements = temporal_array(_printer(val))
+        if elements is None:
+            raise gdb.GdbError('qt-dates: {:} is not a container of dates or times'.format(
+                val.type))
+
+        budget = CommandBudget()
+        summary = RangeSummary()
+        limit = _limit()
+        # the local flags of the first, last, minimum and maximum elements
+        extremes_local = {}
+        locals_seen = 0
+        for keys, valid, local in elements.chunks(budget):
+            start = summary.seen
+            if listing and (limit is None or start < limit):
+                count = len(valid) if limit is None else min(len(valid), limit - start)
+                for i, text in enumerate(format_temporal(elements.kind, keys[:count],
+                        valid[:count], local[:count] if local is not None else None)):
+                    gdb.write('[{:d}] = {:}\n'.format(start + i, text))
+            summary.add(keys, valid)
+            if local is not None and summary.count:
+                if hasattr(local, 'dtype'):
+                    locals_seen += int((valid & local).sum())
+                else:
+                    locals_seen += sum(1 for ok, is_local in zip(valid, local)
+                            if ok and is_local)
+                for index, _ in (summary.first, summary.last, summary.min, summary.max):
+                    if index >= start:
+                        extremes_local[index] = bool(local[index - start])
+        if listing and limit is not None and summary.seen > limit:
+            gdb.write('...\n')
+
+        gdb.write('{:}: {:d} elements'.format(val.type, summary.seen))
+        if summary.count < summary.seen:
+            gdb.write(' ({:d} invalid)'.format(summary.seen - summary.count))
+        gdb.write('\n')
+        if summary.count:
+            names = ('first', 'last', 'min', 'max')
+            pairs = (summary.first, summary.last, summary.min, summary.max)
+            local = None
+            if elements.kind == 'QDateTime':
+                local = [extremes_local[index] for index, _ in pairs]
+            texts = format_temporal(elements.kind, [key for _, key in pairs],
+                    [True] * len(pairs), local)
+            for name, (index, _), text in zip(names, pairs, texts):
+                gdb.write('  {:<5} [{:d}] = {:}\n'.format(name, index, text))
+            gdb.write('  {:}\n'.format(summary.ordering()))
+            if 0 < locals_seen < summary.count:
+                gdb.write('  note: {:d} of the {:d} valid elements are in local time, '
+                    'compared as if UTC\n'.format(locals_seen, summary.count))
+        if budget.exhausted:
+            gdb.write('warning: not all elements were read ({:})\n'.format(budget.exhausted))
+
+_QtDates()
+
+class ObjectWalker:
+    """Walks QObject trees breadth-first, reading each level in bulk.
+
+    For every batch of objects at the same depth, the d-pointers, the
+    q_ptr, parent and children fields of the QObjectData, the headers of
+    the children lists and finally the children arrays are each fetched
+    with a RangeReader, so a level of the tree costs a handful of reads
+    however wide it is, and only those fields are read. Objects are only
+    visited once, so corrupted trees with cycles terminate.
+    """
+
+    batch_size = 65536
+
+    def __init__(self, budget, limit=None):
+        self.budget = budget
+        self.limit = limit
+        self.corrupted = 0
+        self.seen = set()
+
+    def walk(self, roots):
+        """Yields (object address, vtable address, depth) for each object."""
+        frontier = [root for root in roots if root]
+        depth = 0
+        count = 0
+        while frontier:
+            next_frontier = []
+            for start in range(0, len(frontier), self.batch_size):
+                batch = [address for address in frontier[start:start + self.batch_size]
+                        if address not in self.seen]
+                self.seen.update(batch)
+                for address, vptr, children in self._read_batch(batch):
+                    yield (address, vptr, depth)
+                    count += 1
+                    if self.limit is not None and count >= self.limit:
+                        self.budget.fail('object limit reached')
+                        return
+                    next_frontier.extend(children)
+                if self.budget.exhausted:
+                    return
+            frontier = next_frontier
+            depth += 1
+
+    def _read_batch(self, batch):
+        ptr_size = core.target_abi()[1]
+        list_layout = core.QListPrinter._d_layout
+        reader = core.RangeReader(self.budget)
+
+        # a QObject is a vtable pointer followed by its d-pointer
+        objects = []
+        for address, data in zip(batch,
+                reader.read_ranges((address, 2 * ptr_size) for address in batch)):
+            if data is None:
+                self.corrupted += 1
+                continue
+            vptr, d = core.unpack_pointers(data)
+            objects.append((address, vptr, d))
+
+        # q_ptr, parent and children follow the vtable pointer of QObjectData
+        q_ptr = core.QObjectPrinter._d_layout.offsetof('q_ptr')
+        headers = []
+        for (address, vptr, d), data in zip(objects,
+                reader.read_ranges((d + q_ptr, 3 * ptr_size) for address, vptr, d in objects)):
+            if not d or data is None:
+                self.corrupted += 1
+                continue
+            owner, parent, children = core.unpack_pointers(data)
+            if owner != address:
+                self.corrupted += 1
+                continue
+            headers.append((address, vptr, children))
+
+        lists = []
+        slots_offset = list_layout.offsetof('array')
+        for (address, vptr, children), data in zip(headers,
+                reader.read_ranges((children, list_layout.sizeof())
+                    for address, vptr, children in headers)):
+            if not children or data is None:
+                self.corrupted += 1
+                continue
+            header = list_layout.unpack(data)
+            count = header['end'] - header['begin']
+            if not 0 <= header['begin'] <= header['end'] <= header['alloc']:
+                self.corrupted += 1
+                count = 0
+            lists.append((address, vptr,
+                children + slots_offset + header['begin'] * ptr_size, count))
+
+        arrays = iter(reader.read_ranges((slots, count * ptr_size)
+                for address, vptr, slots, count in lists if count))
+        for address, vptr, slots, count in lists:
+            children = []
+            if count:
+                data = next(arrays)
+                if data is None:
+                    self.corrupted += 1
+                else:
+                    children = core.unpack_pointers(data)
+            yield (address, vptr, children)
+
+class ClassNames:
+    """Maps the vtable addresses of QObjects to their classes.
+
+    The class of an object is only looked up (through its dynamic type and
+    metaobject) for the first object seen with a given vtable.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        self.object_type = gdb.lookup_type('QObject').pointer()
+
+    def _lookup(self, address, vptr):
+        if vptr not in self.classes:
+            pp = core.QObjectPrinter(gdb.Value(address).cast(self.object_type).dereference())
+            try:
+                self.classes[vptr] = (pp.class_name(), pp.dynamic_meta_object())
+            except gdb.error:
+                self.classes[vptr] = ('<unknown class>', None)
+        return self.classes[vptr]
+
+    def name(self, address, vptr):
+        """Returns the class name of the object at address."""
+        return self._lookup(address, vptr)[0]
+
+    def meta_object(self, address, vptr):
+        """Returns the address of the metaobject of the object at address, or None."""
+        return self._lookup(address, vptr)[1]
+
+    def object_name(self, address):
+        """Returns the class name of the object at address, reading its vtable pointer."""
+        return self.name(address, _read_vptr(address))
+
+def _application_object():
+    try:
+        return int(gdb.parse_and_eval('QCoreApplication::self'))
+    except gdb.error:
+        return 0
+
+class _QtObjects(gdb.Command):
+    """Count the QObjects in object trees by class.
+
+Usage: qt-objects [-json] [-max N] [ROOT...]
+
+Walks the children of the ROOT objects (QObject pointers), or of the
+application object if none are given, and shows how many objects of
+each class there are and at which depths of the tree they are. With
+-json, prints one JSON object per class instead. With -max, at most N
+objects are visited. Every object is visited once, even if a corrupted
+tree links to it twice."""
+
+    def __init__(self):
+        super(_QtObjects, self).__init__('qt-objects', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        as_json = False
+        limit = None
+        argv = gdb.string_to_argv(arg)
+        while argv and argv[0].startswith('-'):
+            option = argv.pop(0)
+            if option == '-json':
+                as_json = True
+            elif option == '-max' and argv:
+                try:
+                    limit = int(argv.pop(0))
+                except ValueError:
+                    raise gdb.GdbError('qt-objects: -max needs a number')
+            else:
+                raise gdb.GdbError('qt-objects: unknown option ' + option)
+        if argv:
+            roots = [int(_parse_and_eval(root)) for root in argv]
+        else:
+            roots = [_application_object()]
+            if not roots[0]:
+                raise gdb.GdbError('qt-objects: there is no application object; give the roots')
+
+        budget = CommandBudget()
+        walker = ObjectWalker(budget, limit)
+        names = ClassNames()
+        # class name -> [count, minimum depth, maximum depth, sum of depths]
+        classes = {}
+        total = 0
+        for address, vptr, depth in walker.walk(roots):
+            stats = classes.get(vptr)
+            if stats is None:
+                stats = classes[vptr] = [0, depth, depth, 0]
+                names.name(address, vptr)
+            stats[0] += 1
+            stats[1] = min(stats[1], depth)
+            stats[2] = max(stats[2], depth)
+            stats[3] += depth
+            total += 1
+
+        by_name = {}
+        for vptr, stats in classes.items():
+            name = names.name(None, vptr)
+            if name in by_name:
+                merged = by_name[name]
+                stats = [merged[0] + stats[0], min(merged[1], stats[1]),
+                        max(merged[2], stats[2]), merged[3] + stats[3]]
+            by_name[name] = stats
+        rows = sorted(by_name.items(), key=lambda item: (-item[1][0], item[0]))
+
+        if as_json:
+            for name, (count, low, high, depths) in rows:
+                gdb.write(json.dumps({'class': name, 'count': count, 'min_depth': low,
+                    'max_depth': high, 'mean_depth': float(depths) / count},
+                    sort_keys=True) + '\n')
+        else:
+            gdb.write('{:d} objects of {:d} classes\n'.format(total, len(rows)))
+            gdb.write('{:>10}  {:>11}  {:}\n'.format('count', 'depth', 'class'))
+            for name, (count, low, high, depths) in rows:
+                gdb.write('{:>10d}  {:>11}  {:}\n'.format(count,
+                    '{:d}-{:d}'.format(low, high) if low != high else str(low), name))
+        if walker.corrupted:
+            gdb.write('warning: {:d} objects or children lists could not be read\n'.format(
+                walker.corrupted))
+        if budget.exhausted:
+            gdb.write('warning: not all objects were visited ({:})\n'.format(budget.exhausted))
+
+_QtObjects()
+
+def thread_data():
+    """Returns (gdb thread, QThreadData pointer) pairs for the threads that have one.
+
+    The QThreadData of a thread is found through Qt's thread-local
+    currentThreadData variable, which needs debug info for Qt5Core.
+    """
+    result = []
+    seen = set()
+    selected = gdb.selected_thread()
+    frame = gdb.selected_frame() if selected is not None else None
+    try:
+        for thread in sorted(gdb.selected_inferior().threads(), key=lambda t: t.num):
+            thread.switch()
+            try:
+                data = gdb.parse_and_eval('currentThreadData')
+            except gdb.error:
+                continue
+            if int(data) and int(data) not in seen:
+                seen.add(int(data))
+                result.append((thread, data))
+    finally:
+        if selected is not None:
+            selected.switch()
+            frame.select()
+    return result
+
+def _thread_data_args(arg, command):
+    """Returns the (label, QThreadData pointer) pairs a command should look at.
+
+    arg may name QThreadData pointers; otherwise those of all threads are
+    used.
+    """
+    argv = gdb.string_to_argv(arg)
+    if argv:
+        return [(expression, _parse_and_eval(expression)) for expression in argv]
+    threads = thread_data()
+    if not threads:
+        raise gdb.GdbError('{:}: cannot find the QThreadData of any thread '
+                '(is there debug info for Qt5Core?)'.format(command))
+    return [('Thread {:d}'.format(thread.num), data) for thread, data in threads]
+
+_enum_names = {}
+
+def enum_names(typename):
+    """Returns a dict mapping the values of an enum type to their names."""
+    if typename not in _enum_names:
+        names = {}
+        try:
+            for field in gdb.lookup_type(typename).fields():
+                names.setdefault(field.enumval, field.name.split('::')[-1])
+        except gdb.error:
+            pass
+        _enum_names[typename] = names
+    return _enum_names[typename]
+
+def _histogram(counts, limit=10):
+    """Formats the largest entries of a dict of counts on one line."""
+    items = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    text = ', '.join('{:} {:d}'.format(key, count) for key, count in items[:limit])
+    if len(items) > limit:
+        text += ', ... ({:d} more)'.format(len(items) - limit)
+    return text
+
+_qpostevent_layout = core.StructLayout('QPostEvent', [
+    ('receiver', 'ptr'),
+    ('event', 'ptr'),
+    ('priority', 'int32'),
+    ])
+
+_qevent_layout = core.StructLayout('QEvent', [
+    (None, 'ptr'), # vtable
+    (None, 'ptr'), # d
+    ('t', 'uint16'),
+    ])
+
+def posted_events(data, budget):
+    """Returns the pending events of a QThreadData as a list of dicts.
+
+    Each dict has the receiver's address and vtable address, and the
+    event's type and priority. The vector is located like QVectorPrinter
+    does it and read in one go, then the events and receivers are read
+    in bulk.
+    """
+    event_list = data['postEventList']
+    vector_type = event_list.type.strip_typedefs().fields()[0].type
+    pp = core.QVectorPrinter(event_list.cast(vector_type))
+    elements, size, error = pp.data()
+    if error:
+        raise gdb.GdbError(core.corrupted(error))
+    start = int(event_list['startOffset'])
+    if not 0 <= start <= size:
+        start = 0
+    el_size = _qpostevent_layout.sizeof()
+    if size == start or not budget.charge((size - start) * el_size):
+        return []
+    payload = core.read_memory(int(elements) + start * el_size, (size - start) * el_size)
+    # sent events are left in the list with a null event until it is compacted
+    events = [e for e in (_qpostevent_layout.unpack(payload, i * el_size)
+        for i in range(size - start)) if e['event']]
+
+    ptr_size = core.target_abi()[1]
+    reader = core.PageReader(budget)
+    reader.prefetch([e['event'] for e in events], _qevent_layout.sizeof())
+    reader.prefetch([e['receiver'] for e in events if e['receiver']], ptr_size)
+    for e in events:
+        header = reader.read(e['event'], _qevent_layout.sizeof())
+        e['type'] = _qevent_layout.unpack(header)['t'] if header is not None else None
+        vptr = reader.read(e['receiver'], ptr_size) if e['receiver'] else None
+        e['vptr'] = core.unpack_pointers(vptr)[0] if vptr is not None else None
+    return events
+
+class _QtEvents(gdb.Command):
+    """Show the posted events waiting in the event queues of threads.
+
+Usage: qt-events [THREADDATA...]
+
+For each thread (or each of the given QThreadData pointers), shows the
+number of events posted to objects living in the thread that have not
+been delivered yet, by event type, by receiver class and by priority.
+Finding the threads needs debug info for Qt5Core."""
+
+    def __init__(self):
+        super(_QtEvents, self).__init__('qt-events', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        type_names = enum_names('QEvent::Type')
+        names = ClassNames()
+        for label, data in _thread_data_args(arg, 'qt-events'):
+            budget = CommandBudget()
+            events = posted_events(data, budget)
+            gdb.write('{:} (QThreadData {:#x}): {:d} posted events\n'.format(
+                label, int(data), len(events)))
+            if not events:
+                continue
+            types = {}
+            receivers = {}
+            priorities = {}
+            for e in events:
+                name = type_names.get(e['type'], e['type'])
+                types[name] = types.get(name, 0) + 1
+                if e['vptr'] is None:
+                    receiver = '<unreadable>'
+                else:
+                    receiver = names.name(e['receiver'], e['vptr'])
+                receivers[receiver] = receivers.get(receiver, 0) + 1
+                priorities[e['priority']] = priorities.get(e['priority'], 0) + 1
+            gdb.write('  types: {:}\n'.format(_histogram(types)))
+            gdb.write('  receivers: {:}\n'.format(_histogram(receivers)))
+            gdb.write('  priorities: {:}\n'.format(_histogram(priorities)))
+            if budget.exhausted:
+                gdb.write('  warning: incomplete ({:})\n'.format(budget.exhausted))
+
+_QtEvents()
+
+_qtimerinfo_layout = core.StructLayout('QTimerInfo', [
+    ('id', 'int32'),
+    ('interval', 'int32'),
+    ('timerType', 'int32'),
+    ('tv_sec', 'ptrdiff'), # timeout
+    ('tv_nsec', 'ptrdiff'),
+    ('obj', 'ptr'),
+    ('activateRef', 'ptr'),
+    ])
+
+_timespec_layout = core.StructLayout('timespec', [
+    ('tv_sec', 'ptrdiff'),
+    ('tv_nsec', 'ptrdiff'),
+    ])
+
+def _read_pointer(val):
+    """Reads a pointer-sized value (such as a QAtomicPointer) from memory."""
+    ptr_size = core.target_abi()[1]
+    return core.unpack_pointers(core.read_memory(int(val.address), ptr_size))[0]
+
+def _meta_class_names(address):
+    """Yields the class names of the metaobject at address and its superclasses."""
+    seen = set()
+    while address and address not in seen:
+        seen.add(address)
+        meta = core.meta_object(address)
+        if meta is None:
+            return
+        yield meta.class_name
+        address = meta.superdata
+
+def timer_list(data):
+    """Returns the QTimerInfoList of the event dispatcher of a QThreadData, or None.
+
+    Only the UNIX and Glib event dispatchers (and the ones derived from
+    them) are supported, and their private types must be in the debug
+    info.
+    """
+    dispatcher = _read_pointer(data['eventDispatcher'])
+    if not dispatcher:
+        return None
+    obj = gdb.Value(dispatcher).cast(gdb.lookup_type('QObject').pointer()).dereference()
+    pp = core.QObjectPrinter(obj)
+    for name in _meta_class_names(pp.dynamic_meta_object()):
+        if name == 'QEventDispatcherUNIX':
+            private_type = gdb.lookup_type('QEventDispatcherUNIXPrivate')
+            return pp.d().cast(private_type.pointer())['timerList']
+        if name == 'QEventDispatcherGlib':
+            private_type = gdb.lookup_type('QEventDispatcherGlibPrivate')
+            return pp.d().cast(private_type.pointer())['timerSource']['timerList']
+    return None
+
+def timers(timer_list, budget):
+    """Returns the timers in a QTimerInfoList as a list of dicts.
+
+    Besides the QTimerInfo fields, each dict has the vtable address of the
+    receiver ('vptr') and the time left until the timer fires, in
+    milliseconds, relative to the last time the dispatcher read the clock
+    ('remaining').
+    """
+    list_type = timer_list.type.strip_typedefs().fields()[0].type
+    pp = core.QListPrinter(timer_list.cast(list_type))
+    header, error = pp.header()
+    if error:
+        raise gdb.GdbError(core.corrupted(error))
+    count = header['end'] - header['begin']
+    ptr_size = core.target_abi()[1]
+    if not count or not budget.charge(count * ptr_size):
+        return []
+    slots = (int(pp.val['d']) + pp._d_layout.offsetof('array') +
+            header['begin'] * ptr_size)
+    infos = core.unpack_pointers(core.read_memory(slots, count * ptr_size))
+    now = _timespec_layout.read(int(timer_list['currentTime'].address))
+    now_ms = now['tv_sec'] * 1000 + now['tv_nsec'] // 1000000
+
+    reader = core.PageReader(budget)
+    reader.prefetch(infos, _qtimerinfo_layout.sizeof())
+    result = []
+    for info in infos:
+        data = reader.read(info, _qtimerinfo_layout.sizeof())
+        if data is None:
+            continue
+        timer = _qtimerinfo_layout.unpack(data)
+        timer['remaining'] = timer['tv_sec'] * 1000 + timer['tv_nsec'] // 1000000 - now_ms
+        result.append(timer)
+    reader.prefetch([t['obj'] for t in result if t['obj']], ptr_size)
+    for timer in result:
+        vptr = reader.read(timer['obj'], ptr_size) if timer['obj'] else None
+        timer['vptr'] = core.unpack_pointers(vptr)[0] if vptr is not None else None
+    return result
+
+class _QtTimers(gdb.Command):
+    """Show the active timers of the event dispatchers of threads.
+
+Usage: qt-timers [-all] [THREADDATA...]
+
+For each thread (or each of the given QThreadData pointers), groups the
+timers of its event dispatcher by receiver class, interval and timer
+type, with the shortest time left until one of them fires. With -all,
+every timer is listed instead. This needs debug info for Qt5Core, and
+only works with the UNIX and Glib event dispatchers."""
+
+    def __init__(self):
+        super(_QtTimers, self).__init__('qt-timers', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        show_all = False
+        option, rest = _split_word(arg)
+        if option == '-all':
+            show_all = True
+            arg = rest
+        type_names = enum_names('Qt::TimerType')
+        names = ClassNames()
+        for label, data in _thread_data_args(arg, 'qt-timers'):
+            timers_list = timer_list(data)
+            if timers_list is None:
+                gdb.write('{:}: no supported event dispatcher\n'.format(label))
+                continue
+            budget = CommandBudget()
+            found = timers(timers_list, budget)
+            gdb.write('{:} (QThreadData {:#x}): {:d} timers\n'.format(
+                label, int(data), len(found)))
+            groups = {}
+            for timer in found:
+                if timer['vptr'] is None:
+                    receiver = '<unreadable>'
+                else:
+                    receiver = names.name(timer['obj'], timer['vptr'])
+                timer_type = type_names.get(timer['timerType'], timer['timerType'])
+                if show_all:
+                    gdb.write('  id {:d}: {:} {:#x}, every {:d} ms ({:}), next in {:d} ms\n'.format(
+                        timer['id'], receiver, timer['obj'], timer['interval'],
+                        timer_type, timer['remaining']))
+                key = (receiver, timer['interval'], timer_type)
+                count, remaining = groups.get(key, (0, timer['remaining']))
+                groups[key] = (count + 1, min(remaining, timer['remaining']))
+            if not show_all:
+                for (receiver, interval, timer_type), (count, remaining) in sorted(
+                        groups.items(), key=lambda item: (-item[1][0], item[0][1])):
+                    gdb.write('  {:6d} x {:}, every {:d} ms ({:}), next in {:d} ms\n'.format(
+                        count, receiver, interval, timer_type, remaining))
+            if budget.exhausted:
+                gdb.write('  warning: incomplete ({:})\n'.format(budget.exhausted))
+
+_QtTimers()
+
+class FrameAnnotator:
+    """Names the signals and receivers of Qt dispatch frames.
+
+    A frame of QMetaObject::activate() is annotated with the sender's
+    class and the signal, and the frames that deliver events with the
+    receiver's class and the event type, eg:
+
+        QMetaObject::activate [MyModel::dataChanged]
+        QCoreApplication::notify [QLineEdit KeyPress]
+
+    This reads the arguments of those frames, so it needs debug info for
+    Qt5Core; other frames are left alone. Classes and metaobjects are only
+    looked up once per vtable (see ClassNames and core.meta_object()).
+    """
+
+    def __init__(self):
+        self.classes = ClassNames()
+        self.event_names = enum_names('QEvent::Type')
+
+    def activate(self, frame):
+        sender = int(frame.read_var('sender'))
+        vptr = _read_vptr(sender)
+        class_name = self.classes.name(sender, vptr)
+        # the overloads are told apart by their argument names; the one
+        # taking a QMetaObject also has a local signal_offset, so look for
+        # m first
+        try:
+            # activate(QObject *, const QMetaObject *, int local_signal_index, void **)
+            meta = core.meta_object(int(frame.read_var('m')))
+            local_index = int(frame.read_var('local_signal_index'))
+            try:
+                name = meta.methods[local_index][0] if meta is not None else None
+            except IndexError:
+                name = None
+            return '{:}::{:}'.format(class_name, name or '?')
+        except ValueError:
+            pass
+        try:
+            # activate(QObject *, int signal_offset, int local_signal_index, void **)
+            signal_index = (int(frame.read_var('signal_offset')) +
+                    int(frame.read_var('local_signal_index')))
+        except ValueError:
+            # activate(QObject *, int signal_index, void **)
+            signal_index = int(frame.read_var('signal_index'))
+        name = core.signal_name(self.classes.meta_object(sender, vptr), signal_index)
+        return '{:}::{:}'.format(class_name, name or '?')
+
+    def notify(self, frame):
+        receiver = int(frame.read_var('receiver'))
+        try:
+            event = int(frame.read_var('event'))
+        except ValueError:
+            # QApplication::notify and QApplicationPrivate::notify_helper
+            # name the event e
+            event = int(frame.read_var('e'))
+        return self._event(receiver, event)
+
+    def _event(self, receiver, event):
+        header = _qevent_layout.read(event)
+        event_type = self.event_names.get(header['t'], header['t'])
+        return '{:} {:}'.format(self.classes.object_name(receiver), event_type)
+
+    handlers = {
+        'QMetaObject::activate': activate,
+        'QCoreApplication::notify': notify,
+        'QApplication::notify': notify,
+        'QCoreApplication::notifyInternal2': notify,
+        'QCoreApplicationPrivate::notify_helper': notify,
+        'QApplicationPrivate::notify_helper': notify,
+    }
+
+    def annotate(self, frame, name):
+        """Returns the name to show for a frame of the function name."""
+        handler = self.handlers.get(name)
+        if handler is None:
+            return name
+        try:
+            detail = handler(self, frame)
+        except (gdb.error, RuntimeError, ValueError, KeyError):
+            return name
+        return '{:} [{:}]'.format(name, detail)
+
+class _QtProfile(gdb.Command):
+    """Sample the stacks of all threads, naming Qt signals and events.
+
+Usage: qt-profile [-samples N] [-interval MS] [-depth N] [-o FILE]
+
+Lets the program run, interrupting it every MS milliseconds (10 by
+default) to record the stacks of all of its threads, N times (100 by
+default). Frames that emit signals or deliver events are annotated with
+the signal or the receiver's class and the event type (see
+FrameAnnotator). The result is written in the "folded" format of
+flamegraph.pl, one stack per line with the number of times it was seen,
+to FILE or to the terminal. Only stacks of up to 256 frames (or -depth)
+are recorded.
+
+The program is interrupted by sending it SIGINT, so this only works for
+processes running on the same machine as gdb."""
+
+    def __init__(self):
+        super(_QtProfile, self).__init__('qt-profile', gdb.COMMAND_RUNNING,
+                gdb.COMPLETE_FILENAME)
+
+    def invoke(self, arg, from_tty):
+        options = {'-samples': 100, '-interval': 10, '-depth': 256, '-o': None}
+        argv = gdb.string_to_argv(arg)
+        while argv:
+            option = argv.pop(0)
+            if option not in options or not argv:
+                raise gdb.GdbError('usage: qt-profile [-samples N] [-interval MS] '
+                        '[-depth N] [-o FILE]')
+            value = argv.pop(0)
+            if option != '-o':
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise gdb.GdbError('qt-profile: {:} needs a number'.format(option))
+            options[option] = value
+
+        inferior = gdb.selected_inferior()
+        if not inferior.pid:
+            raise gdb.GdbError('qt-profile: the program is not running')
+        annotator = FrameAnnotator()
+        stacks = {}
+        samples = 0
+        for i in range(options['-samples']):
+            if i:
+                timer = threading.Timer(options['-interval'] / 1000.0,
+                        os.kill, (inferior.pid, signal.SIGINT))
+                timer.start()
+                try:
+                    gdb.execute('continue', False, True)
+                finally:
+                    timer.cancel()
+                if not inferior.is_valid() or not inferior.pid:
+                    break
+            self.sample(inferior, annotator, options['-depth'], stacks)
+            samples += 1
+
+        lines = ['{:} {:d}\n'.format(stack, count) for stack, count in
+                sorted(stacks.items(), key=lambda item: -item[1])]
+        if options['-o'] is None:
+            for line in lines:
+                gdb.write(line)
+        else:
+            with open(options['-o'], 'w') as f:
+                f.writelines(lines)
+            gdb.write('Wrote {:d} stacks from {:d} samples to {:}.\n'.format(
+                len(lines), samples, options['-o']))
+
+    def sample(self, inferior, annotator, depth, stacks):
+        """Adds the folded stack of each thread to stacks."""
+        selected = gdb.selected_thread()
+        try:
+            for thread in inferior.threads():
+                thread.switch()
+                names = []
+                frame = gdb.newest_frame()
+                while frame is not None and len(names) < depth:
+                    name = frame.name() or '??'
+                    names.append(annotator.annotate(frame, name))
+                    try:
+                        frame = frame.older()
+                    except gdb.error:
+                        break
+                stack = ';'.join(reversed(names))
+                stacks[stack] = stacks.get(stack, 0) + 1
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+
+_QtProfile()
+
+class TypeLayout:
+    """Decodes some fields of a structure, using the layout in the debug info.
+
+    This has the same interface as core.StructLayout (so it can be used
+    with core.gather_nodes()), for private Qt structures whose layout
+    changed between versions. Integer, pointer and atomic fields and
+    bitfields are decoded as unsigned integers. Fields of base classes
+    and of anonymous structs and unions are found as well; a
+    gdb.GdbError names any of the fields that the type does not have.
+    """
+
+    def __init__(self, typ, names):
+        self.typ = typ.strip_typedefs()
+        self.fields = []
+        self._add_fields(self.typ, names, 0)
+        missing = [name for name in names if name not in
+                [field[0] for field in self.fields]]
+        if missing:
+            raise gdb.GdbError('{:} has no field {:}'.format(self.typ,
+                ', '.join(missing)))
+
+    def _add_fields(self, typ, names, bitpos):
+        for field in typ.fields():
+            if not hasattr(field, 'bitpos'):
+                # static members are not part of the layout
+                continue
+            if field.is_base_class or not field.name:
+                self._add_fields(field.type.strip_typedefs(), names,
+                        bitpos + field.bitpos)
+            elif field.name in names:
+                size = field.bitsize or field.type.sizeof * 8
+                self.fields.append((field.name, bitpos + field.bitpos, size))
+
+    def sizeof(self):
+        return self.typ.sizeof
+
+    def unpack(self, data, offset=0):
+        big_endian = core.target_abi()[0] == '>'
+        result = {}
+        for name, bitpos, bitsize in self.fields:
+            start = offset + bitpos // 8
+            end = offset + (bitpos + bitsize + 7) // 8
+            chunk = bytearray(data[start:end])
+            if not big_endian:
+                chunk.reverse()
+            value = 0
+            for byte in chunk:
+                value = (value << 8) | byte
+            if big_endian:
+                value >>= (end - offset) * 8 - bitpos - bitsize
+            else:
+                value >>= bitpos % 8
+            result[name] = value & ((1 << bitsize) - 1)
+        return result
+
+    def read(self, address):
+        return self.unpack(core.read_memory(int(address), self.sizeof()))
+
+_connection_types = ('auto', 'direct', 'queued', 'blocking queued')
+
+class Connections:
+    """Reads the signal/slot connections of QObjects from QObjectPrivate.
+
+    This needs Qt's private types in the debug info. Both the connection
+    lists of Qt 5.0 to 5.12 and the ConnectionData of later versions are
+    supported. The chains of all connection lists of an object are read
+    together, a link at a time (see core.gather_nodes()).
+    """
+
+    def __init__(self):
+        profile = version.profile()
+        self.private_type = profile.lookup_type('QObjectPrivate')
+        connection_type = profile.lookup_type('QObjectPrivate::Connection')
+        self.list_type = profile.lookup_type('QObjectPrivate::ConnectionList')
+        if None in (self.private_type, connection_type, self.list_type):
+            raise gdb.GdbError("reading connections needs Qt's private types "
+                    '(QObjectPrivate::Connection and ConnectionList) in the debug info')
+        self.layout = TypeLayout(connection_type, ('sender', 'receiver',
+            'nextConnectionList', 'next', 'method_offset', 'method_relative',
+            'signal_index', 'connectionType', 'isSlotObject'))
+        self.list_layout = TypeLayout(self.list_type, ('first',))
+        names = [f.name for f in self.private_type.fields()]
+        self.has_connection_data = 'connections' in names
+
+    def _private(self, obj):
+        return core.QObjectPrinter(obj).d().cast(self.private_type.pointer())
+
+    def lists(self, obj):
+        """Returns (signal index, address of the first connection) pairs.
+
+        Signal index -1 is for connections to all signals.
+        """
+        d = self._private(obj)
+        list_size = self.list_layout.sizeof()
+        if self.has_connection_data:
+            # Qt 5.13+: a SignalVector, followed by one ConnectionList per
+            # signal (the first is for all signals)
+            data = _read_pointer(d['connections'])
+            if not data:
+                return []
+            data_type = version.profile().lookup_type('QObjectPrivate::ConnectionData')
+            vector = _read_pointer(gdb.Value(data).cast(data_type.pointer())['signalVector'])
+            if not vector:
+                return []
+            vector_type = version.profile().lookup_type('QObjectPrivate::SignalVector')
+            count = int(gdb.Value(vector).cast(vector_type.pointer())['allocated']) + 1
+            base = vector + vector_type.sizeof
+            first_index = -1
+        else:
+            lists = d['connectionLists']
+            if not lists:
+                return []
+            vector_type = lists.dereference().type.strip_typedefs().fields()[0].type
+            elements, count, error = core.QVectorPrinter(
+                    lists.dereference().cast(vector_type)).data()
+            if error:
+                raise gdb.GdbError(core.corrupted(error))
+            base = int(elements)
+            first_index = 0
+        if not count:
+            return []
+        data = core.read_memory(base, count * list_size)
+        result = []
+        for i in range(count):
+            first = self.list_layout.unpack(data, i * list_size)['first']
+            if first:
+                result.append((first_index + i, first))
+        if not self.has_connection_data:
+            allsignals = int(lists['allsignals']['first'])
+            if allsignals:
+                result.append((-1, allsignals))
+        return result
+
+    def senders(self, obj):
+        """Returns the address of the first connection in the list of senders."""
+        d = self._private(obj)
+        if self.has_connection_data:
+            data = _read_pointer(d['connections'])
+            if not data:
+                return 0
+            data_type = version.profile().lookup_type('QObjectPrivate::ConnectionData')
+            return int(gdb.Value(data).cast(data_type.pointer())['senders'])
+        return int(d['senders'])
+
+    def read(self, firsts, link, budget, limit=10000000):
+        """Returns the connections of the chains starting at firsts.
+
+        link is the field linking the chain ('nextConnectionList' for
+        connection lists, 'next' for senders). Returns a list of
+        (first connection, list of decoded connections) pairs.
+        """
+        nodes, complete = core.gather_nodes(firsts, self.layout, (link,), limit, budget)
+        result = []
+        for first in firsts:
+            chain = []
+            seen = set()
+            current = first
+            while current in nodes and current not in seen:
+                seen.add(current)
+                chain.append(nodes[current])
+                current = nodes[current][link]
+            result.append((first, chain))
+        return result
+
+class _QtConnections(gdb.Command):
+    """Show the signal/slot connections of a QObject.
+
+Usage: qt-connections [-senders] EXPRESSION
+
+Lists the connections of the signals of the object EXPRESSION points
+to, per signal, grouped by receiver class, slot and connection type.
+With -senders, lists the connections to the object's slots instead,
+grouped by sender class and signal. This needs Qt's private types in the
+debug info."""
+
+    def __init__(self):
+        super(_QtConnections, self).__init__('qt-connections', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        option, rest = _split_word(arg)
+        senders = option == '-senders'
+        if senders:
+            arg = rest
+        val = _parse_and_eval(arg)
+        if val.type.code == gdb.TYPE_CODE_PTR:
+            val = val.dereference()
+        obj = val.cast(gdb.lookup_type('QObject'))
+        connections = Connections()
+        classes = ClassNames()
+        budget = CommandBudget()
+        pp = core.QObjectPrinter(obj)
+        meta = pp.dynamic_meta_object()
+        gdb.write('{:} {:#x}\n'.format(pp.class_name(), int(obj.address)))
+
+        if senders:
+            first = connections.senders(obj)
+            chains = connections.read([first], 'next', budget) if first else []
+            groups = {}
+            for first, chain in chains:
+                for c in chain:
+                    sender_meta = None
+                    if c['sender']:
+                        vptr = _read_vptr(c['sender'])
+                        sender_class = classes.name(c['sender'], vptr)
+                        sender_meta = classes.meta_object(c['sender'], vptr)
+                    else:
+                        sender_class = '<none>'
+                    signal = core.signal_name(sender_meta, c['signal_index'])
+                    key = (sender_class, signal or str(c['signal_index']))
+                    groups[key] = groups.get(key, 0) + 1
+            gdb.write('  {:d} connections from other objects\n'.format(sum(groups.values())))
+            for (sender_class, signal), count in sorted(groups.items(),
+                    key=lambda item: -item[1]):
+                gdb.write('  {:6d} x {:}::{:}\n'.format(count, sender_class, signal))
+        else:
+            lists = connections.lists(obj)
+            chains = connections.read([first for index, first in lists],
+                    'nextConnectionList', budget)
+            total = sum(len(chain) for first, chain in chains)
+            gdb.write('  {:d} connections from {:d} signals\n'.format(total, len(lists)))
+            for (index, first), (first, chain) in zip(lists, chains):
+                if index < 0:
+                    signal = '<all signals>'
+                else:
+                    signal = core.signal_name(meta, index) or 'signal {:d}'.format(index)
+                gdb.write('  {:} ({:d}):\n'.format(signal, len(chain)))
+                groups = {}
+                for c in chain:
+                    key = self.receiver(classes, c)
+                    groups[key] = groups.get(key, 0) + 1
+                for (receiver, slot, kind), count in sorted(groups.items(),
+                        key=lambda item: -item[1]):
+                    gdb.write('    {:6d} x {:}::{:} ({:})\n'.format(count, receiver, slot, kind))
+        if budget.exhausted:
+            gdb.write('warning: incomplete ({:})\n'.format(budget.exhausted))
+
+    def receiver(self, classes, c):
+        """Returns (receiver class, slot name, connection type) for a connection."""
+        kind = _connection_types[c['connectionType'] & 3]
+        if not c['receiver']:
+            return ('<disconnected>', '', kind)
+        vptr = _read_vptr(c['receiver'])
+        receiver = classes.name(c['receiver'], vptr)
+        if c['isSlotObject']:
+            return (receiver, '<functor>', kind)
+        slot = core.method_name(classes.meta_object(c['receiver'], vptr),
+                c['method_offset'] + c['method_relative'])
+        return (receiver, slot or '?', kind)
+
+_QtConnections()
+
+_qhashnode_layout = core.StructLayout('QHashNode', [
+    ('next', 'ptr'),
+    ('h', 'uint32'),
+    ])
+
+def hash_chains(pp, budget):
+    """Returns the chains of the buckets of a QHash, as lists of hash values.
+
+    The bucket array is read in one go, then all chains are followed
+    together a link at a time (see core.gather_nodes()). Chains end with
+    a pointer back to the QHashData, which is also what empty buckets
+    hold.
+    """
+    header, error = pp.header()
+    if error:
+        raise gdb.GdbError(core.corrupted(error))
+    d = int(pp.val['d'])
+    count = header['numBuckets']
+    ptr_size = core.target_abi()[1]
+    if not count or not budget.charge(count * ptr_size):
+        return []
+    buckets = core.unpack_pointers(core.read_memory(header['buckets'], count * ptr_size))
+    heads = [bucket for bucket in buckets if bucket != d]
+    nodes, complete = core.gather_nodes(heads, _qhashnode_layout, ('next',),
+            header['size'] + 1, budget)
+    chains = []
+    for bucket in buckets:
+        chain = []
+        seen = set()
+        current = bucket
+        while current != d and current in nodes and current not in seen:
+            seen.add(current)
+            chain.append(nodes[current]['h'])
+            current = nodes[current]['next']
+        chains.append(chain)
+    return chains
+
+def tree_shape(pp, budget):
+    """Returns (node depths, largest height difference of sibling subtrees) of a QMap."""
+    d = pp.val['d']
+    header, error = core.read_header(d, pp._d_layout)
+    if error:
+        raise gdb.GdbError(core.corrupted(error))
+    root_header = int(d['header'].address)
+    nodes, complete = core.gather_nodes([root_header], core.QMapPrinter._node_layout,
+            ('left', 'right'), header['size'] + 1, budget)
+    root = nodes.get(root_header, {}).get('left')
+    depths = []
+    heights = {}
+    imbalance = 0
+    # iterative post-order walk; a corrupted tree may link back to a node
+    stack = [(root, 1, False)]
+    visited = set([root_header])
+    while stack:
+        node, depth, children_done = stack.pop()
+        if node not in nodes:
+            continue
+        left = nodes[node]['left']
+        right = nodes[node]['right']
+        if children_done:
+            left_height = heights.get(left, 0)
+            right_height = heights.get(right, 0)
+            heights[node] = 1 + max(left_height, right_height)
+            imbalance = max(imbalance, abs(left_height - right_height))
+            continue
+        if node in visited:
+            continue
+        visited.add(node)
+        depths.append(depth)
+        stack.append((node, depth, True))
+        stack.append((right, depth + 1, False))
+        stack.append((left, depth + 1, False))
+    return (depths, imbalance)
+
+class _QtHealth(gdb.Command):
+    """Show how well a QHash, QSet or QMap is balanced.
+
+Usage: qt-health EXPRESSION
+
+For a QHash or QSet, shows the load factor, the share of empty buckets,
+a histogram of the bucket chain lengths, the longest chains and the
+number of distinct hash values: many keys with the same hash value point
+to a poor qHash() for the key type. For a QMap, shows the height of the
+tree compared to a perfectly balanced one, the average depth of the
+nodes and the largest difference in height between sibling subtrees."""
+
+    worst = 5
+
+    def __init__(self):
+        super(_QtHealth, self).__init__('qt-health', gdb.COMMAND_DATA,
+                gdb.COMPLETE_EXPRESSION)
+
+    def invoke(self, arg, from_tty):
+        val = _parse_and_eval(arg)
+        pp = _printer(val)
+        if isinstance(pp, core.QSetPrinter):
+            pp = core.QHashPrinter(val['q_hash'])
+        budget = CommandBudget()
+        if isinstance(pp, core.QHashPrinter):
+            self.hash_health(val, pp, budget)
+        elif isinstance(pp, core.QMapPrinter):
+            self.map_health(val, pp, budget)
+        else:
+            raise gdb.GdbError('qt-health: {:} is not a QHash, QSet or QMap'.format(val.type))
+        if budget.exhausted:
+            gdb.write('warning: incomplete ({:})\n'.format(budget.exhausted))
+
+    def hash_health(self, val, pp, budget):
+        chains = hash_chains(pp, budget)
+        size = sum(len(chain) for chain in chains)
+        gdb.write('{:}: {:d} entries in {:d} buckets\n'.format(val.type, size, len(chains)))
+        if not chains:
+            return
+        empty = sum(1 for chain in chains if not chain)
+        gdb.write('  load factor {:.2f}, {:.1f}% of the buckets empty\n'.format(
+            float(size) / len(chains), 100.0 * empty / len(chains)))
+        lengths = {}
+        for chain in chains:
+            length = min(len(chain), 8)
+            lengths[length] = lengths.get(length, 0) + 1
+        gdb.write('  chain lengths:\n')
+        for length in sorted(lengths):
+            gdb.write('    {:>3}: {:d}\n'.format(
+                str(length) if length < 8 else '8+', lengths[length]))
+        worst = sorted(range(len(chains)), key=lambda i: -len(chains[i]))[:self.worst]
+        worst = [i for i in worst if len(chains[i]) > 1]
+        if worst:
+            gdb.write('  longest chains: {:}\n'.format(', '.join(
+                'bucket {:d} ({:d})'.format(i, len(chains[i])) for i in worst)))
+        distinct = len(set(h for chain in chains for h in chain))
+        gdb.write('  {:d} distinct hash values for {:d} keys\n'.format(distinct, size))
+
+    def map_health(self, val, pp, budget):
+        depths, imbalance = tree_shape(pp, budget)
+        size = len(depths)
+        gdb.write('{:}: {:d} entries\n'.format(val.type, size))
+        if not size:
+            return
+        height = max(depths)
+        optimal = int(math.ceil(math.log(size + 1, 2)))
+        gdb.write('  height {:d} (a perfectly balanced tree would have {:d})\n'.format(
+            height, optimal))
+        gdb.write('  average depth {:.2f}, largest subtree height difference {:d}\n'.format(
+            float(sum(depths)) / size, imbalance))
+
+_QtHealth()
+
+def _track_array_data(val):
+    header, error = core.read_header(val['d'], core.qarraydata_layout)
+    if error:
+        return {'error': error}
+    return {'size': header['size'], 'alloc': header['alloc'] & 0x7fffffff}
+
+def _track_list(val):
+    header, error = core.read_header(val['d'], core.QListPrinter._d_layout)
+    if error:
+        return {'error': error}
+    return {'size': header['end'] - header['begin'], 'alloc': header['alloc'],
+            'begin': header['begin'], 'end': header['end']}
+
+def _track_hash(val):
+    header, error = core.read_header(val['d'], core.QHashPrinter._d_layout)
+    if error:
+        return {'error': error}
+    return {'size': header['size'], 'numBuckets': header['numBuckets']}
+
+def _track_set(val):
+    return _track_hash(val['q_hash'])
+
+def _track_cache(val):
+    return _track_hash(val['hash'])
+
+def _track_contiguous_cache(val):
+    header, error = core.read_header(val['d'], core.QContiguousCachePrinter._d_layout)
+    if error:
+        return {'error': error}
+    return {'size': header['count'], 'alloc': header['alloc']}
+
+def _track_size(layout):
+    def track(val):
+        header, error = core.read_header(val['d'], layout)
+        if error:
+            return {'error': error}
+        return {'size': header['size']}
+    return track
+
+def _track_var_length_array(val):
+    return {'size': int(val['s']), 'alloc': int(val['a'])}
+
+_trackers = {
+    core.QByteArrayPrinter: _track_array_data,
+    core.QCachePrinter: _track_cache,
+    core.QContiguousCachePrinter: _track_contiguous_cache,
+    core.QStringPrinter: _track_array_data,
+    core.QVectorPrinter: _track_array_data,
+    core.QListPrinter: _track_list,
+    core.QHashPrinter: _track_hash,
+    core.QSetPrinter: _track_set,
+    core.QMapPrinter: _track_size(core.QMapPrinter._d_layout),
+    core.QLinkedListPrinter: _track_size(core.QLinkedListPrinter._d_layout),
+    core.QVarLengthArrayPrinter: _track_var_length_array,
+}
+"""Functions reading the size fields of containers, by printer class."""
+
+class TrackBreakpoint(gdb.Breakpoint):
+    """A breakpoint that records the sizes of containers and continues.
+
+    Each hit evaluates the tracked expressions and reads only the header
+    of each container (see _trackers), so that hits stay cheap. The
+    function to use is looked up once per container type.
+    """
+
+    def __init__(self, location):
+        super(TrackBreakpoint, self).__init__(location, internal=True)
+        self.location_spec = location
+        self.expressions = []
+        self.trackers = {}
+
+    def stop(self):
+        now = time.time()
+        for expression in self.expressions:
+            sample = {'time': now, 'location': self.location_spec,
+                    'expression': expression}
+            try:
+                val = _parse_and_eval(expression)
+                typename = str(val.type)
+                track = self.trackers.get(typename)
+                if track is None:
+                    pp = core.printer.lookup(val)
+                    track = _trackers.get(type(pp), lambda val: {'error': 'not a container'})
+                    self.trackers[typename] = track
+                sample.update(track(val))
+            except (gdb.error, RuntimeError) as e:
+                sample['error'] = str(e)
+            samples.append(sample)
+        return False
+
+samples = []
+"""The samples recorded by qt-track, oldest first."""
+
+_track_breakpoints = {}
+
+class _QtTrackPrefix(gdb.Command):
+    """Record the sizes of Qt containers each time a location is reached.
+
+Usage: qt-track add LOCATION EXPRESSION
+       qt-track list
+       qt-track export FILE
+       qt-track clear
+       qt-track delete
+
+"qt-track add" sets a breakpoint at LOCATION that, when hit, records the
+size (and the capacity, for arrays and hashes) of the container
+EXPRESSION evaluates to, and continues without stopping. Only the
+container's header is read. "qt-track export" writes the samples to
+FILE, as CSV if its name ends with .csv and as one JSON object per line
+otherwise. "qt-track clear" forgets the samples and "qt-track delete"
+removes the breakpoints."""
+
+    def __init__(self):
+        super(_QtTrackPrefix, self).__init__('qt-track', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_NONE, True)
+
+class _QtTrackAdd(gdb.Command):
+    """Track the size of a container at a location.
+
+Usage: qt-track add LOCATION EXPRESSION"""
+
+    def __init__(self):
+        super(_QtTrackAdd, self).__init__('qt-track add', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_LOCATION)
+
+    def invoke(self, arg, from_tty):
+        location, expression = _split_word(arg)
+        if not location or not expression:
+            raise gdb.GdbError('usage: qt-track add LOCATION EXPRESSION')
+        bp = _track_breakpoints.get(location)
+        if bp is None or not bp.is_valid():
+            bp = _track_breakpoints[location] = TrackBreakpoint(location)
+        bp.expressions.append(expression)
+
+class _QtTrackList(gdb.Command):
+    """List the tracked containers.
+
+Usage: qt-track list"""
+
+    def __init__(self):
+        super(_QtTrackList, self).__init__('qt-track list', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        for location in sorted(_track_breakpoints):
+            bp = _track_breakpoints[location]
+            if not bp.is_valid():
+                continue
+            gdb.write('{:} ({:d} hits): {:}\n'.format(location, bp.hit_count,
+                ', '.join(bp.expressions)))
+        gdb.write('{:d} samples\n'.format(len(samples)))
+
+class _QtTrackExport(gdb.Command):
+    """Write the samples to a file (CSV if it ends with .csv, NDJSON otherwise).
+
+Usage: qt-track export FILE"""
+
+    columns = ('time', 'location', 'expression', 'size', 'alloc', 'numBuckets',
+            'begin', 'end', 'error')
+
+    def __init__(self):
+        super(_QtTrackExport, self).__init__('qt-track export', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_FILENAME)
+
+    def invoke(self, arg, from_tty):
+        filename = arg.strip()
+        if not filename:
+            raise gdb.GdbError('usage: qt-track export FILE')
+        with open(filename, 'w') as f:
+            if filename.endswith('.csv'):
+                writer = csv.writer(f)
+                writer.writerow(self.columns)
+                for sample in samples:
+                    writer.writerow([sample.get(column, '') for column in self.columns])
+            else:
+                for sample in samples:
+                    f.write(json.dumps(sample, sort_keys=True) + '\n')
+        gdb.write('Wrote {:d} samples to {:}.\n'.format(len(samples), filename))
+
+class _QtTrackClear(gdb.Command):
+    """Forget the recorded samples.
+
+Usage: qt-track clear"""
+
+    def __init__(self):
+        super(_QtTrackClear, self).__init__('qt-track clear', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        del samples[:]
+
+class _QtTrackDelete(gdb.Command):
+    """Remove the qt-track breakpoints.
+
+Usage: qt-track delete"""
+
+    def __init__(self):
+        super(_QtTrackDelete, self).__init__('qt-track delete', gdb.COMMAND_BREAKPOINTS,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        for bp in _track_breakpoints.values():
+            if bp.is_valid():
+                bp.delete()
+        _track_breakpoints.clear()
+
+_QtTrackPrefix()
+_QtTrackAdd()
+_QtTrackList()
+_QtTrackExport()
+_QtTrackClear()
+_QtTrackDelete()
+
+class _QtBacktrace(gdb.Command):
+    """Print a backtrace with Qt values summarized.
+
+Usage: qt-bt [BACKTRACE-ARGUMENTS]
+
+Runs "backtrace" with the given arguments (eg: "full" or a number of
+frames), printing Qt arguments and locals as one-line summaries such as
+"QList<QString> (size=120000)", which only read the container headers.
+Other uses of the stack, such as an IDE's view of the locals, are not
+affected."""
+
+    def __init__(self):
+        super(_QtBacktrace, self).__init__('qt-bt', gdb.COMMAND_STACK,
+                gdb.COMPLETE_NONE)
+
+    def invoke(self, arg, from_tty):
+        core.printer.summaries = True
+        try:
+            gdb.execute('backtrace ' + arg, from_tty)
+        finally:
+            core.printer.summaries = False
+
+_QtBacktrace()
@@ -40,20 +40,24 @@
 #############################################################################
 
 import gdb.printing
+import gdb.types
 import itertools
+import struct
+import time
+from . import settings
 from . import typeinfo
-try:
-    import urlparse
-except ImportError:
-    # Python 3
-    import urllib.parse as urlparse
+from . import version
 
 """Qt5Core pretty printer for GDB."""
 
 # NB: no QPair printer: the default should be fine
 
-def _format_jd(jd):
-    """Format a Julian Day in YYYY-MM-DD format."""
+def jd_to_date(jd):
+    """Convert a Julian Day to a (year, month, day) tuple.
+
+    Only integer arithmetic is used, so jd may also be a numpy array of
+    Julian Days, in which case arrays are returned.
+    """
     # maths from http://www.tondering.dk/claus/cal/julperiod.php
     a = jd + 32044
     b = (4 * a + 3) // 146097
@@ -64,9 +68,13 @@ def _format_jd(jd):
     day = e - ( (153 * m + 2) // 5 ) + 1
     month = m + 3 - 12 * ( m // 10 )
     year = 100 * b + d - 4800 + ( m // 10 )
-    return '{:0=4}-{:0=2}-{:0=2}'.format(year, month, day)
+    return (year, month, day)
 
-def _jd_is_valid(jd):
+def _format_jd(jd):
+    """Format a Julian Day in YYYY-MM-DD format."""
+    return '{:0=4}-{:0=2}-{:0=2}'.format(*jd_to_date(jd))
+
+def jd_is_valid(jd):
     """Return whether QDate would consider a given Julian Day valid."""
     return jd >= -784350574879 and jd <= 784354017364
 
@@ -83,11 +91,22 @@ def _ms_is_valid(msecs):
     return msecs >= 0 and msecs <= 86400000
 
 class ArrayIter:
-    """Iterates over a fixed-size array."""
-    def __init__(self, array, size):
+    """Iterates over a fixed-size array.
+
+    If array is a pointer, runs of identical elements longer than gdb's
+    "print repeats" threshold are collapsed into a single child, as gdb
+    does for native arrays (see RepeatDetector).
+    """
+    def __init__(self, array, size, budget=None):
         self.array = array
         self.i = -1
         self.size = size
+        self.detector = None
+        self.threshold = _repeats_threshold()
+        if self.threshold is not None and array.type.code == gdb.TYPE_CODE_PTR:
+            stride = array.type.target().sizeof
+            if stride:
+                self.detector = RepeatDetector(int(array), stride, size, budget)
 
     def __iter__(self):
         return self
@@ -96,30 +115,897 @@ class ArrayIter:
         if self.i + 1 >= self.size:
             raise StopIteration
         self.i += 1
+        if self.detector is not None:
+            run = self.detector.run_length(self.i)
+            if run > self.threshold:
+                first = self.i
+                self.i += run - 1
+                return ('[%d]' % first, _repeated(self.array[first], run))
         return ('[%d]' % self.i, self.array[self.i])
 
     def next(self):
         return self.__next__()
 
-class StructReader:
-    """Reads entries from a struct."""
-    def __init__(self, data):
-        self.data = data.reinterpret_cast(gdb.lookup_type('char').pointer())
-        self.ptr_t = gdb.lookup_type('void').pointer()
-
-    def next_aligned_val(self, typ):
-        ptr_val = int(str(self.data.reinterpret_cast(self.ptr_t)), 16)
-        misalignment = ptr_val % self.ptr_t.sizeof
-        if misalignment > 0:
-            self.data += self.ptr_t.sizeof - misalignment
-        val = self.data.reinterpret_cast(typ.pointer())
-        self.data += typ.sizeof
-        return val.referenced_value()
-
-    def next_val(self, typ):
-        val = self.data.reinterpret_cast(typ.pointer())
-        self.data += typ.sizeof
-        return val.referenced_value()
+def _repeats_threshold():
+    """Return gdb's "print repeats" threshold, or None if it is unlimited."""
+    try:
+        return gdb.parameter('print repeats')
+    except RuntimeError:
+        return 10
+
+def _repeated(value, count):
+    """Format a child standing for count copies of value."""
+    return '{:} <repeats {:d} times>'.format(value, count)
+
+def is_trivially_copyable(typ):
+    """Return whether values of typ can be printed by gdb as plain memory."""
+    typ = typ.strip_typedefs()
+    if typ.code == gdb.TYPE_CODE_ENUM:
+        return True
+    if typ.name and typeinfo.type_is_known_primitive(typ):
+        return True
+    info = typeinfo.lookup_type_info(typ)
+    return info is not None and not info['isComplex']
+
+def _native_array(ptr, count):
+    """Return count elements at ptr as a single gdb array value (T[count])."""
+    return ptr.cast(ptr.type.target().array(count - 1).pointer()).dereference()
+
+def _printed_count(size, el_size):
+    """Return how many of size elements to read for printing.
+
+    Since gdb reads array values in one go, only read what will be printed
+    (plus one, so that gdb still shows "..." when there are more elements)
+    and stay within "max-value-size".
+    """
+    count = size
+    limit = gdb.parameter('print elements')
+    if limit:
+        count = min(count, limit + 1)
+    try:
+        max_size = gdb.parameter('max-value-size')
+    except RuntimeError:
+        max_size = None
+    if max_size and el_size:
+        count = min(count, max(1, max_size // el_size))
+    return count
+
+def _native_count(size, el_size):
+    """Return how many of size elements to hand to gdb as an array, or None.
+
+    gdb only knows about the elements it is given, so a shortened array is
+    only printed truthfully if gdb still prints "..." after it: the array
+    must be longer than "print elements", and runs of repeated elements
+    must not be collapsed, or gdb would print eg: {0 <repeats 201 times>}
+    for millions of zeros. Returns None if the whole array cannot be
+    handed over; such arrays must be printed through children() instead.
+    """
+    count = _printed_count(size, el_size)
+    if count == size:
+        return count
+    limit = gdb.parameter('print elements')
+    if limit and count > limit and _repeats_threshold() is None:
+        return count
+    return None
+
+class RepeatDetector:
+    """Finds runs of identical elements in an array in inferior memory.
+
+    The array is read in chunks of chunk_size bytes (charged to the optional
+    Budget), and elements are compared by their raw bytes, comparing ever
+    larger blocks at once while a run continues.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, address, stride, size, budget=None):
+        self.address = address
+        self.stride = stride
+        self.size = size
+        self.budget = budget
+        self.buf = b''
+        self.buf_start = 0
+        self.buf_count = 0
+
+    def _load(self, i):
+        """Make sure element i is in the buffer; returns False if unreadable."""
+        if self.buf_start <= i < self.buf_start + self.buf_count:
+            return True
+        count = min(self.size - i, max(1, self.chunk_size // self.stride))
+        length = count * self.stride
+        if self.budget is not None and not self.budget.charge(length):
+            return False
+        try:
+            self.buf = read_memory(self.address + i * self.stride, length)
+        except gdb.MemoryError:
+            return False
+        self.buf_start = i
+        self.buf_count = count
+        return True
+
+    def run_length(self, i):
+        """Return the number of consecutive elements equal to element i."""
+        if not self._load(i):
+            return 1
+        stride = self.stride
+        offset = (i - self.buf_start) * stride
+        element = self.buf[offset:offset + stride]
+        run = 1
+        while i + run < self.size:
+            j = i + run
+            if not self._load(j):
+                break
+            offset = (j - self.buf_start) * stride
+            # compare as many elements at once as are already in the run,
+            # so long runs only take a few comparisons
+            count = min(run, self.buf_start + self.buf_count - j)
+            if self.buf[offset:offset + count * stride] == element * count:
+                run += count
+            elif count == 1:
+                break
+            else:
+                while self.buf[offset:offset + stride] == element:
+                    run += 1
+                    offset += stride
+                break
+        return run
+
+_memory_cache = None
+"""A (inferior number, PageReader) pair with the memory prefetched when that
+inferior stopped, or None.
+
+See StopPrefetcher.
+"""
+
+def read_memory(address, length):
+    """Read length bytes of inferior memory at address as a bytes object."""
+    inferior = gdb.selected_inferior()
+    if _memory_cache is not None and _memory_cache[0] == inferior.num:
+        data = _memory_cache[1].cached(address, length)
+        if data is not None:
+            return data
+    return bytes(inferior.read_memory(address, length))
+
+_abi_cache = {}
+
+def target_abi():
+    """Return the struct ABI of the current target.
+
+    The result is a tuple of (byte order prefix, pointer size, alignment of
+    64-bit integers inside structures), suitable for StructLayout.
+    """
+    ptr_size = gdb.lookup_type('void').pointer().sizeof
+    try:
+        arch = gdb.selected_inferior().architecture().name()
+    except (AttributeError, gdb.error):
+        try:
+            arch = gdb.selected_frame().architecture().name()
+        except gdb.error:
+            arch = ''
+    key = (arch, ptr_size)
+    abi = _abi_cache.get(key)
+    if abi is None:
+        byteorder = '<'
+        if 'big endian' in gdb.execute('show endian', to_string=True):
+            byteorder = '>'
+        int64_align = 8
+        if ptr_size == 4 and arch.startswith('i386'):
+            # the i386 System V ABI only aligns 64-bit integers to 4 bytes
+            # inside structures (Windows compilers still use 8)
+            osabi = gdb.execute('show osabi', to_string=True)
+            if 'Windows' not in osabi and 'Cygwin' not in osabi:
+                int64_align = 4
+        abi = (byteorder, ptr_size, int64_align)
+        _abi_cache[key] = abi
+    return abi
+
+class StructLayout:
+    """Describes the memory layout of a C++ structure.
+
+    The structure is declared once as a list of (name, kind) pairs, where
+    kind is one of the keys of StructLayout.kinds. Fields named None are
+    skipped over. Offsets are computed using the alignment rules of the
+    target ABI, and the whole structure is fetched with a single memory
+    read and decoded with a precompiled struct.Struct.
+    """
+
+    kinds = {
+        'int8': 'b',
+        'uint8': 'B',
+        'int16': 'h',
+        'uint16': 'H',
+        'int32': 'i',
+        'uint32': 'I',
+        'int64': 'q',
+        'uint64': 'Q',
+        'ptr': None,
+        'ptrdiff': None,
+    }
+    """Map from field kinds to struct format characters.
+
+    Pointer-sized kinds depend on the target and are resolved when the
+    layout is compiled.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self._compiled = {}
+
+    def compile(self, abi=None):
+        """Return (struct.Struct, field names, field offsets) for an ABI."""
+        if abi is None:
+            abi = target_abi()
+        compiled = self._compiled.get(abi)
+        if compiled is not None:
+            return compiled
+
+        byteorder, ptr_size, int64_align = abi
+        fmt = byteorder
+        names = []
+        offsets = {}
+        offset = 0
+        max_align = 1
+        for name, kind in self.fields:
+            code = self.kinds[kind]
+            if code is None:
+                code = {4: 'i', 8: 'q'}[ptr_size]
+                if kind == 'ptr':
+                    code = code.upper()
+            size = struct.calcsize('<' + code)
+            align = int64_align if size == 8 else size
+            max_align = max(max_align, align)
+            padding = -offset % align
+            if padding:
+                fmt += '{:d}x'.format(padding)
+                offset += padding
+            if name is None:
+                fmt += '{:d}x'.format(size)
+            else:
+                fmt += code
+                names.append(name)
+                offsets[name] = offset
+            offset += size
+        # trailing padding, so that arrays of the struct work
+        padding = -offset % max_align
+        if padding:
+            fmt += '{:d}x'.format(padding)
+
+        compiled = (struct.Struct(fmt), tuple(names), offsets)
+        self._compiled[abi] = compiled
+        return compiled
+
+    def sizeof(self, abi=None):
+        """Return the size of the structure in bytes."""
+        return self.compile(abi)[0].size
+
+    def offsetof(self, field, abi=None):
+        """Return the offset of the named field in bytes."""
+        return self.compile(abi)[2][field]
+
+    def unpack(self, data, offset=0, abi=None):
+        """Decode the structure from a bytes object, returning a dict."""
+        st, names, _ = self.compile(abi)
+        return dict(zip(names, st.unpack_from(data, offset)))
+
+    def read(self, address, abi=None):
+        """Fetch the structure at address and return its fields as a dict."""
+        st, names, _ = self.compile(abi)
+        return dict(zip(names, st.unpack(read_memory(int(address), st.size))))
+
+qarraydata_layout = StructLayout('QArrayData', [
+    ('ref', 'int32'),
+    ('size', 'int32'),
+    ('alloc', 'uint32'), # alloc:31, capacityReserved:1
+    ('offset', 'ptrdiff'),
+    ])
+"""Layout of QArrayData, the header of QString, QByteArray and QVector."""
+
+def _read_array_data(d, el_size, budget):
+    """Read the payload of the QArrayData at address d within budget.
+
+    Returns a tuple of (bytes, None), or (None, reason) if the header does
+    not look sane (see check_array_data). The payload is cut short, at an
+    element boundary, once the budget is exhausted.
+    """
+    if not int(d):
+        return (b'', None)
+    header, error = check_array_data(d, el_size)
+    if error:
+        return (None, error)
+    length = budget.clamp(header['size'] * el_size) // el_size * el_size
+    data = read_memory(int(d) + header['offset'], length) if length else b''
+    return (data, None)
+
+def utf16():
+    """Return the name of the UTF-16 codec matching the target byte order."""
+    return 'utf-16-be' if target_abi()[0] == '>' else 'utf-16-le'
+
+def _decode_qstring(d, budget):
+    """Decode the QString whose QArrayData lives at address d."""
+    data, error = _read_array_data(d, 2, budget)
+    if error:
+        return corrupted(error)
+    return data.decode(utf16(), 'replace')
+
+def _decode_qbytearray(d, budget):
+    """Decode the QByteArray whose QArrayData lives at address d."""
+    data, error = _read_array_data(d, 1, budget)
+    if error:
+        return corrupted(error)
+    return data.decode('utf-8', 'replace')
+
+class PageReader:
+    """Serves small reads from cached page-sized chunks of inferior memory.
+
+    Pages are fetched in address order, and runs of adjacent pages are
+    fetched with a single read, so that reading many small structures
+    that live close together costs few round-trips to the target.
+    Unreadable pages are remembered as such, as are pages that could not
+    be read because the (optional) Budget was exhausted.
+    """
+
+    page_size = 4096
+
+    def __init__(self, budget=None):
+        self.pages = {}
+        self.budget = budget
+
+    def _fetch_run(self, first, count):
+        if self.budget is not None and not self.budget.charge(count * self.page_size):
+            for page in range(first, first + count):
+                self.pages[page] = None
+            return
+        try:
+            data = read_memory(first * self.page_size, count * self.page_size)
+        except gdb.MemoryError:
+            if count == 1:
+                self.pages[first] = None
+                return
+            # find out which pages are actually unreadable
+            for page in range(first, first + count):
+                self._fetch_run(page, 1)
+            return
+        for i in range(count):
+            start = i * self.page_size
+            self.pages[first + i] = data[start:start + self.page_size]
+
+    def prefetch(self, addresses, length):
+        """Fetch the pages covering length bytes at each of the addresses."""
+        self.prefetch_ranges((address, length) for address in addresses)
+
+    def prefetch_ranges(self, ranges):
+        """Fetch the pages covering each of the (address, length) ranges."""
+        wanted = set()
+        for address, length in ranges:
+            first = address // self.page_size
+            last = (address + length - 1) // self.page_size
+            for page in range(first, last + 1):
+                if page not in self.pages:
+                    wanted.add(page)
+        run_start = None
+        run_length = 0
+        for page in sorted(wanted):
+            if run_start is not None and page == run_start + run_length:
+                run_length += 1
+                continue
+            if run_start is not None:
+                self._fetch_run(run_start, run_length)
+            run_start = page
+            run_length = 1
+        if run_start is not None:
+            self._fetch_run(run_start, run_length)
+
+    def cached(self, address, length):
+        """Return length bytes at address if they have already been fetched.
+
+        Returns None if any of the pages was not fetched or is unreadable.
+        """
+        page = address // self.page_size
+        last = (address + length - 1) // self.page_size
+        for p in range(page, last + 1):
+            if self.pages.get(p) is None:
+                return None
+        return self.read(address, length)
+
+    def read(self, address, length):
+        """Return length bytes at address, or None if they are unreadable."""
+        self.prefetch([address], length)
+        page = address // self.page_size
+        offset = address % self.page_size
+        chunks = []
+        while length > 0:
+            data = self.pages[page]
+            if data is None:
+                return None
+            chunk = data[offset:offset + length]
+            chunks.append(chunk)
+            length -= len(chunk)
+            page += 1
+            offset = 0
+        return b''.join(chunks)
+
+class RangeReader:
+    """Reads many small ranges of inferior memory, merging those close together.
+
+    Unlike PageReader, which fetches whole pages, only the requested bytes
+    (and gaps of at most max_gap bytes between them) are read and charged
+    to the optional Budget. This suits small structures scattered over
+    the heap, where most of a page would be read for nothing.
+    """
+
+    max_gap = 256
+
+    def __init__(self, budget=None):
+        self.budget = budget
+
+    def _read(self, start, end):
+        if self.budget is not None and not self.budget.charge(end - start):
+            return None
+        try:
+            return read_memory(start, end - start)
+        except gdb.MemoryError:
+            return None
+
+    def read_ranges(self, ranges):
+        """Return the bytes of each (address, length) range, None where unreadable."""
+        ranges = list(ranges)
+        result = [None] * len(ranges)
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        runs = []
+        for i in order:
+            address, length = ranges[i]
+            if runs and address <= runs[-1][1] + self.max_gap:
+                runs[-1][1] = max(runs[-1][1], address + length)
+                runs[-1][2].append(i)
+            else:
+                runs.append([address, address + length, [i]])
+        for start, end, members in runs:
+            data = self._read(start, end)
+            if data is None and len(members) > 1:
+                # find out which of the ranges are unreadable
+                for i in members:
+                    address, length = ranges[i]
+                    result[i] = self._read(address, address + length)
+                continue
+            for i in members:
+                address, length = ranges[i]
+                if data is not None:
+                    result[i] = data[address - start:address - start + length]
+        return result
+
+def unpack_pointers(data):
+    """Decodes a bytes object holding an array of target pointers."""
+    byteorder, ptr_size = target_abi()[:2]
+    code = {4: 'I', 8: 'Q'}[ptr_size]
+    return list(struct.unpack('{:}{:d}{:}'.format(byteorder, len(data) // ptr_size, code), data))
+
+def gather_nodes(roots, layout, links, limit, budget=None, reader=None):
+    """Reads the nodes of a pointer-linked structure breadth-first.
+
+    Starting from the root addresses, the headers of all nodes in the
+    current frontier are fetched together (see PageReader), decoded using
+    layout, and the pointer fields named in links are followed to form the
+    next frontier. Nodes are only visited once, so cycles terminate, and no
+    more than limit nodes are read.
+
+    Returns a tuple (nodes, complete), where nodes maps node addresses to
+    their decoded header fields, and complete is False if the limit was
+    reached, the budget ran out or some node could not be read (in which
+    case the budget, if any, is marked as failed). An existing PageReader
+    may be passed in to reuse the memory it has already fetched.
+    """
+    if reader is None:
+        reader = PageReader(budget)
+    size = layout.sizeof()
+    nodes = {}
+    complete = True
+    seen = set()
+    frontier = []
+    for root in roots:
+        if root and root not in seen:
+            seen.add(root)
+            frontier.append(root)
+    while frontier:
+        if len(nodes) + len(frontier) > limit:
+            frontier = frontier[:max(0, limit - len(nodes))]
+            complete = False
+        reader.prefetch(frontier, size)
+        next_frontier = []
+        for address in frontier:
+            data = reader.read(address, size)
+            if data is None:
+                complete = False
+                continue
+            fields = layout.unpack(data)
+            nodes[address] = fields
+            for link in links:
+                child = fields[link]
+                if child and child not in seen:
+                    seen.add(child)
+                    next_frontier.append(child)
+        frontier = next_frontier
+    if not complete and budget is not None:
+        budget.fail('corrupted or unreadable nodes')
+    return (nodes, complete)
+
+class Budget:
+    """Limits the time spent and the memory read while printing one value.
+
+    The limits are taken from the "qt5printers time-limit" and
+    "qt5printers bytes-limit" settings when the budget is created. Once the
+    budget is exhausted, exhausted describes why.
+    """
+
+    byte_limit_reason = 'byte limit reached'
+
+    def __init__(self):
+        seconds = settings.time_limit.value
+        self.deadline = time.time() + seconds if seconds else None
+        self.bytes_left = settings.bytes_limit.value
+        self.exhausted = None
+
+    def charge(self, nbytes):
+        """Account for reading nbytes; returns False once the budget is exhausted."""
+        if self.exhausted:
+            return False
+        if self.bytes_left is not None:
+            self.bytes_left -= nbytes
+            if self.bytes_left < 0:
+                self.exhausted = self.byte_limit_reason
+                return False
+        if self.deadline is not None and time.time() > self.deadline:
+            self.exhausted = 'time limit reached'
+            return False
+        return True
+
+    def clamp(self, nbytes):
+        """Charge for up to nbytes, returning how many may actually be read."""
+        if self.bytes_left is not None and nbytes > self.bytes_left:
+            allowed = max(0, self.bytes_left)
+            self.charge(nbytes)
+            return allowed
+        self.charge(nbytes)
+        return nbytes
+
+    def fail(self, reason):
+        """Mark the result as partial for some other reason."""
+        if not self.exhausted:
+            self.exhausted = reason
+
+    def marker(self):
+        """Return the text marking a result as partial."""
+        return '<partial: {:}>'.format(self.exhausted)
+
+class BudgetIter:
+    """Wraps a children iterator so that it stops when its budget runs out.
+
+    Every child is charged el_size bytes. If the budget is exhausted, or the
+    wrapped iterator stopped early after calling Budget.fail(), a final child
+    marks the result as partial. If pairs is True, the children are key/value
+    pairs (as for the 'map' display hint) and the budget is only checked
+    before keys.
+    """
+
+    def __init__(self, it, budget, el_size=0, pairs=False):
+        self.it = iter(it)
+        self.budget = budget
+        self.el_size = el_size
+        self.pairs = pairs
+        self.i = 0
+        self.pending = None
+
+    def __iter__(self):
+        return self
+
+    def _finish(self):
+        marker = self.budget.marker()
+        if self.pairs:
+            self.pending = [('...', marker)]
+            return ('...', '...')
+        self.pending = []
+        return ('...', marker)
+
+    def __next__(self):
+        if self.pending is not None:
+            if not self.pending:
+                raise StopIteration
+            return self.pending.pop(0)
+        if not self.pairs or self.i % 2 == 0:
+            if not self.budget.charge(self.el_size):
+                return self._finish()
+        try:
+            item = next(self.it)
+        except StopIteration:
+            if self.budget.exhausted:
+                return self._finish()
+            raise
+        self.i += 1
+        return item
+
+    def next(self):
+        return self.__next__()
+
+_max_ref = 1 << 24
+"""Reference counts above this are assumed to be garbage."""
+
+def corrupted(reason):
+    """Return the text shown for a value whose data is broken."""
+    return '<corrupted: {:}>'.format(reason)
+
+def _is_readable(address):
+    try:
+        read_memory(address, 1)
+        return True
+    except gdb.MemoryError:
+        return False
+
+def read_header(d, layout):
+    """Read and sanity-check the header of a container's d-pointer.
+
+    Returns a tuple of (fields, None) if the header looks sane, or
+    (None, reason) if it does not.
+    """
+    d = int(d)
+    if not d:
+        return (None, 'null d-pointer')
+    if d % target_abi()[1]:
+        return (None, 'misaligned d-pointer')
+    try:
+        fields = layout.read(d)
+    except gdb.MemoryError:
+        return (None, 'unreadable d-pointer')
+    if 'ref' in fields and not -1 <= fields['ref'] < _max_ref:
+        return (None, 'bad reference count')
+    if fields.get('size', 0) < 0:
+        return (None, 'negative size')
+    return (fields, None)
+
+def check_array_data(d, el_size):
+    """Read and sanity-check a QArrayData header (see read_header)."""
+    header, error = read_header(d, qarraydata_layout)
+    if error:
+        return (None, error)
+    alloc = header['alloc'] & 0x7fffffff
+    size = header['size']
+    # raw and static data have no allocation
+    if alloc and size > alloc:
+        return (None, 'size exceeds allocation')
+    if size and not _is_readable(int(d) + header['offset'] + size * el_size - 1):
+        return (None, 'unreadable data')
+    return (header, None)
+
+_summary_chars = 40
+"""The number of characters of a string to show in summaries."""
+
+def _summarize(val, details):
+    """Format a summary of val, such as "QList<int> (size=3)"."""
+    return '{:} ({:})'.format(val.type.unqualified(), details)
+
+def _summarize_size(val, header, error, field='size'):
+    if error:
+        return _summarize(val, corrupted(error))
+    return _summarize(val, '{:}={:d}'.format(field, header[field]))
+
+def _summarize_text(val, size, text):
+    text = (text.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t'))
+    if size > _summary_chars:
+        text += '...'
+    return '{:} (len={:d}) "{:}"'.format(val.type.unqualified(), size, text)
+
+_qmetaobject_layout = StructLayout('QMetaObject', [
+    ('superdata', 'ptr'),
+    ('stringdata', 'ptr'),
+    ('data', 'ptr'),
+    ('static_metacall', 'ptr'),
+    ('relatedMetaObjects', 'ptr'),
+    ('extradata', 'ptr'),
+    ])
+
+_qmetaobjectprivate_layout = StructLayout('QMetaObjectPrivate', [
+    ('revision', 'int32'),
+    ('className', 'int32'),
+    ('classInfoCount', 'int32'),
+    ('classInfoData', 'int32'),
+    ('methodCount', 'int32'),
+    ('methodData', 'int32'),
+    ('propertyCount', 'int32'),
+    ('propertyData', 'int32'),
+    ('enumeratorCount', 'int32'),
+    ('enumeratorData', 'int32'),
+    ('constructorCount', 'int32'),
+    ('constructorData', 'int32'),
+    ('flags', 'int32'),
+    ('signalCount', 'int32'),
+    ])
+
+class MetaObject:
+    """The decoded contents of a QMetaObject (see meta_object())."""
+
+    method_kinds = ('method', 'signal', 'slot', 'constructor')
+    """Method kinds, indexed by the MethodTypeMask bits of the method flags."""
+
+    def __init__(self, address, superdata, class_name, methods, properties, signal_count):
+        self.address = address
+        self.superdata = superdata
+        """The address of the superclass's QMetaObject (or 0)."""
+        self.class_name = class_name
+        self.methods = methods
+        """The methods declared by the class, as (name, kind) pairs."""
+        self.properties = properties
+        """The names of the properties declared by the class."""
+        self.signal_count = signal_count
+
+    @classmethod
+    def read(cls, address):
+        """Decode the QMetaObject at address; returns None if it cannot be."""
+        header = _qmetaobject_layout.read(address)
+        private = _qmetaobjectprivate_layout.read(header['data'])
+        # Qt 5 metaobjects are revision 7 and later
+        if private['revision'] < 7:
+            return None
+        int_size = 4
+        method_ints = private['methodCount'] * 5
+        property_ints = private['propertyCount'] * 3
+        byteorder = target_abi()[0]
+        methods = struct.unpack('{:}{:d}i'.format(byteorder, method_ints),
+                read_memory(header['data'] + private['methodData'] * int_size,
+                    method_ints * int_size))
+        properties = struct.unpack('{:}{:d}i'.format(byteorder, property_ints),
+                read_memory(header['data'] + private['propertyData'] * int_size,
+                    property_ints * int_size))
+
+        # a method is (name, argc, parameters, tag, flags), a property is
+        # (name, type, flags); names are indices into the string table
+        names = [private['className']] + list(methods[0::5]) + list(properties[0::3])
+        strings = _read_string_table(header['stringdata'], names)
+        method_list = [(strings[methods[i]], cls.method_kinds[(methods[i + 4] >> 2) & 3])
+                for i in range(0, method_ints, 5)]
+        property_list = [strings[properties[i]] for i in range(0, property_ints, 3)]
+        return cls(address, header['superdata'], strings[private['className']],
+                method_list, property_list, private['signalCount'])
+
+def _read_string_table(stringdata, indices):
+    """Read entries of a moc string table (an array of QByteArrayData).
+
+    Returns a dict mapping the indices to the decoded strings. All headers
+    and strings are fetched through one PageReader, as they are close
+    together.
+    """
+    layout = qarraydata_layout
+    reader = PageReader()
+    addresses = dict((i, stringdata + i * layout.sizeof()) for i in set(indices))
+    reader.prefetch(addresses.values(), layout.sizeof())
+    strings = {}
+    for i, address in addresses.items():
+        data = reader.read(address, layout.sizeof())
+        if data is None:
+            raise gdb.MemoryError('cannot read the string table')
+        header = layout.unpack(data)
+        text = reader.read(address + header['offset'], header['size']) if header['size'] > 0 else b''
+        if text is None:
+            raise gdb.MemoryError('cannot read the string table')
+        strings[i] = text.decode('utf-8', 'replace')
+    return strings
+
+_meta_objects = {}
+_static_meta_objects = {}
+_qobject_bases = {}
+
+def meta_object(address):
+    """Return the MetaObject at address, or None if it cannot be read.
+
+    Metaobjects are generated by moc and never change, so each one is only
+    decoded once per objfile; later calls just check that the QMetaObject
+    at the address is still the same.
+    """
+    try:
+        header = read_memory(address, _qmetaobject_layout.sizeof())
+    except gdb.MemoryError:
+        return None
+    key = (gdb.solib_name(address), address)
+    cached = _meta_objects.get(key)
+    if cached is not None and cached[0] == header:
+        return cached[1]
+    try:
+        result = MetaObject.read(address)
+    except (gdb.MemoryError, struct.error):
+        result = None
+    _meta_objects[key] = (header, result)
+    return result
+
+def static_meta_object(typ):
+    """Return the address of the staticMetaObject of a QObject subclass, or None.
+
+    Classes without a Q_OBJECT macro use the one of their closest base
+    class that has one.
+    """
+    typ = typ.strip_typedefs()
+    name = typ.tag
+    if not name:
+        return None
+    if name not in _static_meta_objects:
+        address = None
+        symbol = gdb.lookup_global_symbol(name + '::staticMetaObject')
+        if symbol is not None:
+            address = int(symbol.value().address)
+        else:
+            for field in typ.fields():
+                if field.is_base_class:
+                    address = static_meta_object(field.type)
+                    if address is not None:
+                        break
+        _static_meta_objects[name] = address
+    return _static_meta_objects[name]
+
+def qobject_base(typ):
+    """Return the QObject type if typ is QObject or derives from it, else None."""
+    typ = gdb.types.get_basic_type(typ)
+    name = typ.tag
+    if not name or typ.code != gdb.TYPE_CODE_STRUCT:
+        return None
+    if name not in _qobject_bases:
+        base = None
+        if name == 'QObject':
+            base = typ
+        else:
+            for field in typ.fields():
+                if field.is_base_class:
+                    base = qobject_base(field.type)
+                    if base is not None:
+                        break
+        _qobject_bases[name] = base
+    return _qobject_bases[name]
+
+def _meta_object_chain(address):
+    """Return the MetaObjects of a class and its superclasses, base class first.
+
+    Returns None if any of them cannot be read.
+    """
+    chain = []
+    seen = set()
+    while address and address not in seen:
+        seen.add(address)
+        meta = meta_object(address)
+        if meta is None:
+            return None
+        chain.append(meta)
+        address = meta.superdata
+    chain.reverse()
+    return chain
+
+def signal_name(address, signal_index):
+    """Return the name of a signal of the class with the metaobject at address.
+
+    signal_index counts the signals of all superclasses first, as in
+    QMetaObject::activate() and the connection lists; each class declares
+    its own signals first in its method table. Returns None if the index
+    is out of range or a metaobject cannot be read.
+    """
+    for meta in _meta_object_chain(address) or []:
+        if signal_index < meta.signal_count:
+            return meta.methods[signal_index][0]
+        signal_index -= meta.signal_count
+    return None
+
+def method_name(address, method_index):
+    """Return the name of a method of the class with the metaobject at address.
+
+    method_index counts the methods of all superclasses first, like
+    QMetaObject::method(). Returns None if the index is out of range or a
+    metaobject cannot be read.
+    """
+    for meta in _meta_object_chain(address) or []:
+        if method_index < len(meta.methods):
+            return meta.methods[method_index][0]
+        method_index -= len(meta.methods)
+    return None
+
+def _forget_meta_objects(event=None):
+    _meta_objects.clear()
+    _static_meta_objects.clear()
+    _qobject_bases.clear()
 
 class QBitArrayPrinter:
     """Print a Qt5 QBitArray"""
@@ -148,21 +1034,39 @@ class QBitArrayPrinter:
     def __init__(self, val):
         self.val = val
 
-    def children(self):
+    def data(self):
+        """Returns (data, number of bits, reason the header is corrupted)."""
         d = self.val['d']['d']
-        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        size = (int(d['size']) << 3) - int(data[0])
+        header, error = check_array_data(d, 1)
+        if error:
+            return (None, 0, error)
+        if header['size'] == 0:
+            return (None, 0, None)
+        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + header['offset']
+        return (data, (header['size'] << 3) - int(data[0]), None)
 
-        return self.Iter(data, size)
+    def children(self):
+        data, size, error = self.data()
+        if size <= 0:
+            return []
+
+        # charge a byte for every 8 bits
+        return BudgetIter(self.Iter(data, size), Budget(), 0.125)
 
     def to_string(self):
-        d = self.val['d']['d']
-        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        size = (int(d['size']) << 3) - int(data[0])
+        data, size, error = self.data()
+        if error:
+            return corrupted(error)
         if size == 0:
             return '<empty>'
         return None
 
+    def summary(self):
+        data, size, error = self.data()
+        if error:
+            return _summarize(self.val, corrupted(error))
+        return _summarize(self.val, 'size={:d}'.format(size))
+
     def display_hint(self):
         return 'array'
 
@@ -174,17 +1078,166 @@ class QByteArrayPrinter:
 
     def children(self):
         d = self.val['d']
-        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        return ArrayIter(data, d['size'])
+        header, error = check_array_data(d, 1)
+        if error:
+            return []
+        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + header['offset']
+        budget = Budget()
+        it = ArrayIter(data, header['size'], budget)
+        # with repeat detection, the array is read (and charged) in chunks
+        return BudgetIter(it, budget, 0 if it.detector else 1)
 
     def to_string(self):
         d = self.val['d']
-        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        return data.string('', 'replace', d['size'])
+        header, error = check_array_data(d, 1)
+        if error:
+            return corrupted(error)
+        budget = Budget()
+        length = budget.clamp(header['size'])
+        data = read_memory(int(d) + header['offset'], length) if length else b''
+        result = data.decode('utf-8', 'replace')
+        if budget.exhausted:
+            result += '...' + budget.marker()
+        return result
+
+    def summary(self):
+        d = self.val['d']
+        header, error = check_array_data(d, 1)
+        if error:
+            return _summarize(self.val, corrupted(error))
+        size = header['size']
+        data = read_memory(int(d) + header['offset'], min(size, _summary_chars))
+        return _summarize_text(self.val, size, data.decode('utf-8', 'replace'))
 
     def display_hint(self):
         return 'string'
 
+class QCachePrinter:
+    """Print a Qt5 QCache"""
+
+    _node_layout = StructLayout('QCache::Node', [
+        ('keyPtr', 'ptr'),
+        ('t', 'ptr'),
+        ('c', 'int32'),
+        ('p', 'ptr'),
+        ('n', 'ptr'),
+        ])
+
+    _hash_node_layout = StructLayout('QHashNode', [
+        ('next', 'ptr'),
+        ])
+
+    class Iter:
+        """Iterates over the entries from the most to the least recently used."""
+
+        def __init__(self, val, header, budget):
+            self.val = val
+            self.header = header
+            self.size = header['size']
+            self.budget = budget
+            typ = val.type.strip_typedefs()
+            self.key_type = typ.template_argument(0)
+            self.value_type = typ.template_argument(1)
+            self.nodes = None
+            self.show_cost = False
+            self.i = -1
+
+        def __iter__(self):
+            return self
+
+        def _hash_nodes(self, reader):
+            """Returns the addresses of the Nodes stored in the hash, or None."""
+            d = int(self.val['hash']['d'])
+            ptr_size = target_abi()[1]
+            data = reader.read(self.header['buckets'], self.header['numBuckets'] * ptr_size)
+            if data is None:
+                return None
+            heads = [bucket for bucket in unpack_pointers(data) if bucket != d]
+            # the chains end at the QHashData, whose first field is null
+            nodes, complete = gather_nodes(heads, QCachePrinter._hash_node_layout,
+                    ('next',), self.size + 1, self.budget, reader)
+            node_type = self.val['hash']['e'].type.target().strip_typedefs()
+            offset = node_type['value'].bitpos // 8
+            return set(node + offset for node in nodes if node != d)
+
+        def _gather(self):
+            # Find all nodes through the hash first, which fetches whole
+            # levels of the bucket chains at once, so that the walk of the
+            # usage list below is served from pages that are already read.
+            reader = PageReader(self.budget)
+            layout = QCachePrinter._node_layout
+            known = self._hash_nodes(reader)
+            if known is not None:
+                reader.prefetch(known, layout.sizeof())
+            self.nodes = []
+            current = int(self.val['f'])
+            while current and len(self.nodes) < self.size:
+                if known is not None and current not in known:
+                    break
+                data = reader.read(current, layout.sizeof())
+                if data is None:
+                    break
+                fields = layout.unpack(data)
+                self.nodes.append(fields)
+                current = fields['n']
+            if len(self.nodes) < self.size:
+                self.budget.fail('list shorter than its size')
+            self.show_cost = any(node['c'] != 1 for node in self.nodes)
+
+        def __next__(self):
+            if self.nodes is None:
+                self._gather()
+            if self.i + 1 >= 2 * len(self.nodes):
+                raise StopIteration
+            self.i += 1
+            node = self.nodes[self.i // 2]
+            if self.i % 2 == 0:
+                key = gdb.Value(node['keyPtr']).cast(self.key_type.pointer())
+                return ('key' + str(self.i // 2), key.dereference())
+            value = gdb.Value(node['t']).cast(self.value_type.pointer()).dereference()
+            if self.show_cost:
+                value = '{:} (cost={:d})'.format(value, node['c'])
+            return ('value' + str(self.i // 2), value)
+
+        def next(self):
+            return self.__next__()
+
+    def __init__(self, val):
+        self.val = val
+
+    def header(self):
+        """Returns the sanity-checked QHashData fields of the cache's hash."""
+        return QHashPrinter(self.val['hash']).header()
+
+    def children(self):
+        header, error = self.header()
+        if error or header['size'] == 0:
+            return []
+
+        budget = Budget()
+        return BudgetIter(self.Iter(self.val, header, budget), budget,
+                self._node_layout.sizeof(), True)
+
+    def to_string(self):
+        header, error = self.header()
+        if error:
+            return corrupted(error)
+        # if we return an empty list from children, gdb doesn't print anything
+        if header['size'] == 0:
+            return '<empty>'
+        return 'totalCost={:d}, maxCost={:d}'.format(int(self.val['total']),
+                int(self.val['mx']))
+
+    def summary(self):
+        header, error = self.header()
+        if error:
+            return _summarize(self.val, corrupted(error))
+        return _summarize(self.val, 'size={:d}, totalCost={:d}'.format(header['size'],
+            int(self.val['total'])))
+
+    def display_hint(self):
+        return 'map'
+
 class QCharPrinter:
     """Print a Qt5 QChar"""
 
@@ -207,6 +1260,118 @@ class QCharPrinter:
         # we do above
         return 'char'
 
+class QContiguousCachePrinter:
+    """Print a Qt5 QContiguousCache"""
+
+    _d_layout = StructLayout('QContiguousCacheData', [
+        ('ref', 'int32'),
+        ('alloc', 'int32'),
+        ('count', 'int32'),
+        ('start', 'int32'),
+        ('offset', 'int32'),
+        ])
+
+    class Iter:
+        """Iterates over the elements by their logical index.
+
+        The elements live in a ring buffer, so they are fetched as (at
+        most) two native arrays: from start to the end of the buffer, and
+        from the start of the buffer onwards.
+        """
+
+        def __init__(self, data, header, count, budget):
+            self.first = header['offset']
+            self.budget = budget
+            head = min(count, header['alloc'] - header['start'])
+            self.segments = [(data + header['start'], head), (data, count - head)]
+            self.array = None
+            self.array_size = 0
+            self.i = -1
+            self.j = 0
+            self.waiting_for_value = False
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            if self.waiting_for_value:
+                self.waiting_for_value = False
+                value = self.array[self.j]
+                self.j += 1
+                return ('value' + str(self.i), value)
+
+            while self.j >= self.array_size:
+                if not self.segments:
+                    raise StopIteration
+                ptr, size = self.segments.pop(0)
+                if size <= 0:
+                    continue
+                try:
+                    self.array = _native_array(ptr, size)
+                    self.array.fetch_lazy()
+                except gdb.MemoryError:
+                    self.budget.fail('unreadable elements')
+                    raise StopIteration
+                self.array_size = size
+                self.j = 0
+            self.i += 1
+            self.waiting_for_value = True
+            return ('key' + str(self.i), self.first + self.i)
+
+        def next(self):
+            return self.__next__()
+
+    def __init__(self, val):
+        self.val = val
+
+    def header(self):
+        """Returns the sanity-checked QContiguousCacheData fields (see read_header)."""
+        header, error = read_header(self.val['d'], self._d_layout)
+        if error:
+            return (None, error)
+        alloc = header['alloc']
+        if alloc < 0 or not 0 <= header['count'] <= alloc:
+            return (None, 'bad count')
+        if alloc and not 0 <= header['start'] < alloc:
+            return (None, 'bad start')
+        if header['count'] and not _is_readable(int(self.data()) +
+                alloc * self.data().type.target().sizeof - 1):
+            return (None, 'unreadable data')
+        return (header, None)
+
+    def data(self):
+        """Returns a pointer to the ring buffer."""
+        el_type = self.val.type.strip_typedefs().template_argument(0)
+        return self.val['p']['array'].address.cast(el_type.pointer())
+
+    def children(self):
+        header, error = self.header()
+        if error or header['count'] == 0:
+            return []
+
+        data = self.data()
+        el_size = data.type.target().sizeof
+        budget = Budget()
+        # only fetch what gdb will print
+        count = _printed_count(header['count'], el_size)
+        return BudgetIter(self.Iter(data, header, count, budget), budget, el_size, True)
+
+    def to_string(self):
+        header, error = self.header()
+        if error:
+            return corrupted(error)
+        # if we return an empty list from children, gdb doesn't print anything
+        if header['count'] == 0:
+            return '<empty>'
+        return None
+
+    def summary(self):
+        header, error = self.header()
+        return _summarize_size(self.val, header, error, 'count')
+
+    def display_hint(self):
+        return 'map'
+
 class QDatePrinter:
     """Print a Qt5 QDate"""
 
@@ -215,7 +1380,7 @@ class QDatePrinter:
 
     def to_string(self):
         jd = int(self.val['jd'])
-        if not _jd_is_valid(jd):
+        if not jd_is_valid(jd):
             return '<invalid>'
         return _format_jd(jd)
 
@@ -231,63 +1396,123 @@ class QDateTimePrinter:
     _unix_epoch_jd = 2440588
     _ms_per_day = 86400000
 
-    # status field
+    # status field (Qt < 5.7)
     _validDate = 0x04
     _validTime = 0x08
     _validDateTime = 0x10
     _timeZoneCached = 0x20
 
+    # status field (Qt >= 5.7)
+    _shortData57 = 0x01
+    _validDate57 = 0x02
+    _validTime57 = 0x04
+    _validDateTime57 = 0x08
+    _timeSpecMask57 = 0x30
+    _timeSpecShift57 = 4
+
     # time spec
     _localTime = 0
     _UTC = 1
     _offsetFromUTC = 2
     _timeZone = 3
 
-    def to_string(self):
-        d = self.val['d']['d']
+    # These fields (including order) are private, and change between
+    # Qt releases; the version profile picks the right one
+    _layout_5_0 = StructLayout('QDateTimePrivate', [
+        ('ref', 'int32'),
+        ('msecs', 'int64'),
+        ('spec', 'int32'),
+        ('offsetFromUtc', 'int32'),
+        ('timeZone', 'ptr'), # QSharedDataPointer<QTimeZonePrivate>
+        ('status', 'int32'),
+        ])
+    _layout_5_7 = StructLayout('QDateTimePrivate', [
+        ('status', 'int32'),
+        ('msecs', 'int64'),
+        ('offsetFromUtc', 'int32'),
+        ('ref', 'int32'),
+        ('timeZone', 'ptr'), # QSharedDataPointer<QTimeZonePrivate>
+        ])
+
+    @classmethod
+    def _read_private(cls, layout, d, pages):
+        if pages is None:
+            return layout.read(d)
+        data = pages.read(d, layout.sizeof())
+        if data is None:
+            raise gdb.MemoryError('Cannot access memory at address 0x{:x}'.format(d))
+        return layout.unpack(data)
+
+    @classmethod
+    def _read_5_0(cls, d, pages=None):
         if not d:
-            return '<invalid>'
-
-        try:
-            qshareddata_t = gdb.lookup_type('QSharedData')
-        except gdb.error:
-            try:
-                # well, it only has a QAtomicInt in it
-                qshareddata_t = gdb.lookup_type('QAtomicInt')
-            except gdb.error:
-                # let's hope it's the same size as an int
-                qshareddata_t = gdb.lookup_type('int')
-        try:
-            timespec_t = gdb.lookup_type('Qt::TimeSpec')
-        except gdb.error:
-            # probably an int
-            timespec_t = gdb.lookup_type('int')
-
-        reader = StructReader(d)
-        reader.next_val(qshareddata_t)
-        m_msecs = reader.next_aligned_val(gdb.lookup_type('qint64'))
-        spec = int(reader.next_val(timespec_t))
-        m_offsetFromUtc = reader.next_val(gdb.lookup_type('int'))
-        m_timeZone = reader.next_val(gdb.lookup_type('QTimeZone'))
-        status = int(reader.next_val(gdb.lookup_type('int')))
-
-        if spec == self._timeZone:
-            timeZoneStr = QTimeZonePrinter(m_timeZone).to_string()
-            if timeZoneStr == '':
-                return '<invalid>'
-
-        if spec == self._localTime or (spec == self._timeZone and
-                not status & self._timeZoneCached):
+            return None
+        fields = cls._read_private(cls._layout_5_0, d, pages)
+        spec = fields['spec']
+        status = fields['status']
+        if spec == cls._localTime or (spec == cls._timeZone and
+                not status & cls._timeZoneCached):
             # Because QDateTime delays timezone calculations as far as
             # possible, the ValidDateTime flag may not be set even if
             # it is a valid DateTime.
-            if not status & self._validDate or not status & self._validTime:
-                return '<invalid>'
-        elif not (status & self._validDateTime):
+            valid = status & cls._validDate and status & cls._validTime
+        else:
+            valid = status & cls._validDateTime
+        return (fields['msecs'], spec, fields['offsetFromUtc'],
+                fields['timeZone'], valid)
+
+    @classmethod
+    def _read_5_7(cls, d, pages=None):
+        if d & cls._shortData57:
+            # short data optimization: the status is in the low byte
+            # and the msecs in the remaining (signed) bits
+            bits = gdb.lookup_type('void').pointer().sizeof * 8
+            if d >> (bits - 1):
+                d -= 1 << bits
+            status = d & 0xff
+            fields = {'msecs': d >> 8, 'offsetFromUtc': 0, 'timeZone': 0}
+        elif not d:
+            return None
+        else:
+            fields = cls._read_private(cls._layout_5_7, d, pages)
+            status = fields['status']
+        spec = (status & cls._timeSpecMask57) >> cls._timeSpecShift57
+        if spec == cls._localTime:
+            valid = status & cls._validDate57 and status & cls._validTime57
+        else:
+            valid = status & cls._validDateTime57
+        return (fields['msecs'], spec, fields['offsetFromUtc'],
+                fields['timeZone'], valid)
+
+    @classmethod
+    def _choose_reader(cls, profile):
+        if profile.at_least(5, 7) or profile.has_type('QDateTime::ShortData'):
+            return cls._read_5_7
+        return cls._read_5_0
+
+    @classmethod
+    def reader(cls):
+        """Return the function decoding the d-pointer of a QDateTime.
+
+        It is called with the d-pointer (as an integer) and optionally a
+        PageReader to read the private data from, and returns None for a
+        null QDateTime or a tuple of (msecs, spec, offsetFromUtc,
+        timeZone, valid).
+        """
+        return version.profile().memo('QDateTimePrivate', cls._choose_reader)
+
+    def to_string(self):
+        fields = self.reader()(int(self.val['d']['d']))
+        if fields is None:
+            return '<invalid>'
+        m_msecs, spec, m_offsetFromUtc, timeZone, valid = fields
+        if not valid:
             return '<invalid>'
 
-        # actually fetch:
-        m_msecs = int(m_msecs)
+        if spec == self._timeZone:
+            timeZoneStr = QTimeZonePrinter.format_private(timeZone)
+            if timeZoneStr == '':
+                return '<invalid>'
 
         jd = self._unix_epoch_jd # UNIX epoch
         jd += m_msecs // self._ms_per_day
@@ -304,7 +1529,7 @@ class QDateTimePrinter:
         elif spec == self._UTC:
             result += ' (UTC)'
         elif spec == self._offsetFromUTC:
-            offset = int(m_offsetFromUtc)
+            offset = m_offsetFromUtc
             if offset == 0:
                 diffstr = ''
             else:
@@ -327,8 +1552,19 @@ class QDateTimePrinter:
 class QHashPrinter:
     """Print a Qt5 QHash"""
 
+    _d_layout = StructLayout('QHashData', [
+        ('fakeNext', 'ptr'),
+        ('buckets', 'ptr'),
+        ('ref', 'int32'),
+        ('size', 'int32'),
+        ('nodeSize', 'int32'),
+        ('userNumBits', 'int16'),
+        ('numBits', 'int16'),
+        ('numBuckets', 'int32'),
+        ])
+
     class Iter:
-        def __init__(self, d, e):
+        def __init__(self, d, e, budget):
             self.buckets_left = d['numBuckets']
             self.node_type = e.type
             # set us up at the end of a "dummy bucket"
@@ -336,6 +1572,11 @@ class QHashPrinter:
             self.current_node = None
             self.i = -1
             self.waiting_for_value = False
+            # never yield more nodes than the hash claims to have, in
+            # case the chains are corrupted
+            self.size = int(d['size'])
+            self.budget = budget
+            self.ptr_size = gdb.lookup_type('void').pointer().sizeof
 
         def __iter__(self):
             return self
@@ -346,6 +1587,9 @@ class QHashPrinter:
                 node = self.current_node.reinterpret_cast(self.node_type)
                 return ('value' + str(self.i), node['value'])
 
+            if self.i + 1 >= self.size:
+                raise StopIteration
+
             if self.current_node:
                 self.current_node = self.current_node['next']
 
@@ -353,6 +1597,8 @@ class QHashPrinter:
             # by not having its 'next' value set
             if not self.current_node or not self.current_node['next']:
                 while self.buckets_left:
+                    if not self.budget.charge(self.ptr_size):
+                        raise StopIteration
                     self.current_bucket += 1
                     self.buckets_left -= 1
                     self.current_node = self.current_bucket.referenced_value()
@@ -372,20 +1618,47 @@ class QHashPrinter:
     def __init__(self, val):
         self.val = val
 
-    def children(self):
+    def header(self):
+        """Returns the sanity-checked QHashData fields (see read_header)."""
         d = self.val['d']
+        header, error = read_header(d, self._d_layout)
+        if error:
+            return (None, error)
+        if header['numBuckets'] < 0 or (header['size'] and not header['numBuckets']):
+            return (None, 'bad bucket count')
+        if header['numBuckets'] and not _is_readable(header['buckets'] +
+                header['numBuckets'] * self.val['e'].type.sizeof - 1):
+            return (None, 'unreadable buckets')
+        return (header, None)
+
+    def iterator(self, budget):
+        """Returns the raw key/value iterator, or None if there is nothing to iterate."""
+        header, error = self.header()
+        if error or header['size'] == 0:
+            return None
+        return self.Iter(self.val['d'], self.val['e'], budget)
 
-        if d['size'] == 0:
+    def children(self):
+        budget = Budget()
+        it = self.iterator(budget)
+        if it is None:
             return []
 
-        return self.Iter(d, self.val['e'])
+        return BudgetIter(it, budget, self.val['e'].type.target().sizeof, True)
 
     def to_string(self):
+        header, error = self.header()
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
-        if self.val['d']['size'] == 0:
+        if header['size'] == 0:
             return '<empty>'
         return None
 
+    def summary(self):
+        header, error = self.header()
+        return _summarize_size(self.val, header, error)
+
     def display_hint(self):
         return 'map'
 
@@ -393,8 +1666,16 @@ class QJsonObjectPrinter:
     """Print a Qt5 QJsonObject"""
 
     def __init__(self, val):
-        # delegate everything to map
-        self.printer = QMapPrinter(gdb.parse_and_eval('((QJsonObject*){:})->toVariantMap()'.format(int(val.address))))
+        self.val = val
+        self._printer = None
+
+    @property
+    def printer(self):
+        # delegate everything to map (only once needed, as this calls
+        # into the inferior)
+        if self._printer is None:
+            self._printer = QMapPrinter(gdb.parse_and_eval('((QJsonObject*){:})->toVariantMap()'.format(int(self.val.address))))
+        return self._printer
 
     def children(self):
         return self.printer.children()
@@ -402,6 +1683,9 @@ class QJsonObjectPrinter:
     def to_string(self):
         return self.printer.to_string()
 
+    def summary(self):
+        return str(self.val.type.unqualified())
+
     def display_hint(self):
         return 'map'
 
@@ -409,8 +1693,16 @@ class QJsonArrayPrinter:
     """Print a Qt5 QJsonArray"""
 
     def __init__(self, val):
-        # delegate everything to list
-        self.printer = QListPrinter(gdb.parse_and_eval('((QJsonArray*){:})->toVariantList()'.format(int(val.address))))
+        self.val = val
+        self._printer = None
+
+    @property
+    def printer(self):
+        # delegate everything to list (only once needed, as this calls
+        # into the inferior)
+        if self._printer is None:
+            self._printer = QListPrinter(gdb.parse_and_eval('((QJsonArray*){:})->toVariantList()'.format(int(self.val.address))))
+        return self._printer
 
     def children(self):
         return self.printer.children()
@@ -418,6 +1710,9 @@ class QJsonArrayPrinter:
     def to_string(self):
         return self.printer.to_string()
 
+    def summary(self):
+        return str(self.val.type.unqualified())
+
     def display_hint(self):
         return 'array'
 
@@ -428,7 +1723,14 @@ class QLatin1StringPrinter:
         self.val = val
 
     def to_string(self):
-        return self.val['m_data'].string('', 'replace', self.val['m_size'])
+        size = int(self.val['m_size'])
+        if size < 0:
+            return corrupted('negative size')
+        budget = Budget()
+        result = self.val['m_data'].string('', 'replace', budget.clamp(size))
+        if budget.exhausted:
+            result += '...' + budget.marker()
+        return result
 
     def display_hint(self):
         return 'string'
@@ -436,11 +1738,34 @@ class QLatin1StringPrinter:
 class QLinkedListPrinter:
     """Print a Qt5 QLinkedList"""
 
+    _d_layout = StructLayout('QLinkedListData', [
+        ('n', 'ptr'),
+        ('p', 'ptr'),
+        ('ref', 'int32'),
+        ('size', 'int32'),
+        ])
+
+    _node_layout = StructLayout('QLinkedListNode', [
+        ('n', 'ptr'),
+        ('p', 'ptr'),
+        ])
+
     class Iter:
-        def __init__(self, tail, size):
-            self.current = tail
-            self.i = -1
+        """Follows the links of the list as the children are asked for.
+
+        The address of a node is only known once the previous one has been
+        read, so the nodes are read one at a time, but through a PageReader
+        so that nodes allocated close together cost a single read.
+        """
+
+        def __init__(self, tail, size, budget):
+            self.tail = int(tail)
+            self.current = self.tail
+            self.node_p_type = tail.type
             self.size = size
+            self.budget = budget
+            self.reader = PageReader(budget)
+            self.i = -1
 
         def __iter__(self):
             return self
@@ -448,9 +1773,21 @@ class QLinkedListPrinter:
         def __next__(self):
             if self.i + 1 >= self.size:
                 raise StopIteration
+            layout = QLinkedListPrinter._node_layout
+            data = self.reader.read(self.current, layout.sizeof())
+            if data is None:
+                self.budget.fail('unreadable node')
+                raise StopIteration
+            # the list is circular, with the QLinkedListData acting as
+            # the tail node
+            following = layout.unpack(data)['n']
+            if not following or following == self.tail:
+                self.budget.fail('list shorter than its size')
+                raise StopIteration
+            self.current = following
             self.i += 1
-            self.current = self.current['n']
-            return (str(self.i), self.current['t'])
+            node = gdb.Value(self.current).cast(self.node_p_type)
+            return (str(self.i), node['t'])
 
         def next(self):
             return self.__next__()
@@ -459,19 +1796,26 @@ class QLinkedListPrinter:
         self.val = val
 
     def children(self):
-        size = int(self.val['d']['size'])
-
-        if size == 0:
+        header, error = read_header(self.val['d'], self._d_layout)
+        if error or header['size'] == 0:
             return []
 
-        return self.Iter(self.val['e'], size)
+        budget = Budget()
+        return BudgetIter(self.Iter(self.val['e'], header['size'], budget), budget)
 
     def to_string(self):
+        header, error = read_header(self.val['d'], self._d_layout)
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
-        if self.val['d']['size'] == 0:
+        if header['size'] == 0:
             return '<empty>'
         return None
 
+    def summary(self):
+        header, error = read_header(self.val['d'], self._d_layout)
+        return _summarize_size(self.val, header, error)
+
     def display_hint(self):
         return 'array'
 
@@ -496,26 +1840,49 @@ class QListPrinter:
                     typeinfo.type_is_known_primitive(self.el_type)):
                 self.is_pointer = False
             else:
-                raise ValueError("Could not determine whether QList stores " +
-                        self.el_type.name + " directly or as a pointer: to fix " +
-                        "this, add it to one of the variables in the "+
-                        "qt5printers.typeinfo module")
+                info = typeinfo.lookup_type_info(self.el_type)
+                if info is None:
+                    raise ValueError("Could not determine whether QList stores " +
+                            self.el_type.name + " directly or as a pointer: to fix " +
+                            "this, add it to one of the variables in the "+
+                            "qt5printers.typeinfo module")
+                self.is_pointer = info['isStatic'] or info['isLarge']
             self.node_type = gdb.lookup_type(typ.name + '::Node').pointer()
+            self.detector = None
+            self.threshold = _repeats_threshold()
+
+        def detect_repeats(self, budget):
+            """Collapse runs of identical slots (see RepeatDetector)."""
+            if self.threshold is None:
+                return
+            ptr_size = gdb.lookup_type('void').pointer().sizeof
+            address = int(self.array.address) + self.begin * ptr_size
+            self.detector = RepeatDetector(address, ptr_size,
+                    self.end - self.begin, budget)
 
         def __iter__(self):
             return self
 
-        def __next__(self):
-            if self.begin + self.offset >= self.end:
-                raise StopIteration
-            node = self.array[self.begin + self.offset].reinterpret_cast(self.node_type)
+        def value(self, index):
+            node = self.array[index].reinterpret_cast(self.node_type)
             if self.is_pointer:
                 p = node['v']
             else:
                 p = node
+            return p.address.cast(self.el_type.pointer()).dereference()
+
+        def __next__(self):
+            if self.begin + self.offset >= self.end:
+                raise StopIteration
+            index = self.begin + self.offset
+            if self.detector is not None:
+                run = self.detector.run_length(self.offset)
+                if run > self.threshold:
+                    self.offset += run
+                    return (str(self.offset - run + 1),
+                            _repeated(self.value(index), run))
             self.offset += 1
-            value = p.address.cast(self.el_type.pointer()).dereference()
-            return (str(self.offset), value)
+            return (str(self.offset), self.value(index))
 
         def next(self):
             return self.__next__()
@@ -523,74 +1890,148 @@ class QListPrinter:
     def __init__(self, val):
         self.val = val
 
-    def children(self):
+    _d_layout = StructLayout('QListData::Data', [
+        ('ref', 'int32'),
+        ('alloc', 'int32'),
+        ('begin', 'int32'),
+        ('end', 'int32'),
+        ('array', 'ptr'),
+        ])
+
+    def header(self):
+        """Returns the sanity-checked QListData::Data fields (see read_header)."""
         d = self.val['d']
-        begin = int(d['begin'])
-        end = int(d['end'])
+        header, error = read_header(d, self._d_layout)
+        if error:
+            return (None, error)
+        if not 0 <= header['begin'] <= header['end'] <= header['alloc']:
+            return (None, 'bad begin/end')
+        ptr_size = gdb.lookup_type('void').pointer().sizeof
+        if header['end'] > header['begin'] and not _is_readable(int(d) +
+                self._d_layout.offsetof('array') + header['end'] * ptr_size - 1):
+            return (None, 'unreadable data')
+        return (header, None)
 
-        if begin == end:
+    def children(self):
+        header, error = self.header()
+        if error or header['begin'] == header['end']:
             return []
 
-        return self.Iter(d['array'], begin, end, self.val.type.strip_typedefs())
+        d = self.val['d']
+        it = self.Iter(d['array'], header['begin'], header['end'],
+                self.val.type.strip_typedefs())
+        el_size = it.el_type.sizeof
+        if it.is_pointer:
+            el_size += gdb.lookup_type('void').pointer().sizeof
+        budget = Budget()
+        it.detect_repeats(budget)
+        if it.detector is not None:
+            # the detector charges for the slots as it reads them, so a
+            # collapsed run is only charged once: only charge each child
+            # for the element a slot points to
+            el_size = it.el_type.sizeof if it.is_pointer else 0
+        return BudgetIter(it, budget, el_size)
 
     def to_string(self):
+        header, error = self.header()
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
-        if self.val['d']['begin'] == self.val['d']['end']:
+        if header['begin'] == header['end']:
             return '<empty>'
         return None
 
+    def summary(self):
+        header, error = self.header()
+        if error:
+            return _summarize(self.val, corrupted(error))
+        return _summarize(self.val, 'size={:d}'.format(header['end'] - header['begin']))
+
     def display_hint(self):
         return 'array'
 
 class QMapPrinter:
     """Print a Qt5 QMap"""
 
+    _d_layout = StructLayout('QMapDataBase', [
+        ('ref', 'int32'),
+        ('size', 'int32'),
+        ])
+
+    _node_layout = StructLayout('QMapNodeBase', [
+        ('p', 'ptr'), # parent pointer and colour bit
+        ('left', 'ptr'),
+        ('right', 'ptr'),
+        ])
+
+    batch_size = 256
+    """The number of nodes to read at once while walking the tree."""
+
     class Iter:
-        def __init__(self, root, node_p_type):
-            self.root = root
-            self.current = None
+        def __init__(self, header, size, node_p_type, budget):
+            self.header = int(header)
+            self.size = size
             self.node_p_type = node_p_type
+            self.budget = budget
+            self.nodes = None
             self.next_is_key = True
             self.i = -1
-            # we store the path here to avoid keeping re-fetching
-            # values from the inferior (also, skips the pointer
-            # arithmetic involved in using the parent pointer)
-            self.path = []
 
         def __iter__(self):
             return self
 
-        def moveToNextNode(self):
-            if self.current is None:
-                # find the leftmost node
-                if not self.root['left']:
-                    return False
-                self.current = self.root
-                while self.current['left']:
-                    self.path.append(self.current)
-                    self.current = self.current['left']
-            elif self.current['right']:
-                self.path.append(self.current)
-                self.current = self.current['right']
-                while self.current['left']:
-                    self.path.append(self.current)
-                    self.current = self.current['left']
-            else:
-                last = self.current
-                self.current = self.path.pop()
-                while self.current['right'] == last:
-                    last = self.current
-                    self.current = self.path.pop()
-                # if there are no more parents, we are at the root
-                if len(self.path) == 0:
-                    return False
-            return True
+        def _node(self, nodes, reader, address):
+            """Returns the fields of the node at address, or None if unreadable.
+
+            A node that has not been read yet is read along with up to
+            batch_size nodes below it, a tree level at a time (see
+            gather_nodes), so that the walk goes back to the inferior
+            about once per batch rather than once per node.
+            """
+            if address not in nodes:
+                batch, complete = gather_nodes([address], QMapPrinter._node_layout,
+                        ('left', 'right'), QMapPrinter.batch_size, None, reader)
+                nodes.update(batch)
+            return nodes.get(address)
+
+        def inOrder(self):
+            nodes = {}
+            reader = PageReader(self.budget)
+            header = self._node(nodes, reader, self.header)
+            if header is None:
+                self.budget.fail('unreadable nodes')
+                return
+            # the header's left child is the root of the tree
+            current = header['left']
+            stack = []
+            # a corrupted tree may link back to a node we already went
+            # through, so never descend into a node twice
+            visited = set([self.header])
+            count = 0
+            while count < self.size:
+                while current and current not in visited:
+                    fields = self._node(nodes, reader, current)
+                    if fields is None:
+                        self.budget.fail('unreadable nodes')
+                        return
+                    visited.add(current)
+                    stack.append(current)
+                    current = fields['left']
+                if not stack:
+                    # fewer nodes are reachable than the map's size says
+                    self.budget.fail('tree ended early')
+                    return
+                current = stack.pop()
+                count += 1
+                yield current
+                current = nodes[current]['right']
 
         def __next__(self):
             if self.next_is_key:
-                if not self.moveToNextNode():
-                    raise StopIteration
-                self.current_typed = self.current.reinterpret_cast(self.node_p_type)
+                if self.nodes is None:
+                    self.nodes = self.inOrder()
+                address = next(self.nodes)
+                self.current_typed = gdb.Value(address).cast(self.node_p_type)
                 self.next_is_key = False
                 self.i += 1
                 return ('key' + str(self.i), self.current_typed['key'])
@@ -604,29 +2045,149 @@ class QMapPrinter:
     def __init__(self, val):
         self.val = val
 
-    def children(self):
-        d = self.val['d']
-        size = int(d['size'])
-
-        if size == 0:
-            return []
-
+    def node_type(self):
+        """Returns the type of the nodes of the map."""
         realtype = self.val.type.strip_typedefs()
         keytype = realtype.template_argument(0)
         valtype = realtype.template_argument(1)
-        node_type = gdb.lookup_type('QMapData<' + keytype.name + ',' + valtype.name + '>::Node')
+        return gdb.lookup_type('QMapData<' + keytype.name + ',' + valtype.name + '>::Node')
 
-        return self.Iter(d['header'], node_type.pointer())
+    def iterator(self, budget):
+        """Returns the raw key/value iterator, or None if there is nothing to iterate."""
+        d = self.val['d']
+        header, error = read_header(d, self._d_layout)
+        if error or header['size'] == 0:
+            return None
+        return self.Iter(d['header'].address, header['size'],
+                self.node_type().pointer(), budget)
+
+    def children(self):
+        budget = Budget()
+        it = self.iterator(budget)
+        if it is None:
+            return []
+        return BudgetIter(it, budget, pairs=True)
 
     def to_string(self):
+        header, error = read_header(self.val['d'], self._d_layout)
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
-        if self.val['d']['size'] == 0:
+        if header['size'] == 0:
             return '<empty>'
         return None
 
+    def summary(self):
+        header, error = read_header(self.val['d'], self._d_layout)
+        return _summarize_size(self.val, header, error)
+
     def display_hint(self):
         return 'map'
 
+class QObjectPrinter:
+    """Print a Qt5 QObject"""
+
+    _d_layout = StructLayout('QObjectData', [
+        (None, 'ptr'), # vtable
+        ('q_ptr', 'ptr'),
+        ('parent', 'ptr'),
+        ('children', 'ptr'),
+        ('flags', 'uint32'),
+        ('postedEvents', 'int32'),
+        ('metaObject', 'ptr'),
+        ])
+
+    def __init__(self, val):
+        # d_ptr belongs to the QObject subobject, which is not at the
+        # address of the derived object when QObject is not the first base
+        self.qobject_type = qobject_base(val.type)
+        self.val = val.cast(self.qobject_type) if self.qobject_type is not None else val
+
+    def d(self):
+        return self.val['d_ptr']['d']
+
+    def header(self):
+        """Returns the sanity-checked QObjectData fields (see read_header)."""
+        header, error = read_header(self.d(), self._d_layout)
+        if error:
+            return (None, error)
+        # self.val is the QObject subobject, which q_ptr points to
+        if self.val.address is not None and header['q_ptr'] != int(self.val.address):
+            return (None, 'bad q_ptr')
+        return (header, None)
+
+    def dynamic_type(self):
+        """Returns the dynamic type of the object, or its static type if unknown."""
+        try:
+            return self.val.dynamic_type
+        except gdb.error:
+            return self.val.type
+
+    def dynamic_meta_object(self):
+        """Returns the address of the metaobject of the object's class, or None."""
+        return static_meta_object(self.dynamic_type())
+
+    def class_name(self):
+        """Returns the name of the class of the object, as moc sees it."""
+        typ = self.dynamic_type()
+        address = static_meta_object(typ)
+        meta = meta_object(address) if address is not None else None
+        if meta is None:
+            return str(typ.strip_typedefs())
+        return meta.class_name
+
+    def object_name(self):
+        """Returns the objectName as a QString value, or None if unknown.
+
+        The name lives in QObjectPrivate, which needs debug info for Qt's
+        private types.
+        """
+        private_type = version.profile().lookup_type('QObjectPrivate')
+        if private_type is None:
+            return None
+        extra = self.d().cast(private_type.pointer())['extraData']
+        if not extra:
+            return None
+        return extra['objectName']
+
+    def child_count(self, header):
+        children, error = read_header(header['children'], QListPrinter._d_layout)
+        if error:
+            return None
+        return children['end'] - children['begin']
+
+    def children(self):
+        header, error = self.header()
+        if error:
+            return []
+        result = []
+        name = self.object_name()
+        if name is not None:
+            result.append(('objectName', name))
+        parent = gdb.Value(header['parent']).cast(self.qobject_type.pointer())
+        result.append(('parent', parent))
+        count = self.child_count(header)
+        if count is not None:
+            result.append(('children', count))
+        return result
+
+    def to_string(self):
+        header, error = self.header()
+        if error:
+            return corrupted(error)
+        return self.class_name()
+
+    def summary(self):
+        header, error = self.header()
+        if error:
+            return _summarize(self.val, corrupted(error))
+        details = self.class_name()
+        name = self.object_name()
+        if name is not None:
+            text = _decode_qstring(name['d'], Budget())
+            details += ' "{:}"'.format(text[:_summary_chars])
+        return _summarize(self.val, details)
+
 class QSetPrinter:
     """Print a Qt5 QSet"""
 
@@ -635,15 +2196,21 @@ class QSetPrinter:
 
     def children(self):
         hashPrinter = QHashPrinter(self.val['q_hash'])
+        budget = Budget()
+        it = hashPrinter.iterator(budget)
+        if it is None:
+            return []
         # the keys of the hash are the elements of the set, so select
         # every other item (starting with the first)
-        return itertools.islice(hashPrinter.children(), 0, None, 2)
+        return BudgetIter(itertools.islice(it, 0, None, 2), budget,
+                self.val['q_hash']['e'].type.target().sizeof)
 
     def to_string(self):
-        # if we return an empty list from children, gdb doesn't print anything
-        if self.val['q_hash']['d']['size'] == 0:
-            return '<empty>'
-        return None
+        return QHashPrinter(self.val['q_hash']).to_string()
+
+    def summary(self):
+        header, error = QHashPrinter(self.val['q_hash']).header()
+        return _summarize_size(self.val, header, error)
 
     def display_hint(self):
         return 'array'
@@ -656,9 +2223,26 @@ class QStringPrinter:
 
     def to_string(self):
         d = self.val['d']
-        data = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        data_len = d['size'] * gdb.lookup_type('unsigned short').sizeof
-        return data.string('utf-16', 'replace', data_len)
+        header, error = check_array_data(d, 2)
+        if error:
+            return corrupted(error)
+        budget = Budget()
+        # don't cut a UTF-16 code unit in half
+        data_len = budget.clamp(header['size'] * 2) & ~1
+        data = read_memory(int(d) + header['offset'], data_len) if data_len else b''
+        result = data.decode(utf16(), 'replace')
+        if budget.exhausted:
+            result += '...' + budget.marker()
+        return result
+
+    def summary(self):
+        d = self.val['d']
+        header, error = check_array_data(d, 2)
+        if error:
+            return _summarize(self.val, corrupted(error))
+        size = header['size']
+        data = read_memory(int(d) + header['offset'], min(size, _summary_chars) * 2)
+        return _summarize_text(self.val, size, data.decode(utf16(), 'replace'))
 
     def display_hint(self):
         return 'string'
@@ -681,14 +2265,35 @@ class QTimePrinter:
 class QTimeZonePrinter:
     """Print a Qt5 QTimeZone"""
 
+    _layout = StructLayout('QTimeZonePrivate', [
+        (None, 'ptr'), # vtable
+        ('ref', 'int32'),
+        ('id', 'ptr'), # QByteArray
+        ])
+
     def __init__(self, val):
         self.val = val
 
+    @classmethod
+    def format_private(cls, d):
+        """Return the id of the QTimeZonePrivate at address d."""
+        if not d:
+            return ''
+        budget = Budget()
+        result = _decode_qbytearray(cls._layout.read(d)['id'], budget)
+        if budget.exhausted:
+            result += '...' + budget.marker()
+        return result
+
     def to_string(self):
         d = self.val['d']['d']
         if not d:
             return ''
 
+        profile = version.profile()
+        if not profile.can_call_functions:
+            return self.format_private(int(d))
+
         try:
             # Accessing the private data is error-prone,
             # so try just calling the id() method.
@@ -698,21 +2303,9 @@ class QTimeZonePrinter:
             # it will only work with an attached process.
             m_id = gdb.parse_and_eval('((QTimeZone*){:})->id()'.format(self.val.address))
         except:
-            ptr_size = gdb.lookup_type('void').pointer().sizeof
-            try:
-                qshareddata_t = gdb.lookup_type('QSharedData')
-            except gdb.error:
-                try:
-                    # well, it only has a QAtomicInt in it
-                    qshareddata_t = gdb.lookup_type('QAtomicInt')
-                except gdb.error:
-                    # let's hope it's the same size as an int
-                    qshareddata_t = gdb.lookup_type('int')
-
-            reader = StructReader(d)
-            reader.next_val(gdb.lookup_type('void').pointer()) # vtable
-            reader.next_val(qshareddata_t)
-            m_id = reader.next_aligned_val(gdb.lookup_type('QByteArray'))
+            # don't keep trying (eg: on core files)
+            profile.can_call_functions = False
+            return self.format_private(int(d))
 
         return QByteArrayPrinter(m_id).to_string()
 
@@ -776,8 +2369,11 @@ class QVariantPrinter:
             elif gdb_type.tag == 'enum':
                 is_pointer = False
             else:
-                # couldn't figure out how the type is stored
-                return data['o'].cast(gdb_type)
+                info = typeinfo.lookup_type_info(gdb_type)
+                if info is None:
+                    # couldn't figure out how the type is stored
+                    return data['o'].cast(gdb_type)
+                is_pointer = info['isStatic']
 
             if is_pointer:
                 value = data['shared']['ptr'].reinterpret_cast(gdb_type.pointer())
@@ -791,26 +2387,83 @@ class QVariantPrinter:
             # custom type?
             return data
 
+    def summary(self):
+        d = self.val['d']
+        typ = int(d['type'])
+        if typ == typeinfo.meta_type_unknown:
+            return _summarize(self.val, '<invalid type>')
+        typename = typeinfo.meta_type_names.get(typ, 'type {:d}'.format(typ))
+        if typename in self._varmap:
+            field = self._varmap[typename]
+            return '{:} = {:}'.format(_summarize(self.val, typename), d['data'][field])
+        return _summarize(self.val, typename)
+
 class QVarLengthArrayPrinter:
     """Print a Qt5 QVarLengthArray"""
 
     def __init__(self, val):
         self.val = val
 
+    def check(self):
+        """Returns the reason the array looks corrupted, or None."""
+        size = int(self.val['s'])
+        if not 0 <= size <= int(self.val['a']):
+            return 'bad size'
+        ptr = self.val['ptr']
+        if size and not _is_readable(int(ptr) + size * ptr.type.target().sizeof - 1):
+            return 'unreadable data'
+        return None
+
+    def native_array(self, limit=True):
+        """Returns the elements as a gdb array value, or None.
+
+        This only works for trivially copyable element types. If limit is
+        True, the array is shortened to what gdb will print, or None is
+        returned if it cannot be shortened truthfully (see _native_count).
+        """
+        size = int(self.val['s'])
+        ptr = self.val['ptr']
+        el_type = ptr.type.target()
+        if size == 0 or self.check() or not is_trivially_copyable(el_type):
+            return None
+        if limit:
+            size = _native_count(size, el_type.sizeof)
+            if size is None:
+                return None
+        return _native_array(ptr, size)
+
     def children(self):
         size = int(self.val['s'])
 
-        if size == 0:
+        if size == 0 or self.check():
+            return []
+        if settings.native_arrays.value and self.native_array() is not None:
             return []
 
-        return ArrayIter(self.val['ptr'], size)
+        ptr = self.val['ptr']
+        budget = Budget()
+        it = ArrayIter(ptr, size, budget)
+        # with repeat detection, the array is read (and charged) in chunks
+        return BudgetIter(it, budget, 0 if it.detector else ptr.type.target().sizeof)
 
     def to_string(self):
+        error = self.check()
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
         if self.val['s'] == 0:
             return '<empty>'
+        if settings.native_arrays.value:
+            # let gdb print the elements (if it can)
+            return self.native_array()
         return None
 
+    def summary(self):
+        error = self.check()
+        if error:
+            return _summarize(self.val, corrupted(error))
+        return _summarize(self.val, 'size={:d}'.format(int(self.val['s'])))
+
     def display_hint(self):
         return 'array'
 
@@ -820,25 +2473,66 @@ class QVectorPrinter:
     def __init__(self, val):
         self.val = val
 
-    def children(self):
+    def data(self):
+        """Returns (pointer to the elements, size, reason the header is corrupted)."""
         d = self.val['d']
         el_type = self.val.type.template_argument(0)
-        data_len = int(d['size'])
+        header, error = check_array_data(d, el_type.sizeof)
+        if error:
+            return (None, 0, error)
+        data_char = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + header['offset']
+        return (data_char.reinterpret_cast(el_type.pointer()), header['size'], None)
+
+    def native_array(self, limit=True):
+        """Returns the elements as a gdb array value, or None.
+
+        This only works for trivially copyable element types. If limit is
+        True, the array is shortened to what gdb will print, or None is
+        returned if it cannot be shortened truthfully (see _native_count).
+        """
+        data, data_len, error = self.data()
+        if data_len == 0:
+            return None
+        el_type = data.type.target()
+        if not is_trivially_copyable(el_type):
+            return None
+        if limit:
+            data_len = _native_count(data_len, el_type.sizeof)
+            if data_len is None:
+                return None
+        return _native_array(data, data_len)
+
+    def children(self):
+        data, data_len, error = self.data()
 
         if data_len == 0:
             return []
+        if settings.native_arrays.value and self.native_array() is not None:
+            return []
 
-        data_char = d.reinterpret_cast(gdb.lookup_type('char').pointer()) + d['offset']
-        data = data_char.reinterpret_cast(el_type.pointer())
-
-        return ArrayIter(data, data_len)
+        el_type = data.type.target()
+        budget = Budget()
+        it = ArrayIter(data, data_len, budget)
+        # with repeat detection, the array is read (and charged) in chunks
+        return BudgetIter(it, budget, 0 if it.detector else el_type.sizeof)
 
     def to_string(self):
+        data, data_len, error = self.data()
+        if error:
+            return corrupted(error)
         # if we return an empty list from children, gdb doesn't print anything
-        if self.val['d']['size'] == 0:
+        if data_len == 0:
             return '<empty>'
+        if settings.native_arrays.value:
+            # let gdb print the elements (if it can)
+            return self.native_array()
         return None
 
+    def summary(self):
+        el_type = self.val.type.template_argument(0)
+        header, error = check_array_data(self.val['d'], el_type.sizeof)
+        return _summarize_size(self.val, header, error)
+
     def display_hint(self):
         return 'array'
 
@@ -848,80 +2542,338 @@ class QUrlPrinter:
     def __init__(self, val):
         self.val = val
 
+    # These fields (including order) are unstable, and
+    # may change between even patch-level Qt releases
+    _layout = StructLayout('QUrlPrivate', [
+        ('ref', 'int32'),
+        ('port', 'int32'),
+        ('scheme', 'ptr'),
+        ('userName', 'ptr'),
+        ('password', 'ptr'),
+        ('host', 'ptr'),
+        ('path', 'ptr'),
+        ('query', 'ptr'),
+        ('fragment', 'ptr'),
+        ('error', 'ptr'),
+        ('sections', 'uint8'),
+        ('flags', 'uint8'),
+        ])
+
     def to_string(self):
         d = self.val['d']
         if not d:
             return '<empty>'
 
-        int_t = gdb.lookup_type('int')
-        try:
-            atomicint_t = gdb.lookup_type('QAtomicInt')
-        except gdb.error:
-            # let's hope it's the same size as an int
-            atomicint_t = int_t
-        qstring_t = gdb.lookup_type('QString')
-        uchar_t = gdb.lookup_type('uchar')
-
-        reader = StructReader(d)
-
-        # These fields (including order) are unstable, and
-        # may change between even patch-level Qt releases
-        reader.next_val(atomicint_t)
-        port = int(reader.next_val(int_t))
-        scheme = reader.next_val(qstring_t)
-        userName = reader.next_val(qstring_t)
-        password = reader.next_val(qstring_t)
-        host = reader.next_val(qstring_t)
-        path = reader.next_val(qstring_t)
-        query = reader.next_val(qstring_t)
-        fragment = reader.next_val(qstring_t)
-        reader.next_val(gdb.lookup_type('void').pointer())
-        sections = int(reader.next_val(uchar_t))
-        flags = int(reader.next_val(uchar_t))
+        fields = self._layout.read(d)
+        port = fields['port']
+        sections = fields['sections']
+        flags = fields['flags']
+        # one budget for all the components
+        budget = Budget()
 
         # isLocalFile and no query and no fragment
         if flags & 0x01 and not (sections & 0x40) and not (sections & 0x80):
             # local file
-            return path
+            result = _decode_qstring(fields['path'], budget)
+            if budget.exhausted:
+                result += '...' + budget.marker()
+            return result
 
-        def qs_to_s(qstring):
-            return QStringPrinter(qstring).to_string()
+        def qs_to_s(name):
+            return _decode_qstring(fields[name], budget)
 
         # QUrl::toString() is way more complicated than what we do here,
         # but this is good enough for debugging
         result = ''
         if sections & 0x01:
-            result += qs_to_s(scheme) + ':'
+            result += qs_to_s('scheme') + ':'
         if sections & (0x02 | 0x04 | 0x08 | 0x10) or flags & 0x01:
             result += '//'
         if sections & 0x02 or sections & 0x04:
-            result += qs_to_s(userName)
+            result += qs_to_s('userName')
             if sections & 0x04:
                 # this may appear in backtraces that will be sent to other
                 # people
                 result += ':<omitted>'
             result += '@'
         if sections & 0x08:
-            result += qs_to_s(host)
+            result += qs_to_s('host')
         if port != -1:
             result += ':' + str(port)
-        result += qs_to_s(path)
+        result += qs_to_s('path')
         if sections & 0x40:
-            result += '?' + qs_to_s(query)
+            result += '?' + qs_to_s('query')
         if sections & 0x80:
-            result += '#' + qs_to_s(fragment)
+            result += '#' + qs_to_s('fragment')
+        if budget.exhausted:
+            result += '...' + budget.marker()
         return result
 
     def display_hint(self):
         return 'string'
 
 
+class SummaryPrinter:
+    """Prints a one-line summary of a Qt value (see summarize())."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def to_string(self):
+        return self.text
+
+def _summary_text(val, pp):
+    """Return the summary pp gives for val, or None if it prints val cheaply."""
+    if hasattr(pp, 'summary'):
+        return pp.summary()
+    if hasattr(pp, 'children'):
+        return str(val.type.unqualified())
+    return None
+
+def summarize(val):
+    """Return a one-line summary of a Qt value, or None if it is not one.
+
+    Summaries such as "QList<QString> (size=120000)" only read the headers
+    of containers, so the time they take does not depend on the size of
+    the container.
+    """
+    if val.type.code == gdb.TYPE_CODE_REF:
+        val = val.referenced_value()
+    pp = printer.lookup(val)
+    if pp is None:
+        return None
+    text = _summary_text(val, pp)
+    if text is None:
+        # values without children are cheap to print anyway
+        return str(pp.to_string())
+    return text
+
+class StopPrefetcher:
+    """Reads the Qt values of the selected frame in bulk when the inferior stops.
+
+    When the "qt5printers prefetch" setting is on, the Qt-typed arguments
+    and locals of the selected frame are located when the inferior stops,
+    and the pages holding their headers and (the start of) their payloads
+    are fetched with as few reads as possible. Until the inferior resumes,
+    reads that go through read_memory are served from these pages if they
+    are entirely cached: container headers, the text of strings and byte
+    arrays, and the scans for repeated elements. Elements handed to gdb as
+    children are gdb.Values, which gdb reads itself, so they do not come
+    from this cache.
+    """
+
+    header_size = 64
+    """The number of bytes to fetch at each d-pointer."""
+
+    payload_limit = 64 * 1024
+    """The maximum number of payload bytes to fetch per value."""
+
+    total_limit = 1024 * 1024
+    """The maximum number of payload bytes to fetch per stop."""
+
+    def __init__(self):
+        # printer class -> (path to the d-pointer, kind of payload)
+        self.paths = {
+            QBitArrayPrinter: (('d', 'd'), 'array'),
+            QByteArrayPrinter: (('d',), 'array'),
+            QDateTimePrinter: (('d', 'd'), None),
+            QHashPrinter: (('d',), None),
+            QLinkedListPrinter: (('d',), None),
+            QListPrinter: (('d',), 'list'),
+            QMapPrinter: (('d',), None),
+            QSetPrinter: (('q_hash', 'd'), None),
+            QStringPrinter: (('d',), 'array'),
+            QTimeZonePrinter: (('d', 'd'), None),
+            QUrlPrinter: (('d',), None),
+            QVectorPrinter: (('d',), 'array'),
+        }
+
+    def frame_values(self, frame):
+        """Yields the values of the arguments and locals of frame."""
+        try:
+            block = frame.block()
+        except RuntimeError:
+            return
+        while block is not None:
+            for sym in block:
+                if not (sym.is_argument or sym.is_variable):
+                    continue
+                typename = gdb.types.get_basic_type(sym.type).tag
+                if not typename or not typename.startswith('Q'):
+                    continue
+                try:
+                    val = sym.value(frame)
+                    if val.type.code == gdb.TYPE_CODE_REF:
+                        val = val.referenced_value()
+                except (gdb.error, RuntimeError):
+                    continue
+                yield val
+            if block.function is not None:
+                break
+            block = block.superblock
+
+    def targets(self, frame):
+        """Yields (d-pointer, payload kind, element size) for the frame's Qt values."""
+        for val in self.frame_values(frame):
+            pp = printer.lookup(val)
+            path = self.paths.get(type(pp))
+            if path is None:
+                continue
+            fields, kind = path
+            try:
+                d = pp.val
+                for field in fields:
+                    d = d[field]
+                d = int(d)
+                el_size = 1
+                if isinstance(pp, QStringPrinter):
+                    el_size = 2
+                elif isinstance(pp, QVectorPrinter):
+                    el_size = pp.val.type.template_argument(0).sizeof
+            except (gdb.error, RuntimeError):
+                continue
+            if d:
+                yield (d, kind, el_size)
+
+    def payload(self, reader, d, kind, el_size):
+        """Returns the (address, length) of the start of a value's payload."""
+        if kind == 'array':
+            data = reader.read(d, qarraydata_layout.sizeof())
+            if data is None:
+                return None
+            header = qarraydata_layout.unpack(data)
+            start = d + header['offset']
+            length = header['size'] * el_size
+        elif kind == 'list':
+            layout = QListPrinter._d_layout
+            data = reader.read(d, layout.sizeof())
+            if data is None:
+                return None
+            header = layout.unpack(data)
+            ptr_size = target_abi()[1]
+            start = d + layout.offsetof('array') + header['begin'] * ptr_size
+            length = (header['end'] - header['begin']) * ptr_size
+        else:
+            return None
+        if length <= 0:
+            return None
+        return (start, min(length, self.payload_limit))
+
+    def prefetch(self, frame):
+        """Returns a PageReader holding the memory of the frame's Qt values."""
+        reader = PageReader()
+        targets = list(self.targets(frame))
+        reader.prefetch([d for d, kind, el_size in targets], self.header_size)
+        ranges = []
+        total = 0
+        for d, kind, el_size in targets:
+            rng = self.payload(reader, d, kind, el_size)
+            if rng is None:
+                continue
+            if total + rng[1] > self.total_limit:
+                break
+            total += rng[1]
+            ranges.append(rng)
+        reader.prefetch_ranges(ranges)
+        return reader
+
+    def on_stop(self, event):
+        global _memory_cache
+        _memory_cache = None
+        if not settings.prefetch.value:
+            return
+        try:
+            # the cache only holds the memory of the inferior that stopped
+            _memory_cache = (gdb.selected_inferior().num,
+                    self.prefetch(gdb.selected_frame()))
+        except (gdb.error, RuntimeError):
+            _memory_cache = None
+
+    def on_resume(self, event):
+        global _memory_cache
+        _memory_cache = None
+
+    def connect(self):
+        """Start prefetching on stop events (if enabled by the setting)."""
+        gdb.events.stop.connect(self.on_stop)
+        for name in ('cont', 'exited', 'memory_changed', 'inferior_call'):
+            registry = getattr(gdb.events, name, None)
+            if registry is not None:
+                registry.connect(self.on_resume)
+
+class QtArrayFunction(gdb.Function):
+    """Return the elements of a Qt container as a plain array.
+
+Usage: $qt_array(CONTAINER)
+
+CONTAINER must be a QVector, QStack or QVarLengthArray of a trivially
+copyable type. The result can be indexed and sliced without reading the
+rest of the container, eg: print $qt_array(vec)[1000]@50"""
+
+    def __init__(self):
+        super(QtArrayFunction, self).__init__('qt_array')
+
+    def invoke(self, val):
+        if val.type.code == gdb.TYPE_CODE_REF:
+            val = val.referenced_value()
+        pp = printer.lookup(val)
+        array = None
+        if hasattr(pp, 'native_array'):
+            array = pp.native_array(False)
+        if array is None:
+            raise gdb.GdbError('$qt_array: cannot view a {:} as an array'.format(val.type))
+        return array
+
+class QtPrettyPrinter(gdb.printing.RegexpCollectionPrettyPrinter):
+    """A RegexpCollectionPrettyPrinter that quickly rejects non-Qt types.
+
+    Every value gdb prints goes through the registered printers, so avoid
+    running the regular expressions for types that cannot be Qt types.
+    """
+
+    def lookup(self, val):
+        """Returns the printer for val, ignoring the summary and value-cache settings."""
+        typ = gdb.types.get_basic_type(val.type)
+        typename = typ.tag
+        if not typename:
+            typename = val.type.name
+        if not typename:
+            return None
+        if typename.startswith('Q'):
+            pp = gdb.printing.RegexpCollectionPrettyPrinter.__call__(self, val)
+            if pp is not None:
+                return pp
+        # classes derived from QObject, such as QTimer or the program's own
+        if qobject_base(typ) is not None:
+            for printer in self.subprinters:
+                if printer.name == 'QObject' and printer.enabled:
+                    return printer.gen_printer(val)
+        return None
+
+    summaries = False
+    """Whether to summarize every Qt value, whatever the setting (see qt-bt)."""
+
+    def __call__(self, val):
+        pp = self.lookup(val)
+        if pp is not None and self.summaries:
+            text = _summary_text(val, pp)
+            if text is not None:
+                return SummaryPrinter(text)
+        elif (pp is not None and settings.summary.value == 'always' and
+                hasattr(pp, 'summary')):
+            return SummaryPrinter(pp.summary())
+        if pp is not None and settings.value_cache.value:
+            pp = _valuecache().wrap(val, pp)
+        return pp
+
 def build_pretty_printer():
     """Builds the pretty printer for Qt5Core."""
-    pp = gdb.printing.RegexpCollectionPrettyPrinter("Qt5Core")
+    pp = QtPrettyPrinter("Qt5Core")
     pp.add_printer('QBitArray', '^QBitArray$', QBitArrayPrinter)
     pp.add_printer('QByteArray', '^QByteArray$', QByteArrayPrinter)
+    pp.add_printer('QCache', '^QCache<.*>$', QCachePrinter)
     pp.add_printer('QChar', '^QChar$', QCharPrinter)
+    pp.add_printer('QContiguousCache', '^QContiguousCache<.*>$', QContiguousCachePrinter)
     pp.add_printer('QDate', '^QDate$', QDatePrinter)
     pp.add_printer('QDateTime', '^QDateTime$', QDateTimePrinter)
     pp.add_printer('QJsonArray', '^QJsonArray', QJsonArrayPrinter)
@@ -931,6 +2883,7 @@ def build_pretty_printer():
     pp.add_printer('QList', '^QList<.*>$', QListPrinter)
     pp.add_printer('QMap', '^QMap<.*>$', QMapPrinter)
     pp.add_printer('QHash', '^QHash<.*>$', QHashPrinter)
+    pp.add_printer('QObject', '^QObject$', QObjectPrinter)
     pp.add_printer('QQueue', '^QQueue<.*>$', QListPrinter)
     pp.add_printer('QSet', '^QSet<.*>$', QSetPrinter)
     pp.add_printer('QStack', '^QStack<.*>$', QVectorPrinter)
@@ -951,3 +2904,31 @@ printer = build_pretty_printer()
 
 This can be registered using gdb.printing.register_pretty_printer().
 """
+
+def _valuecache():
+    """Return the valuecache module, which is only imported once it is enabled."""
+    from . import valuecache
+    valuecache.connect_events()
+    return valuecache
+
+prefetcher = StopPrefetcher()
+"""Prefetches Qt values when the inferior stops (see StopPrefetcher)."""
+
+_events_connected = False
+
+def connect_events():
+    """Connect the gdb event handlers of this module and the ones it uses.
+
+    Called when the printers are registered, so that importing the
+    modules has no side effects; later calls do nothing.
+    """
+    global _events_connected
+    if _events_connected:
+        return
+    version.connect_events()
+    typeinfo.connect_events()
+    prefetcher.connect()
+    gdb.events.clear_objfiles.connect(_forget_meta_objects)
+    _events_connected = True
+
+QtArrayFunction()
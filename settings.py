@@ -0,0 +1,89 @@
+#############################################################################
+##
+## Copyright (C) 2026 The qt5printers contributors
+##
+## This file is part of the GDB pretty printers for the Qt Toolkit.
+##
+## It is new code, not taken from the Qt Project, and may be used under the
+## same terms as the rest of this package: the GNU Lesser General Public
+## License version 2.1 (http://www.gnu.org/licenses/old-licenses/lgpl-2.1.html)
+## or the GNU General Public License version 3.0
+## (http://www.gnu.org/copyleft/gpl.html).
+##
+#############################################################################
+
+
+import gdb
+
+"""Qt5 pretty printer settings
+
+The settings are gdb parameters under the "qt5printers" prefix, so they
+can be changed with "set qt5printers ..." and shown with
+"show qt5printers ...".
+"""
+
+class _PrefixCommand(gdb.Command):
+    def __init__(self, name):
+        super(_PrefixCommand, self).__init__(name, gdb.COMMAND_DATA,
+                gdb.COMPLETE_NONE, True)
+
+_PrefixCommand('set qt5printers')
+_PrefixCommand('show qt5printers')
+
+class Setting(gdb.Parameter):
+    """A qt5printers setting."""
+
+    def __init__(self, name, param_class, default, doc, choices=None):
+        self.set_doc = 'Set ' + doc
+        self.show_doc = 'Show ' + doc
+        self.description = doc
+        if choices is None:
+            super(Setting, self).__init__('qt5printers ' + name,
+                    gdb.COMMAND_DATA, param_class)
+        else:
+            super(Setting, self).__init__('qt5printers ' + name,
+                    gdb.COMMAND_DATA, param_class, choices)
+        self.value = default
+
+    def get_set_string(self):
+        return ''
+
+    def get_show_string(self, svalue):
+        return 'The {:} is {:}.'.format(self.description, svalue)
+
+time_limit = Setting('time-limit', gdb.PARAM_UINTEGER, 10,
+        'number of seconds a printer may spend on a single value (0 for unlimited)')
+"""Wall-clock limit for printing a single value, in seconds (None if unlimited)."""
+
+bytes_limit = Setting('bytes-limit', gdb.PARAM_UINTEGER, 64 * 1024 * 1024,
+        'number of bytes a printer may read for a single value (0 for unlimited)')
+"""Limit on the inferior memory read for a single value (None if unlimited)."""
+
+command_bytes_limit = Setting('command-bytes-limit', gdb.PARAM_UINTEGER, None,
+        'number of bytes a command such as qt-stats may read (0 for unlimited)')
+"""Limit on the inferior memory read by one qt-* command (None if unlimited)."""
+
+summary = Setting('summary', gdb.PARAM_ENUM, 'off',
+        'when Qt values are printed as one-line summaries (off or always)',
+        ['off', 'always'])
+"""When to print Qt values as summaries that do not look at their elements.
+
+"always" uses them everywhere. Backtraces printed with qt-bt use them
+whatever this setting is.
+"""
+
+prefetch = Setting('prefetch', gdb.PARAM_BOOLEAN, False,
+        'whether the Qt values in the selected frame are read in bulk when the inferior stops')
+"""Whether StopPrefetcher is enabled."""
+
+native_arrays = Setting('native-arrays', gdb.PARAM_BOOLEAN, False,
+        'whether QVector and QVarLengthArray of trivially copyable types are printed by gdb as plain arrays')
+"""Whether to let gdb print the elements of simple vectors as a C array."""
+
+value_cache = Setting('value-cache', gdb.PARAM_BOOLEAN, False,
+        'whether the printed Qt values of core files are cached on disk')
+"""Whether values printed from core files are kept in the valuecache module."""
+
+value_cache_size = Setting('value-cache-size', gdb.PARAM_UINTEGER, 64 * 1024 * 1024,
+        'number of bytes the on-disk cache of printed values may use (0 for unlimited)')
+"""Size limit of the value cache database, in bytes (None if unlimited)."""
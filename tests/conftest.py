@@ -0,0 +1,146 @@
+"""Test setup for the Qt5 pretty printers
+
+The printers only run inside gdb, where the gdb module exists. For the
+unit tests, which exercise the parts that do not need a debugged program
+(layouts, budgets, date arithmetic, ...), a minimal stand-in gdb module is
+installed when the real one cannot be imported, and the repository is
+imported as the qt5printers package.
+"""
+
+import importlib.util
+import os
+import re
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class _Event:
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+
+class _Command:
+    def __init__(self, *args, **kwargs):
+        pass
+
+class _Parameter:
+    def __init__(self, *args, **kwargs):
+        pass
+
+class _RegexpSubprinter:
+    def __init__(self, name, regexp, gen_printer):
+        self.name = name
+        self.enabled = True
+        self.compiled_re = re.compile(regexp)
+        self.gen_printer = gen_printer
+
+class _RegexpCollectionPrettyPrinter:
+    def __init__(self, name):
+        self.name = name
+        self.enabled = True
+        self.subprinters = []
+
+    def add_printer(self, name, regexp, gen_printer):
+        self.subprinters.append(_RegexpSubprinter(name, regexp, gen_printer))
+
+    def __call__(self, val):
+        typename = val.type.tag or val.type.name
+        for printer in self.subprinters:
+            if printer.enabled and printer.compiled_re.search(typename):
+                return printer.gen_printer(val)
+        return None
+
+def _gdb_stub():
+    gdb = types.ModuleType('gdb')
+
+    class error(RuntimeError):
+        pass
+
+    class MemoryError(error):
+        pass
+
+    class GdbError(Exception):
+        pass
+
+    gdb.error = error
+    gdb.MemoryError = MemoryError
+    gdb.GdbError = GdbError
+    gdb.Command = _Command
+    gdb.Parameter = _Parameter
+    gdb.Function = _Command
+    gdb.Breakpoint = _Command
+    gdb.Value = type('Value', (object,), {})
+    for i, name in enumerate(['COMMAND_DATA', 'COMMAND_USER', 'COMMAND_STATUS',
+            'COMMAND_STACK', 'COMMAND_RUNNING', 'COMMAND_BREAKPOINTS',
+            'COMPLETE_NONE', 'COMPLETE_EXPRESSION', 'COMPLETE_SYMBOL',
+            'COMPLETE_FILENAME', 'COMPLETE_LOCATION', 'PARAM_UINTEGER',
+            'PARAM_BOOLEAN', 'PARAM_ENUM', 'PARAM_STRING', 'PARAM_ZUINTEGER',
+            'PARAM_ZUINTEGER_UNLIMITED', 'PARAM_FILENAME',
+            'PARAM_OPTIONAL_FILENAME', 'TYPE_CODE_PTR', 'TYPE_CODE_REF',
+            'TYPE_CODE_INT', 'TYPE_CODE_FLT', 'TYPE_CODE_BOOL',
+            'TYPE_CODE_CHAR', 'TYPE_CODE_ENUM', 'TYPE_CODE_STRUCT']):
+        setattr(gdb, name, i)
+    gdb.events = types.SimpleNamespace(**dict((name, _Event()) for name in
+        ['new_objfile', 'clear_objfiles', 'stop', 'cont', 'exited', 'before_prompt']))
+    gdb.parameter = lambda name: 200
+    gdb.write = sys.stdout.write
+
+    def lookup_type(name):
+        raise error('No type named {:}.'.format(name))
+    gdb.lookup_type = lookup_type
+
+    printing = types.ModuleType('gdb.printing')
+    printing.RegexpCollectionPrettyPrinter = _RegexpCollectionPrettyPrinter
+    printing.register_pretty_printer = lambda obj, printer, replace=False: None
+    gdb_types = types.ModuleType('gdb.types')
+    gdb_types.get_basic_type = lambda typ: typ
+    gdb.printing = printing
+    gdb.types = gdb_types
+    return {'gdb': gdb, 'gdb.printing': printing, 'gdb.types': gdb_types}
+
+def _load_package():
+    spec = importlib.util.spec_from_file_location('qt5printers',
+            os.path.join(ROOT, '__init__.py'), submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['qt5printers'] = package
+    spec.loader.exec_module(package)
+
+try:
+    import gdb
+except ImportError:
+    sys.modules.update(_gdb_stub())
+
+if 'qt5printers' not in sys.modules:
+    _load_package()
+
+class Memory(bytearray):
+    """Inferior memory, recording the reads made through core.read_memory."""
+
+    def __init__(self, size):
+        bytearray.__init__(self, size)
+        self.reads = []
+
+    def read(self, address, length):
+        if address < 0 or address + length > len(self):
+            raise sys.modules['gdb'].MemoryError(
+                    'Cannot access memory at address 0x{:x}'.format(address))
+        self.reads.append((address, length))
+        return bytes(self[address:address + length])
+
+@pytest.fixture
+def memory(monkeypatch):
+    from qt5printers import core
+    buf = Memory(0x10000)
+    monkeypatch.setattr(core, 'read_memory', buf.read)
+    return buf
+
+@pytest.fixture
+def no_limits(monkeypatch):
+    from qt5printers import settings
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', None)
@@ -0,0 +1,41 @@
+// The program that test_gdb.py debugs: it fills some Qt values and calls
+// stop(), where the test looks at them.
+#include <QByteArray>
+#include <QDate>
+#include <QDateTime>
+#include <QHash>
+#include <QList>
+#include <QMap>
+#include <QString>
+#include <QTimer>
+#include <QVector>
+
+__attribute__((noinline)) void stop()
+{
+    asm volatile("");
+}
+
+int main()
+{
+    QString string = QStringLiteral("hello");
+    QByteArray bytes("abc");
+    QVector<int> vector;
+    for (int i = 0; i < 5; ++i)
+        vector << i;
+    QVector<int> zeros(100, 0);
+    QList<QString> list;
+    list << QStringLiteral("a") << QStringLiteral("b");
+    QMap<int, QString> map;
+    map.insert(1, QStringLiteral("one"));
+    map.insert(2, QStringLiteral("two"));
+    QHash<QString, int> hash;
+    hash.insert(QStringLiteral("x"), 1);
+    QDate date(2020, 5, 30);
+    QDateTime utc(QDate(1970, 1, 2), QTime(0, 0, 1), Qt::UTC);
+    QDateTime local(QDate(2001, 2, 3), QTime(4, 5, 6), Qt::LocalTime);
+    QVector<QDateTime> dates;
+    dates << utc << local;
+    QTimer timer;
+    stop();
+    return 0;
+}
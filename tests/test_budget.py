@@ -0,0 +1,72 @@
+import struct
+
+from qt5printers import core, settings
+
+def test_budget_bytes(monkeypatch):
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 100)
+    budget = core.Budget()
+    assert budget.charge(60)
+    assert budget.clamp(60) == 40
+    assert budget.exhausted == 'byte limit reached'
+    assert not budget.charge(1)
+    assert budget.marker() == '<partial: byte limit reached>'
+
+def test_budget_time(monkeypatch):
+    monkeypatch.setattr(settings.time_limit, 'value', 10)
+    monkeypatch.setattr(settings.bytes_limit, 'value', None)
+    now = [1000.0]
+    monkeypatch.setattr(core.time, 'time', lambda: now[0])
+    budget = core.Budget()
+    assert budget.charge(1 << 40)
+    now[0] += 11
+    assert not budget.charge(0)
+    assert budget.exhausted == 'time limit reached'
+
+def test_budget_fail_keeps_first_reason(no_limits):
+    budget = core.Budget()
+    budget.fail('unreadable node')
+    budget.fail('something else')
+    assert budget.exhausted == 'unreadable node'
+    assert not budget.charge(0)
+
+def test_budget_iter_marks_partial_result(monkeypatch):
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 20)
+    children = list(core.BudgetIter(((str(i), i) for i in range(10)),
+        core.Budget(), el_size=8))
+    assert children == [('0', 0), ('1', 1), ('...', '<partial: byte limit reached>')]
+
+def write_qstring(memory, d, text):
+    data = text.encode('utf-16-le')
+    memory[d:d + 24 + len(data)] = struct.pack('<iiI4xq', -1, len(text), 0, 24) + data
+
+def test_decode_qstring_within_budget(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 7)
+    write_qstring(memory, 0x100, 'hello')
+    budget = core.Budget()
+    # a UTF-16 code unit is not cut in half
+    assert core._decode_qstring(0x100, budget) == 'hel'
+    assert budget.exhausted == 'byte limit reached'
+    assert core._decode_qstring(0, budget) == ''
+
+def test_decode_qstring_checks_the_header(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    memory[0x100:0x118] = struct.pack('<iiI4xq', 1, 1 << 30, 0, 24)
+    assert core._decode_qstring(0x100, core.Budget()) == '<corrupted: unreadable data>'
+
+def test_qurl_shares_one_budget(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 60)
+    write_qstring(memory, 0x400, 'https')
+    write_qstring(memory, 0x500, 'example.org')
+    write_qstring(memory, 0x600, '/' + 'x' * 100)
+    # ref, port, scheme, userName, password, host, path, query, fragment,
+    # error, sections (scheme and host), flags
+    memory[0x100:0x14a] = struct.pack('<ii8QBB', 1, -1, 0x400, 0, 0, 0x500, 0x600,
+            0, 0, 0, 0x09, 0)
+    assert core.QUrlPrinter({'d': 0x100}).to_string() == \
+            'https://example.org/' + 'x' * 13 + '...<partial: byte limit reached>'
@@ -0,0 +1,80 @@
+import struct
+
+import pytest
+
+from qt5printers import commands, core
+
+class Type:
+    """A structure type as gdb.Type describes it."""
+
+    def __init__(self, name, sizeof, fields=()):
+        self.name = name
+        self.sizeof = sizeof
+        self._fields = fields
+
+    def strip_typedefs(self):
+        return self
+
+    def fields(self):
+        return self._fields
+
+    def __str__(self):
+        return self.name
+
+class Field:
+    def __init__(self, name, typ, bitpos, bitsize=0, is_base_class=False):
+        self.name = name
+        self.type = typ
+        self.bitpos = bitpos
+        self.bitsize = bitsize
+        self.is_base_class = is_base_class
+
+class StaticField:
+    name = 'staticMember'
+    is_base_class = False
+
+POINTER = Type('void *', 8)
+UINT = Type('uint', 4)
+
+# Qt 5.13+: next lives in an anonymous union of the base class
+CONNECTION_OR_SIGNAL_VECTOR = Type('QObjectPrivate::ConnectionOrSignalVector', 8, [
+    Field(None, Type('union {...}', 8, [
+        Field('nextInOrphanList', POINTER, 0),
+        Field('next', POINTER, 0),
+    ]), 0),
+])
+CONNECTION = Type('QObjectPrivate::Connection', 40, [
+    Field('QObjectPrivate::ConnectionOrSignalVector', CONNECTION_OR_SIGNAL_VECTOR, 0,
+        is_base_class=True),
+    StaticField(),
+    Field('sender', POINTER, 64),
+    Field('receiver', POINTER, 128),
+    Field('method_offset', Type('ushort', 2), 192),
+    Field('signal_index', UINT, 224, 27),
+    Field('connectionType', UINT, 251, 3),
+    Field('isSlotObject', UINT, 254, 1),
+])
+
+@pytest.fixture(autouse=True)
+def lp64(monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+
+def test_type_layout_finds_base_and_union_fields():
+    layout = commands.TypeLayout(CONNECTION, ('next', 'sender', 'signal_index',
+        'connectionType', 'isSlotObject', 'method_offset'))
+    assert layout.sizeof() == 40
+    bits = 7 | (2 << 27) | (1 << 30)
+    data = struct.pack('<QQQH2xI8x', 0x1000, 0x2000, 0x3000, 5, bits)
+    assert layout.unpack(data) == {'next': 0x1000, 'sender': 0x2000,
+            'signal_index': 7, 'connectionType': 2, 'isSlotObject': 1,
+            'method_offset': 5}
+
+def test_type_layout_unpacks_at_offset():
+    layout = commands.TypeLayout(CONNECTION, ('next', 'receiver'))
+    data = b'\xff' * 8 + struct.pack('<QQQ', 0x10, 0, 0x30) + b'\0' * 16
+    assert layout.unpack(data, 8) == {'next': 0x10, 'receiver': 0x30}
+
+def test_type_layout_names_missing_fields():
+    with pytest.raises(commands.gdb.GdbError) as error:
+        commands.TypeLayout(CONNECTION, ('next', 'prev', 'method_relative'))
+    assert 'prev, method_relative' in str(error.value)
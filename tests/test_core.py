@@ -0,0 +1,39 @@
+import struct
+
+from qt5printers import core
+
+LP64 = ('<', 8, 8)
+I386 = ('<', 4, 4)
+BIG32 = ('>', 4, 8)
+
+def test_struct_layout_qarraydata():
+    layout = core.qarraydata_layout
+    assert layout.sizeof(LP64) == 24
+    assert layout.offsetof('offset', LP64) == 16
+    assert layout.sizeof(I386) == 16
+    data = struct.pack('<iiI4xq', -1, 3, 0x80000004, 24)
+    assert layout.unpack(data, abi=LP64) == {'ref': -1, 'size': 3,
+            'alloc': 0x80000004, 'offset': 24}
+
+def test_struct_layout_padding_and_skipped_fields():
+    layout = core.QObjectPrinter._d_layout
+    # vtable, q_ptr, parent, children, flags, postedEvents, metaObject
+    assert layout.offsetof('q_ptr', LP64) == 8
+    assert layout.offsetof('metaObject', LP64) == 40
+    assert layout.sizeof(LP64) == 48
+    assert layout.offsetof('metaObject', I386) == 24
+    assert layout.sizeof(I386) == 28
+
+def test_struct_layout_int64_alignment():
+    layout = core.QDateTimePrinter._layout_5_7
+    # 64-bit integers are aligned to 4 bytes by the i386 System V ABI only
+    assert layout.offsetof('msecs', I386) == 4
+    assert layout.offsetof('msecs', BIG32) == 8
+    data = struct.pack('>i4xqiiI4x', 0x0a, 1234, -3600, 1, 0)
+    fields = layout.unpack(data, abi=BIG32)
+    assert (fields['status'], fields['msecs'], fields['offsetFromUtc']) == (0x0a, 1234, -3600)
+
+def test_struct_layout_read(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: LP64)
+    memory[0x100:0x118] = struct.pack('<iiI4xq', 1, 2, 8, 24)
+    assert core.qarraydata_layout.read(0x100)['size'] == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from qt5printers import commands, core
+
+@pytest.mark.parametrize('jd, date', [
+    (2440588, (1970, 1, 1)),
+    (2451545, (2000, 1, 1)),
+    (2451604, (2000, 2, 29)),
+    (2299161, (1582, 10, 15)),
+    (1721426, (1, 1, 1)),
+    (1721425, (0, 12, 31)),
+])
+def test_jd_to_date(jd, date):
+    assert core.jd_to_date(jd) == date
+
+def test_format_dates_and_times():
+    assert core._format_jd(2459000) == '2020-05-30'
+    assert core._format_time_ms(45296789) == '12:34:56.789'
+    assert core.jd_is_valid(0)
+    assert not core.jd_is_valid(784354017365)
+    assert core._ms_is_valid(86400000)
+    assert not core._ms_is_valid(-1)
+
+def test_range_summary_ordering():
+    summary = commands.RangeSummary()
+    summary.add([5, 6, 6], [True, True, True])
+    summary.add([0, 7], [False, True])
+    assert (summary.seen, summary.count) == (5, 4)
+    assert (summary.first, summary.last, summary.min, summary.max) == \
+            ((0, 5), (4, 7), (0, 5), (4, 7))
+    assert summary.ordering() == 'non-decreasing (1 repeats)'
+    summary.add([1], [True])
+    assert summary.ordering() == 'unordered (1 of 4 steps go down, the first at [5])'
+
+def test_format_temporal():
+    assert commands.format_temporal('QDate', [2440588, 0], [True, False]) == \
+            ['1970-01-01', '<invalid>']
+    assert commands.format_temporal('QTime', [45296789], [True]) == ['12:34:56.789']
+    texts = commands.format_temporal('QDateTime', [86401234, -1000, 0],
+            [True, True, False], [False, True, True])
+    assert texts == ['1970-01-02 00:00:01.234 (UTC)',
+            '1969-12-31 23:59:59.000 (Local)', '<invalid>']
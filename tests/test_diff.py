@@ -0,0 +1,74 @@
+import pytest
+
+from qt5printers import commands
+
+def snapshot(kind, entries):
+    result = commands.Snapshot('x', kind)
+    result.entries = entries
+    return result
+
+def test_diff_sequences_by_index():
+    old = snapshot('sequence', [1, 2, 3, 4])
+    new = snapshot('sequence', [1, 9, 3])
+    assert commands.diff_snapshots(old, new) == ([], [3], [1])
+    assert commands.diff_snapshots(new, old) == ([3], [], [1])
+
+def test_diff_maps_tell_repeated_keys_apart():
+    old = snapshot('map', {('k', 0): 1, ('k', 1): 2, ('j', 0): 3})
+    new = snapshot('map', {('k', 0): 1, ('k', 1): 5, ('k', 2): 6})
+    added, removed, changed = commands.diff_snapshots(old, new)
+    assert added == [('k', 2)]
+    assert removed == [('j', 0)]
+    assert changed == [('k', 1)]
+
+def test_diff_sets():
+    old = snapshot('set', {'a': 0, 'b': 0})
+    new = snapshot('set', {'b': 0, 'c': 0})
+    assert commands.diff_snapshots(old, new) == (['c'], ['a'], [])
+
+def test_diff_rejects_a_different_kind():
+    with pytest.raises(commands.gdb.GdbError):
+        commands.diff_snapshots(snapshot('map', {}), snapshot('set', {}))
+
+class Printer:
+    def __init__(self, hint):
+        self.hint = hint
+
+    def display_hint(self):
+        return self.hint
+
+    def children(self):
+        raise AssertionError('the children of printers collapse repeated elements')
+
+@pytest.fixture
+def container(monkeypatch):
+    """Makes take_snapshot see a container with the given hint and entries."""
+    budgets = []
+    def make(hint, items, failure=None):
+        def entries(pp, budget):
+            budgets.append(budget)
+            for item in items:
+                yield item
+            if failure:
+                budget.fail(failure)
+        monkeypatch.setattr(commands, '_parse_and_eval', lambda expression: None)
+        monkeypatch.setattr(commands, '_printer', lambda val: Printer(hint))
+        monkeypatch.setattr(commands, '_array_data', lambda pp: None)
+        monkeypatch.setattr(commands, 'entries', entries)
+        return budgets
+    return make
+
+def test_snapshot_reads_sequences_element_by_element(container):
+    budgets = container(None, enumerate([7, 7, 7, 8]))
+    result = commands.take_snapshot('x')
+    assert result.kind == 'sequence'
+    assert list(result.entries) == [commands._text_crc(7)] * 3 + [commands._text_crc(8)]
+    assert result.partial is None
+    assert isinstance(budgets[0], commands.CommandBudget)
+
+def test_snapshot_of_a_map_counts_repeated_keys(container):
+    container('map', [('k', 1), ('k', 2), ('j', 3)], 'tree ended early')
+    result = commands.take_snapshot('x')
+    assert sorted(result.entries) == [('j', 0), ('k', 0), ('k', 1)]
+    assert result.entries[('k', 1)] == commands._text_crc(2)
+    assert result.partial == 'tree ended early'
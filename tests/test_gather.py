@@ -0,0 +1,38 @@
+import struct
+
+from qt5printers import core
+
+def test_page_reader_merges_adjacent_pages(memory, no_limits):
+    reader = core.PageReader(core.Budget())
+    reader.prefetch([0x1000, 0x2000, 0x3ff0, 0x8000], 32)
+    assert memory.reads == [(0x1000, 0x4000), (0x8000, 0x1000)]
+    memory[0x3ffe:0x4002] = b'abcd'
+    assert reader.read(0x3ffe, 4) == b'\0\0\0\0'
+    assert reader.cached(0x9000, 4) is None
+
+def write_node(memory, address, left, right):
+    # QMapNodeBase: parent (and colour), left, right
+    memory[address:address + 24] = struct.pack('<QQQ', 0, left, right)
+
+def tree(memory):
+    """A header at 0x100 over the tree 0x300 <- 0x200 -> 0x400."""
+    write_node(memory, 0x100, 0x200, 0)
+    write_node(memory, 0x200, 0x300, 0x400)
+    write_node(memory, 0x300, 0, 0)
+    write_node(memory, 0x400, 0, 0)
+
+def test_qmap_walks_the_tree_in_order(memory, no_limits, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    tree(memory)
+    budget = core.Budget()
+    it = core.QMapPrinter.Iter(0x100, 3, None, budget)
+    assert list(it.inOrder()) == [0x300, 0x200, 0x400]
+    assert budget.exhausted is None
+
+def test_qmap_tree_shorter_than_its_size(memory, no_limits, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    tree(memory)
+    budget = core.Budget()
+    it = core.QMapPrinter.Iter(0x100, 5, None, budget)
+    assert list(it.inOrder()) == [0x300, 0x200, 0x400]
+    assert budget.exhausted == 'tree ended early'
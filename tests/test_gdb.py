@@ -0,0 +1,96 @@
+"""Tests that run the printers in gdb, on the program in qt/program.cpp
+
+They are skipped unless gdb, a C++ compiler and the Qt5Core development
+files (found with pkg-config) are installed.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM = os.path.join(ROOT, 'tests', 'qt', 'program.cpp')
+
+def _qt_flags():
+    try:
+        output = subprocess.check_output(['pkg-config', '--cflags', '--libs', 'Qt5Core'])
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().split()
+
+pytestmark = pytest.mark.skipif(
+        not shutil.which('gdb') or not shutil.which('g++') or _qt_flags() is None,
+        reason='needs gdb, g++ and Qt5Core')
+
+@pytest.fixture(scope='module')
+def program(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('qt5printers')
+    binary = str(directory / 'program')
+    subprocess.check_call(['g++', '-g', '-O0', '-fPIC', '-std=c++11', PROGRAM,
+        '-o', binary] + _qt_flags())
+    # gdb imports the printers as the qt5printers package
+    os.symlink(ROOT, str(directory / 'qt5printers'))
+    return (binary, str(directory))
+
+def run_gdb(program, *commands):
+    """Runs the program to stop() and returns the output of each command."""
+    binary, path = program
+    argv = ['gdb', '-batch', '-nx',
+        '-ex', 'python import sys; sys.path.insert(0, {!r})'.format(path),
+        '-ex', 'python import qt5printers; qt5printers.register_printers(None); '
+            'qt5printers.register_commands()',
+        '-ex', 'break stop', '-ex', 'run', '-ex', 'up']
+    for command in commands:
+        argv += ['-ex', 'echo @@@\\n', '-ex', command]
+    output = subprocess.check_output(argv, stderr=subprocess.STDOUT).decode()
+    return [part.strip() for part in output.split('@@@\n')[1:]]
+
+def value(output):
+    return re.sub(r'^\$\d+ = ', '', output)
+
+def test_print_values(program):
+    outputs = run_gdb(program, 'print string', 'print bytes', 'print vector',
+            'print list', 'print map', 'print hash', 'print date', 'print utc',
+            'print local')
+    string, bytes, vector, lst, qmap, qhash, date, utc, local = map(value, outputs)
+    assert 'hello' in string
+    assert 'abc' in bytes
+    assert vector.endswith('{0, 1, 2, 3, 4}')
+    assert '"a"' in lst and '"b"' in lst
+    assert '[1] = "one"' in qmap and '[2] = "two"' in qmap
+    assert '["x"] = 1' in qhash
+    assert date == '2020-05-30'
+    assert utc == '1970-01-02 00:00:01.000 (UTC)'
+    assert local == '2001-02-03 04:05:06.000 (Local)'
+
+def test_repeats_and_limits(program):
+    repeats, _, limited = run_gdb(program, 'print zeros', 'set print elements 3',
+            'print vector')
+    assert '<repeats 100 times>' in repeats
+    assert value(limited).endswith('{0, 1, 2...}')
+
+def test_commands(program):
+    stats, dates, sizeof = run_gdb(program, 'qt-stats vector', 'qt-dates -list dates',
+            'qt-sizeof vector')
+    assert '5 numbers' in stats
+    # the statistics are floats when numpy is installed
+    assert re.search(r'min 0(\.0)?, max 4(\.0)?', stats)
+    assert '[0] = 1970-01-02 00:00:01.000 (UTC)' in dates
+    assert '[1] = 2001-02-03 04:05:06.000 (Local)' in dates
+    assert 'on the heap' in sizeof
+
+def test_summary(program):
+    _, summary = run_gdb(program, 'set qt5printers summary always', 'print list')
+    assert value(summary) == 'QList<QString> (size=2)'
+
+def test_qobject_subclass(program):
+    timer, = run_gdb(program, 'print timer')
+    assert value(timer).startswith('QTimer')
+
+def test_grep(program):
+    found, stopped = run_gdb(program, 'qt-grep ^a list', 'qt-grep -max 1 . list')
+    assert found == '[0] = "a"'
+    assert stopped.endswith('(stopped after 1 matches)')
@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+from qt5printers import commands, core, settings
+
+class Type:
+    def __init__(self, name):
+        self.name = name
+        self.tag = name
+
+    def strip_typedefs(self):
+        return self
+
+    def unqualified(self):
+        return self
+
+QSTRING = Type('QString')
+SLOTS = 0x2000
+
+def write_qstring(memory, d, text):
+    data = text.encode('utf-16-le')
+    memory[d:d + 24 + len(data)] = struct.pack('<iiI4xq', -1, len(text), 0, 24) + data
+
+@pytest.fixture
+def strings(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(settings.command_bytes_limit, 'value', None)
+    ds = []
+    for n, text in enumerate(['apple', 'banana', 'cherry', 'apricot', 'avocado']):
+        ds.append(0x100 + n * 0x40)
+        write_qstring(memory, ds[-1], text)
+    # a null d-pointer and a size beyond the allocation
+    ds.append(0)
+    ds.append(0x400)
+    memory[0x400:0x418] = struct.pack('<iiI4xq', 1, 100, 10, 24)
+    memory[SLOTS:SLOTS + 8 * len(ds)] = struct.pack('<{:d}Q'.format(len(ds)), *ds)
+    return memory
+
+def test_string_slots_are_read_in_bulk(strings):
+    budget = commands.CommandBudget()
+    slots = list(commands._string_slots(SLOTS, 7, QSTRING, budget))
+    assert [(i, slot.address) for i, slot in slots] == [(i, SLOTS + i * 8) for i in range(7)]
+    del strings.reads[:]
+    texts = commands.StringDecoder(budget).decode([slot for i, slot in slots])
+    assert texts == ['apple', 'banana', 'cherry', 'apricot', 'avocado', None, None]
+    # one read for the nearby headers, one for the distant bad one, and one
+    # for all the payloads
+    assert len(strings.reads) == 3
+
+def test_string_slots_stay_within_the_budget(strings, monkeypatch):
+    monkeypatch.setattr(settings.command_bytes_limit, 'value', 20)
+    budget = commands.CommandBudget()
+    assert len(list(commands._string_slots(SLOTS, 7, QSTRING, budget))) == 2
+    assert budget.exhausted
+
+@pytest.mark.parametrize('max_hits, stopped', [(3, False), (2, True)])
+def test_grep_says_it_stopped_only_if_there_are_more_matches(strings, monkeypatch,
+        max_hits, stopped):
+    output = []
+    monkeypatch.setattr(commands.gdb, 'write', output.append)
+    monkeypatch.setattr(commands, '_parse_and_eval', lambda expression: None)
+    monkeypatch.setattr(commands, '_printer', lambda val: None)
+    monkeypatch.setattr(commands, 'entries', lambda pp, budget:
+            commands._string_slots(SLOTS, 7, QSTRING, budget))
+    monkeypatch.setattr(commands.StringSlot, 'value', lambda slot: hex(slot.d))
+    commands._QtGrep().invoke('-max {:d} ^a list'.format(max_hits), False)
+    matches = ['[0] = 0x100\n', '[3] = 0x1c0\n', '[4] = 0x200\n']
+    if stopped:
+        assert output == matches[:2] + ['(stopped after 2 matches)\n']
+    else:
+        assert output == matches
@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+from qt5printers import commands, core
+
+def test_range_reader(memory, no_limits):
+    memory[0x100:0x104] = b'abcd'
+    memory[0x180:0x184] = b'efgh'
+    memory[0x4000:0x4004] = b'ijkl'
+    budget = core.Budget()
+    reader = core.RangeReader(budget)
+    result = reader.read_ranges([(0x4000, 4), (0x100, 4), (len(memory), 4), (0x180, 4)])
+    assert result == [b'ijkl', b'abcd', None, b'efgh']
+    # the two close ranges are read together, the far one separately
+    assert (0x100, 0x84) in memory.reads
+    assert (0x4000, 4) in memory.reads
+
+def write_object(memory, address, d, children, owner=None):
+    """Writes a QObject, its QObjectData and its list of children."""
+    children_list = d + 0x40
+    memory[address:address + 16] = struct.pack('<QQ', 0x7000, d)
+    # QObjectData: vtable, q_ptr, parent, children
+    memory[d:d + 32] = struct.pack('<QQQQ', 0, owner or address, 0, children_list)
+    # QListData::Data: ref, alloc, begin, end, then the slots
+    memory[children_list:children_list + 16 + 8 * len(children)] = struct.pack(
+            '<iiii{:d}Q'.format(len(children)), 1, len(children), 0, len(children),
+            *children)
+
+@pytest.fixture
+def objects(memory, no_limits, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    # 0x100 has the children 0x200 and 0x300; 0x300 lists 0x100 again
+    write_object(memory, 0x100, 0x1000, [0x200, 0x300])
+    write_object(memory, 0x200, 0x2000, [])
+    write_object(memory, 0x300, 0x3000, [0x100])
+    return memory
+
+def test_object_walker_goes_level_by_level(objects):
+    walker = commands.ObjectWalker(core.Budget())
+    assert list(walker.walk([0x100])) == [(0x100, 0x7000, 0), (0x200, 0x7000, 1),
+            (0x300, 0x7000, 1)]
+    assert walker.corrupted == 0
+
+def test_object_walker_skips_objects_with_a_bad_q_ptr(objects):
+    write_object(objects, 0x300, 0x3000, [], owner=0x999)
+    walker = commands.ObjectWalker(core.Budget())
+    assert [address for address, vptr, depth in walker.walk([0x100])] == [0x100, 0x200]
+    assert walker.corrupted == 1
+
+def test_object_walker_limit(objects):
+    budget = core.Budget()
+    walker = commands.ObjectWalker(budget, limit=2)
+    assert len(list(walker.walk([0x100]))) == 2
+    assert budget.exhausted == 'object limit reached'
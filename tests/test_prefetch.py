@@ -0,0 +1,37 @@
+import pytest
+
+from qt5printers import core
+
+class Inferior:
+    def __init__(self, num, fill):
+        self.num = num
+        self.fill = fill
+
+    def read_memory(self, address, length):
+        return self.fill * length
+
+class Cache:
+    """A PageReader that has every page cached."""
+
+    def cached(self, address, length):
+        return b'c' * length
+
+@pytest.fixture
+def inferiors(monkeypatch):
+    result = {1: Inferior(1, b'1'), 2: Inferior(2, b'2')}
+    selected = [result[1]]
+    monkeypatch.setattr(core.gdb, 'selected_inferior', lambda: selected[0], raising=False)
+    monkeypatch.setattr(core, '_memory_cache', (1, Cache()))
+    return (result, selected)
+
+def test_cache_serves_the_inferior_that_stopped(inferiors):
+    assert core.read_memory(0x1000, 4) == b'cccc'
+
+def test_cache_ignores_other_inferiors(inferiors):
+    result, selected = inferiors
+    selected[0] = result[2]
+    assert core.read_memory(0x1000, 4) == b'2222'
+
+def test_cache_is_dropped_when_the_inferior_exits(inferiors):
+    core.prefetcher.on_resume(None)
+    assert core.read_memory(0x1000, 4) == b'1111'
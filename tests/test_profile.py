@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+from qt5printers import commands, core
+
+class Frame:
+    """A frame whose arguments are read with read_var, like gdb.Frame."""
+
+    def __init__(self, **variables):
+        self.variables = variables
+
+    def read_var(self, name):
+        if name not in self.variables:
+            raise ValueError('No symbol "{:}" in current context.'.format(name))
+        return self.variables[name]
+
+class ClassNames:
+    def name(self, address, vptr):
+        return 'MyModel'
+
+    def object_name(self, address):
+        return 'QLineEdit'
+
+    def meta_object(self, address, vptr):
+        return 0x500
+
+class MetaObject:
+    methods = [('dataChanged', None), ('reset', None)]
+
+@pytest.fixture
+def annotator(monkeypatch):
+    memory = bytearray(0x1000)
+    # a QEvent: vtable, d, then t = QEvent::KeyPress
+    memory[0x100:0x112] = struct.pack('<QQH', 0, 0, 6)
+    monkeypatch.setattr(core, 'read_memory',
+            lambda address, length: bytes(memory[address:address + length]))
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(core, 'meta_object', lambda address: MetaObject())
+    monkeypatch.setattr(core, 'signal_name',
+            lambda address, index: 'signal{:d}'.format(index))
+    monkeypatch.setattr(commands, '_read_vptr', lambda address: 0x700)
+    result = commands.FrameAnnotator.__new__(commands.FrameAnnotator)
+    result.classes = ClassNames()
+    result.event_names = {6: 'KeyPress'}
+    return result
+
+@pytest.mark.parametrize('name, variables', [
+    ('QCoreApplication::notify', {'receiver': 0x10, 'event': 0x100}),
+    ('QApplication::notify', {'receiver': 0x10, 'e': 0x100}),
+    ('QApplicationPrivate::notify_helper', {'receiver': 0x10, 'e': 0x100}),
+])
+def test_notify(annotator, name, variables):
+    assert annotator.annotate(Frame(**variables), name) == name + ' [QLineEdit KeyPress]'
+
+@pytest.mark.parametrize('variables, signal', [
+    # activate(QObject *, const QMetaObject *, int local_signal_index, void **)
+    ({'m': 0x500, 'local_signal_index': 1, 'signal_offset': 3}, 'reset'),
+    # activate(QObject *, int signal_offset, int local_signal_index, void **)
+    ({'signal_offset': 3, 'local_signal_index': 2}, 'signal5'),
+    # activate(QObject *, int signal_index, void **)
+    ({'signal_index': 4}, 'signal4'),
+])
+def test_activate(annotator, variables, signal):
+    frame = Frame(sender=0x10, **variables)
+    assert annotator.annotate(frame, 'QMetaObject::activate') == \
+            'QMetaObject::activate [MyModel::{:}]'.format(signal)
+
+def test_other_frames_are_left_alone(annotator):
+    assert annotator.annotate(Frame(), 'main') == 'main'
+    assert annotator.annotate(Frame(receiver=0x10), 'QApplication::notify') == \
+            'QApplication::notify'
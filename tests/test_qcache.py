@@ -0,0 +1,66 @@
+import struct
+
+import pytest
+
+from qt5printers import core
+
+class Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+class CacheType:
+    def strip_typedefs(self):
+        return self
+
+    def template_argument(self, i):
+        return ('key', 'value')[i]
+
+D = 0x100
+BUCKETS = 0x200
+# the value of a QHashNode (the QCache::Node) follows next, h and key
+VALUE_OFFSET = 24
+
+def cache_value(first):
+    node_type = Namespace(strip_typedefs=lambda: {'value': Namespace(bitpos=VALUE_OFFSET * 8)})
+    e = Namespace(type=Namespace(target=lambda: node_type))
+    return Namespace(type=CacheType(), hash={'d': D, 'e': e}, f=first)
+
+def write_hash_node(memory, address, next_node, cost, previous, following):
+    memory[address:address + 8] = struct.pack('<Q', next_node)
+    # QCache::Node: keyPtr, t, c, p, n
+    node = address + VALUE_OFFSET
+    memory[node:node + 40] = struct.pack('<QQi4xQQ', address + 0x80, address + 0x90,
+            cost, previous, following)
+
+@pytest.fixture
+def cache(memory, no_limits, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    # two buckets: one chain of two nodes and an empty bucket, which
+    # points at the QHashData (whose first field is null)
+    memory[BUCKETS:BUCKETS + 16] = struct.pack('<QQ', 0x300, D)
+    write_hash_node(memory, 0x300, 0x400, 1, 0x400 + VALUE_OFFSET, 0)
+    write_hash_node(memory, 0x400, D, 1, 0, 0x300 + VALUE_OFFSET)
+    return memory
+
+HEADER = {'size': 2, 'buckets': BUCKETS, 'numBuckets': 2}
+
+def test_qcache_walks_the_usage_list(cache):
+    budget = core.Budget()
+    it = core.QCachePrinter.Iter(cache_value(0x400 + VALUE_OFFSET), HEADER, budget)
+    it._gather()
+    assert [node['t'] for node in it.nodes] == [0x490, 0x390]
+    assert not it.show_cost
+    assert budget.exhausted is None
+
+def test_qcache_stops_at_nodes_outside_the_hash(cache):
+    # the most recently used node links to a node the hash does not have
+    write_hash_node(cache, 0x400, D, 3, 0, 0x800)
+    budget = core.Budget()
+    it = core.QCachePrinter.Iter(cache_value(0x400 + VALUE_OFFSET), HEADER, budget)
+    it._gather()
+    assert [node['t'] for node in it.nodes] == [0x490]
+    assert it.show_cost
+    assert budget.exhausted == 'list shorter than its size'
@@ -0,0 +1,154 @@
+import struct
+
+import pytest
+
+from qt5printers import core
+
+class Type:
+    """A class type as gdb.Type describes it."""
+
+    def __init__(self, name, bases=()):
+        self.name = name
+        self.tag = name
+        self.code = core.gdb.TYPE_CODE_STRUCT
+        self.bases = bases
+
+    def strip_typedefs(self):
+        return self
+
+    def unqualified(self):
+        return self
+
+    def pointer(self):
+        return ('pointer', self)
+
+    def fields(self):
+        return [BaseField(typ, offset) for typ, offset in self.bases]
+
+    def __str__(self):
+        return self.name
+
+class BaseField:
+    is_base_class = True
+
+    def __init__(self, typ, offset):
+        self.name = typ.name
+        self.type = typ
+        self.bitpos = offset * 8
+
+class Value:
+    """An object in inferior memory, with the casts gdb.Value makes."""
+
+    def __init__(self, typ, address, dynamic_type=None):
+        self.type = typ
+        self.address = address
+        self.dynamic_type = dynamic_type or typ
+
+    def cast(self, typ):
+        if isinstance(typ, tuple):
+            return ('cast', self.address, typ)
+        return Value(typ, self.address + _offset(self.type, typ), self.dynamic_type)
+
+    def __getitem__(self, name):
+        assert (self.type.name, name) == ('QObject', 'd_ptr')
+        return {'d': struct.unpack('<Q', core.read_memory(self.address + 8, 8))[0]}
+
+def _offset(typ, base):
+    if typ is base:
+        return 0
+    for field in typ.fields():
+        offset = _offset(field.type, base)
+        if offset is not None:
+            return field.bitpos // 8 + offset
+    return None
+
+QOBJECT = Type('QObject')
+INTERFACE = Type('Interface')
+WIDGET = Type('MyWidget', [(INTERFACE, 0), (QOBJECT, 8)])
+SPECIAL_WIDGET = Type('MySpecialWidget', [(WIDGET, 0)])
+
+OBJECT = 0x100
+D = 0x200
+META = 0x1000
+
+@pytest.fixture
+def inferior(memory, monkeypatch):
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(core.gdb, 'solib_name', lambda address: None, raising=False)
+    monkeypatch.setattr(core.gdb, 'Value', lambda address: Value(None, address))
+    monkeypatch.setattr(core.gdb.types, 'get_basic_type', lambda typ: typ)
+    monkeypatch.setattr(core.version, 'profile', lambda: Profile())
+    symbols = {'MyWidget::staticMetaObject': META}
+    monkeypatch.setattr(core.gdb, 'lookup_global_symbol',
+            lambda name: Symbol(symbols[name]) if name in symbols else None, raising=False)
+    core._forget_meta_objects()
+    # MyWidget at OBJECT: Interface's vtable, then the QObject subobject
+    # (its vtable and d_ptr)
+    memory[OBJECT + 16:OBJECT + 24] = struct.pack('<Q', D)
+    # QObjectData: vtable, q_ptr, parent, children, flags, postedEvents, metaObject
+    memory[D:D + 48] = struct.pack('<QQQQIiQ', 0, OBJECT + 8, 0x300, 0, 0, 0, 0)
+    _write_meta_object(memory)
+    yield memory
+    core._forget_meta_objects()
+
+class Profile:
+    def lookup_type(self, name):
+        return None
+
+class Symbol:
+    def __init__(self, address):
+        self.address = address
+
+    def value(self):
+        return self
+
+def _write_meta_object(memory):
+    data = META + 0x100
+    stringdata = META + 0x200
+    memory[META:META + 48] = struct.pack('<6Q', 0, stringdata, data, 0, 0, 0)
+    # revision, className, classInfo, methods at 14, properties at 24,
+    # enumerators, constructors, flags and one signal
+    memory[data:data + 56] = struct.pack('<14i', 7, 0, 0, 0, 2, 14, 1, 24, 0, 0, 0, 0, 0, 1)
+    # (name, argc, parameters, tag, flags): a signal, then a slot
+    memory[data + 56:data + 96] = struct.pack('<10i', 1, 0, 0, 3, 0x06, 2, 0, 0, 3, 0x0a)
+    # (name, type, flags)
+    memory[data + 96:data + 108] = struct.pack('<3i', 3, 2, 0)
+    text = META + 0x300
+    for i, name in enumerate([b'MyWidget', b'changed', b'update', b'value']):
+        entry = stringdata + i * 24
+        memory[entry:entry + 24] = struct.pack('<iiI4xq', -1, len(name), 0, text - entry)
+        memory[text:text + len(name)] = name
+        text += len(name) + 1
+
+def test_qobject_base_walks_base_classes():
+    assert core.qobject_base(QOBJECT) is QOBJECT
+    assert core.qobject_base(SPECIAL_WIDGET) is QOBJECT
+    assert core.qobject_base(INTERFACE) is None
+
+def test_lookup_matches_derived_classes(inferior):
+    printer = core.build_pretty_printer()
+    assert isinstance(printer.lookup(Value(WIDGET, OBJECT)), core.QObjectPrinter)
+    assert printer.lookup(Value(Type('Plain'), OBJECT)) is None
+    for subprinter in printer.subprinters:
+        if subprinter.name == 'QObject':
+            subprinter.enabled = False
+    assert printer.lookup(Value(WIDGET, OBJECT)) is None
+
+def test_derived_object_uses_its_qobject_subobject(inferior):
+    pp = core.QObjectPrinter(Value(WIDGET, OBJECT))
+    assert pp.val.address == OBJECT + 8
+    assert pp.to_string() == 'MyWidget'
+    assert pp.children() == [('parent', ('cast', 0x300, QOBJECT.pointer()))]
+
+def test_q_ptr_must_point_to_the_qobject_subobject(inferior):
+    inferior[D + 8:D + 16] = struct.pack('<Q', OBJECT)
+    assert core.QObjectPrinter(Value(WIDGET, OBJECT)).header() == (None, 'bad q_ptr')
+
+def test_meta_object(inferior):
+    meta = core.meta_object(META)
+    assert meta.class_name == 'MyWidget'
+    assert meta.methods == [('changed', 'signal'), ('update', 'slot')]
+    assert meta.properties == ['value']
+    assert core.signal_name(META, 0) == 'changed'
+    assert core.signal_name(META, 1) is None
+    assert core.method_name(META, 1) == 'update'
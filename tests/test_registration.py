@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+def modules_after(code):
+    """Runs code in a fresh interpreter and returns the qt5printers modules it imported."""
+    script = '\n'.join([
+        'import sys',
+        'sys.path.insert(0, {!r})'.format(TESTS),
+        # installs the stand-in gdb module and imports the package
+        'import conftest',
+        'import qt5printers',
+        code,
+        'print(" ".join(sorted(name for name in sys.modules if name.startswith("qt5printers."))))',
+    ])
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return output.decode().split()
+
+def test_registering_the_printers_leaves_the_commands_out():
+    modules = modules_after('qt5printers.register_printers(None)')
+    assert 'qt5printers.core' in modules
+    assert 'qt5printers.commands' not in modules
+    assert 'qt5printers.valuecache' not in modules
+
+def test_registering_the_commands():
+    modules = modules_after('qt5printers.register_commands()')
+    assert 'qt5printers.commands' in modules
+    assert 'qt5printers.valuecache' not in modules
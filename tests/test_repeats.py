@@ -0,0 +1,60 @@
+import struct
+
+from qt5printers import core, settings
+
+def test_repeat_detector(memory, no_limits):
+    values = [7] * 5 + [1, 2] + [3] * 40 + [4]
+    memory[0x200:0x200 + 4 * len(values)] = struct.pack('<{:d}i'.format(len(values)), *values)
+    detector = core.RepeatDetector(0x200, 4, len(values), core.Budget())
+    assert detector.run_length(0) == 5
+    assert detector.run_length(5) == 1
+    assert detector.run_length(7) == 40
+    assert detector.run_length(47) == 1
+
+def test_repeat_detector_across_chunks(memory, no_limits, monkeypatch):
+    monkeypatch.setattr(core.RepeatDetector, 'chunk_size', 16)
+    memory[0x400:0x400 + 4 * 50] = struct.pack('<50i', *([9] * 49 + [0]))
+    detector = core.RepeatDetector(0x400, 4, 50)
+    assert detector.run_length(0) == 49
+    assert detector.run_length(3) == 46
+
+def test_repeat_detector_unreadable(memory):
+    detector = core.RepeatDetector(len(memory) - 8, 4, 10)
+    assert detector.run_length(0) == 1
+
+class Type:
+    def __init__(self, code, sizeof=0, target=None):
+        self.code = code
+        self.sizeof = sizeof
+        self._target = target
+
+    def target(self):
+        return self._target
+
+class Pointer:
+    """A pointer to ints in inferior memory, as a gdb.Value."""
+
+    type = Type(core.gdb.TYPE_CODE_PTR, 8, Type(core.gdb.TYPE_CODE_INT, 4))
+
+    def __init__(self, address):
+        self.address = address
+
+    def __int__(self):
+        return self.address
+
+    def __getitem__(self, i):
+        return struct.unpack('<i', core.read_memory(self.address + 4 * i, 4))[0]
+
+def test_collapsed_runs_are_charged_once(memory, monkeypatch):
+    monkeypatch.setattr(core.gdb, 'parameter', lambda name: 10)
+    monkeypatch.setattr(settings.time_limit, 'value', None)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 1000)
+    values = [0] * 100 + [1, 2, 3]
+    memory[0x200:0x200 + 4 * len(values)] = struct.pack('<103i', *values)
+    budget = core.Budget()
+    it = core.ArrayIter(Pointer(0x200), len(values), budget)
+    children = list(core.BudgetIter(it, budget, 0 if it.detector else 4))
+    assert children == [('[0]', '0 <repeats 100 times>'), ('[100]', 1), ('[101]', 2),
+            ('[102]', 3)]
+    # the array was read (and charged) once, in one chunk
+    assert budget.bytes_left == 1000 - 4 * len(values)
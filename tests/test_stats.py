@@ -0,0 +1,74 @@
+import math
+import struct
+
+import pytest
+
+from qt5printers import commands, core, settings
+
+def test_statistics_in_chunks():
+    values = [3.0, 1.0, float('nan'), 4.0, 1.0, float('inf'), 5.0, 9.0, 2.0, 6.0]
+    stats = commands.Statistics()
+    stats.add(values[:4])
+    stats.add(values[4:])
+    finite = [v for v in values if not math.isnan(v) and not math.isinf(v)]
+    mean = sum(finite) / len(finite)
+    assert (stats.count, stats.nans, stats.infs) == (len(finite), 1, 1)
+    assert (stats.min, stats.max) == (1.0, 9.0)
+    assert stats.mean == pytest.approx(mean)
+    assert stats.stddev() == pytest.approx(
+            math.sqrt(sum((v - mean) ** 2 for v in finite) / len(finite)))
+
+def test_histogram():
+    histogram = commands.Histogram(0, 10, 5)
+    histogram.add([0, 1, 2, 5, 9.9, 10, float('nan')])
+    assert histogram.counts == [2, 1, 1, 0, 2]
+
+def test_command_budget_has_its_own_limit(monkeypatch):
+    monkeypatch.setattr(settings.time_limit, 'value', 1)
+    monkeypatch.setattr(settings.bytes_limit, 'value', 10)
+    monkeypatch.setattr(settings.command_bytes_limit, 'value', None)
+    budget = commands.CommandBudget()
+    assert budget.charge(1 << 30)
+    monkeypatch.setattr(settings.command_bytes_limit, 'value', 100)
+    budget = commands.CommandBudget()
+    assert not budget.charge(101)
+    assert budget.exhausted == 'qt5printers command-bytes-limit reached'
+
+class Type:
+    def __init__(self, sizeof):
+        self.sizeof = sizeof
+
+@pytest.fixture(params=['numpy', 'struct'])
+def decoding(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(commands, '_numpy', lambda: None)
+    monkeypatch.setattr(core, 'target_abi', lambda: ('<', 8, 8))
+    monkeypatch.setattr(settings.command_bytes_limit, 'value', None)
+
+def values(numbers):
+    budget = commands.CommandBudget()
+    result = []
+    for data, stride in numbers.chunks(budget):
+        result.extend(numbers.decode(data, stride))
+    return [float(value) for value in result]
+
+def test_numeric_array_in_chunks(memory, decoding, monkeypatch):
+    monkeypatch.setattr(commands.NumericArray, 'chunk_size', 16)
+    memory[0x100:0x128] = struct.pack('<5d', 1.5, -2, 3, 4, 5)
+    assert values(commands.NumericArray(0x100, 5, Type(8), code='d')) == [1.5, -2, 3, 4, 5]
+
+def test_numeric_array_in_list_slots(memory, decoding):
+    # ints stored in pointer-sized QList slots
+    memory[0x100:0x118] = struct.pack('<i4xi4xi4x', 7, -8, 9)
+    numbers = commands.NumericArray(0x100, 3, Type(4), stride=8, code='i')
+    assert values(numbers) == [7, -8, 9]
+
+def test_numeric_array_in_list_nodes(memory, decoding):
+    # doubles in nodes that the QList slots point to
+    memory[0x100:0x110] = struct.pack('<QQ', 0x300, 0x200)
+    memory[0x200:0x208] = struct.pack('<d', 2.5)
+    memory[0x300:0x308] = struct.pack('<d', 0.5)
+    numbers = commands.NumericArray(0x100, 2, Type(8), indirect=True, code='d')
+    assert values(numbers) == [0.5, 2.5]
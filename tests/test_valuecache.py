@@ -0,0 +1,92 @@
+import pytest
+
+from qt5printers import settings, valuecache
+
+pytestmark = pytest.mark.skipif(valuecache.sqlite3 is None, reason='needs sqlite3')
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(valuecache, '_flush_on_prompt', False)
+    monkeypatch.setattr(settings.value_cache_size, 'value', None)
+    return valuecache.ValueCache(str(tmp_path / 'values.sqlite'), 'core:1')
+
+def test_store_and_lookup(cache):
+    cache.store('QString', 0x1000, {'s': 'hello'})
+    assert cache.lookup('QString', 0x1000) == {'s': 'hello'}
+    assert cache.lookup('QString', 0x2000) is None
+    assert cache.lookup('QByteArray', 0x1000) is None
+
+def test_entries_are_kept_per_core(cache, tmp_path):
+    cache.store('QString', 0x1000, {'s': 'hello'})
+    other = valuecache.ValueCache(str(tmp_path / 'values.sqlite'), 'core:2')
+    assert other.lookup('QString', 0x1000) is None
+    assert other.size == cache.size
+
+def test_eviction_drops_least_recently_used(cache, monkeypatch):
+    entry = {'s': 'x' * 90}
+    for address in range(4):
+        cache.store('QString', address, entry)
+    # using the oldest entry makes the second oldest the first to go
+    assert cache.lookup('QString', 0) is not None
+    monkeypatch.setattr(settings.value_cache_size, 'value', 4 * 100)
+    cache.store('QString', 4, entry)
+    assert cache.size <= 300
+    assert cache.lookup('QString', 1) is None
+    assert cache.lookup('QString', 2) is None
+    assert cache.lookup('QString', 0) is not None
+    assert cache.lookup('QString', 4) is not None
+
+def test_recording_printer_stores_children_cut_short(cache):
+    class Printer:
+        def to_string(self):
+            return 'QList'
+        def children(self):
+            for i in range(10):
+                yield ('[{:d}]'.format(i), str(i))
+
+    pp = valuecache.RecordingPrinter(cache, 'QList<int>', 0x1000, Printer())
+    assert pp.to_string() == 'QList'
+    children = pp.children()
+    assert [next(children) for i in range(3)] == [('[0]', '0'), ('[1]', '1'), ('[2]', '2')]
+    children.close()
+    entry = cache.lookup('QList<int>', 0x1000)
+    assert entry['c'] == [['[0]', '0'], ['[1]', '1'], ['[2]', '2']]
+    assert entry['t']
+
+def test_recording_printer_skips_partial_output(cache):
+    class Printer:
+        def to_string(self):
+            return 'text...<partial: byte limit reached>'
+
+    pp = valuecache.RecordingPrinter(cache, 'QString', 0x1000, Printer())
+    pp.to_string()
+    assert cache.lookup('QString', 0x1000) is None
+
+class Type:
+    def unqualified(self):
+        return self
+
+    def __str__(self):
+        return 'QString'
+
+class Value:
+    type = Type()
+    address = 0x1000
+
+class Printer:
+    def to_string(self):
+        return 'hello'
+
+def test_wrap_serves_what_was_recorded(cache, monkeypatch):
+    monkeypatch.setattr(valuecache, 'current', lambda: cache)
+    monkeypatch.setattr(valuecache.gdb, 'parameter', lambda name: 200)
+    monkeypatch.setattr(settings.summary, 'value', 'off')
+    pp = valuecache.wrap(Value(), Printer())
+    assert isinstance(pp, valuecache.RecordingPrinter)
+    assert pp.to_string() == 'hello'
+    pp = valuecache.wrap(Value(), Printer())
+    assert isinstance(pp, valuecache.CachedPrinter)
+    assert pp.to_string() == 'hello'
+    # what the printers print depends on the settings, so they are in the key
+    monkeypatch.setattr(settings.summary, 'value', 'always')
+    assert isinstance(valuecache.wrap(Value(), Printer()), valuecache.RecordingPrinter)
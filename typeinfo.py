@@ -40,6 +40,9 @@
 #############################################################################
 
 import gdb.printing
+import json
+import os
+import os.path
 
 """Qt5 Type Information
 
@@ -48,6 +51,9 @@ module contains useful type information about standard and Qt types (such as
 whether a type is movable) that is necessary for the operation of the printers.
 This information allows the QList printer, for example, to determine how the
 elements are stored in the list.
+
+Types that are not listed here are looked up in the QTypeInfo<T>
+specializations in the debug info instead (see lookup_type_info()).
 """
 
 primitive_types = set([
@@ -219,6 +225,104 @@ def type_is_known_static(typ):
     else:
         return typ.name in static_types
 
+type_info_flags = ('isStatic', 'isComplex', 'isLarge')
+"""The QTypeInfo flags returned by lookup_type_info()."""
+
+_type_info_memo = {}
+_build_ids = {}
+
+def current_build_id():
+    """Return the build-id of the main program, or None if it has none."""
+    filename = gdb.current_progspace().filename
+    if not filename:
+        return None
+    if filename not in _build_ids:
+        try:
+            _build_ids[filename] = gdb.lookup_objfile(filename).build_id
+        except (ValueError, AttributeError):
+            _build_ids[filename] = None
+    return _build_ids[filename]
+
+def _cache_path(build_id):
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_dir, 'qt5printers', 'typeinfo-' + build_id + '.json')
+
+def _load_cache(build_id):
+    try:
+        with open(_cache_path(build_id)) as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except (IOError, OSError, ValueError):
+        pass
+    return {}
+
+def _save_cache(build_id, cache):
+    path = _cache_path(build_id)
+    try:
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError:
+            # probably exists already
+            pass
+        tmp_path = '{:}.{:d}'.format(path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # the cache is only an optimization
+        pass
+
+def _probe_type_info(typename):
+    flags = {}
+    for flag in type_info_flags:
+        try:
+            value = gdb.parse_and_eval('QTypeInfo<{:}>::{:}'.format(typename, flag))
+        except gdb.error:
+            return None
+        flags[flag] = bool(int(value))
+    return flags
+
+def lookup_type_info(typ):
+    """Returns the QTypeInfo flags of the given gdb type from the debug info.
+
+    The result is a dict mapping the names in type_info_flags to booleans,
+    or None if the program's debug info has no QTypeInfo for the type.
+
+    Results are remembered, and saved to a cache file (keyed by the build-id
+    of the program) so that later sessions on the same binary do not have to
+    probe the debug info again.
+    """
+    typename = typ.strip_typedefs().name
+    if not typename:
+        return None
+    build_id = current_build_id()
+    cache = _type_info_memo.get(build_id)
+    if cache is None:
+        cache = _load_cache(build_id) if build_id else {}
+        _type_info_memo[build_id] = cache
+    if typename not in cache:
+        cache[typename] = _probe_type_info(typename)
+        if build_id:
+            _save_cache(build_id, cache)
+    return cache[typename]
+
+def _on_clear_objfiles(event):
+    _build_ids.clear()
+
+_events_connected = False
+
+def connect_events():
+    """Forget the cached build-ids when objfiles go away.
+
+    Called when the printers are registered; later calls do nothing.
+    """
+    global _events_connected
+    if _events_connected:
+        return
+    gdb.events.clear_objfiles.connect(_on_clear_objfiles)
+    _events_connected = True
+
 meta_type_unknown = 0
 """The unknown/invalid meta type ID."""
 meta_type_user = 1024
@@ -0,0 +1,348 @@
+#############################################################################
+##
+## Copyright (C) 2026 The qt5printers contributors
+##
+## This file is part of the GDB pretty printers for the Qt Toolkit.
+##
+## It is new code, not taken from the Qt Project, and may be used under the
+## same terms as the rest of this package: the GNU Lesser General Public
+## License version 2.1 (http://www.gnu.org/licenses/old-licenses/lgpl-2.1.html)
+## or the GNU General Public License version 3.0
+## (http://www.gnu.org/copyleft/gpl.html).
+##
+#############################################################################
+
+
+import gdb
+import json
+import os
+import os.path
+import re
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+from . import settings, typeinfo
+
+"""Persistent cache of printed Qt values
+
+The memory of a core file never changes, so what the printers print for a
+value in a core file can be kept across debugging sessions. When the
+"qt5printers value-cache" setting is on, the output of the printers for
+values in a core file is stored in an sqlite database under
+$XDG_CACHE_HOME/qt5printers, keyed by the identity of the core file and the
+build-id of the program, and the next time the same value is printed it
+is taken from there. The settings that change what is printed (the
+"summary" and "native-arrays" settings, "print elements" and "print
+repeats") are part of the key, so changing one of them prints afresh.
+
+Children are stored by address and type wherever possible, so that nested
+values are looked up in the cache separately. When gdb stops asking for
+children at the "print elements" limit, the children it was given are
+stored along with a mark that there were more. Output that a printer cut
+short itself (for example because a budget ran out) is never stored.
+"""
+
+class ValueCache:
+    """The cache of printed values for one core file."""
+
+    def __init__(self, path, core):
+        self.core = core
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS value_cache ('
+                'core TEXT, type TEXT, address INTEGER, data TEXT, used INTEGER, '
+                'PRIMARY KEY (core, type, address))')
+        self.db.execute('CREATE INDEX IF NOT EXISTS value_cache_used '
+                'ON value_cache (used)')
+        row = self.db.execute('SELECT COALESCE(SUM(LENGTH(data)), 0), '
+                'COALESCE(MAX(used), 0) FROM value_cache').fetchone()
+        self.size, self.clock = row
+        self.dirty = False
+
+    def lookup(self, key, address):
+        """Returns the stored entry for a value, or None.
+
+        key names the value's type and the settings it was printed with.
+        """
+        row = self.db.execute('SELECT data FROM value_cache '
+                'WHERE core = ? AND type = ? AND address = ?',
+                (self.core, key, address)).fetchone()
+        if row is None:
+            return None
+        self.clock += 1
+        self.db.execute('UPDATE value_cache SET used = ? '
+                'WHERE core = ? AND type = ? AND address = ?',
+                (self.clock, self.core, key, address))
+        self.dirty = True
+        return json.loads(row[0])
+
+    def store(self, key, address, entry):
+        data = json.dumps(entry, separators=(',', ':'))
+        self.clock += 1
+        self.db.execute('INSERT OR REPLACE INTO value_cache VALUES (?, ?, ?, ?, ?)',
+                (self.core, key, address, data, self.clock))
+        self.size += len(data)
+        self.dirty = True
+        if not _flush_on_prompt:
+            self.flush()
+        limit = settings.value_cache_size.value
+        if limit is not None and self.size > limit:
+            self.evict(limit * 3 // 4)
+
+    def evict(self, target):
+        """Drops the least recently used entries (of any core) until target bytes remain."""
+        # replaced entries make self.size an overestimate
+        self.size = self.db.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) '
+                'FROM value_cache').fetchone()[0]
+        rows = self.db.execute('SELECT rowid, LENGTH(data) FROM value_cache '
+                'ORDER BY used')
+        dropped = []
+        for rowid, length in rows:
+            if self.size <= target:
+                break
+            self.size -= length
+            dropped.append((rowid,))
+        self.db.executemany('DELETE FROM value_cache WHERE rowid = ?', dropped)
+
+    def flush(self):
+        if self.dirty:
+            self.db.commit()
+            self.dirty = False
+
+def _cache_path():
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_dir, 'qt5printers', 'values.sqlite')
+
+def _core_filename():
+    corefile = getattr(gdb.selected_inferior(), 'corefile', None)
+    if corefile is not None:
+        return corefile.filename
+    try:
+        info = gdb.execute('info target', to_string=True)
+    except gdb.error:
+        return None
+    match = re.search(r"Local core dump file:\s*`([^']+)'", info)
+    return match.group(1) if match else None
+
+def _core_identity():
+    """Returns a string identifying the core file being debugged, or None."""
+    filename = _core_filename()
+    if filename is None:
+        return None
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return '{:}:{:d}:{:d}:{:}'.format(os.path.realpath(filename), st.st_size,
+            int(st.st_mtime), typeinfo.current_build_id() or '')
+
+def _print_parameter(name):
+    try:
+        return gdb.parameter(name)
+    except RuntimeError:
+        return None
+
+def _output_settings():
+    """Returns a string naming the settings that change what the printers print."""
+    return 'summary={:},native-arrays={:d},elements={:},repeats={:}'.format(
+            settings.summary.value, bool(settings.native_arrays.value),
+            _print_parameter('print elements'), _print_parameter('print repeats'))
+
+_caches = {}
+_identity = []
+
+def current():
+    """Returns the ValueCache for the core file being debugged, or None.
+
+    None is returned unless the "qt5printers value-cache" setting is on and
+    the program being debugged is a core file.
+    """
+    if not settings.value_cache.value or sqlite3 is None:
+        return None
+    # looking up the core file takes a gdb command, so do it once per prompt
+    if not _identity:
+        _identity.append(_core_identity())
+    core = _identity[0]
+    if core is None:
+        return None
+    if core not in _caches:
+        path = _cache_path()
+        try:
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # probably exists already
+                pass
+            _caches[core] = ValueCache(path, core)
+        except sqlite3.Error:
+            _caches[core] = None
+    return _caches[core]
+
+def _reset():
+    del _identity[:]
+
+def _on_before_prompt():
+    _reset()
+    for cache in _caches.values():
+        if cache is not None:
+            try:
+                cache.flush()
+            except sqlite3.Error:
+                # the cache is only an optimization
+                pass
+
+_types = {}
+
+def _lookup_type(name):
+    if name not in _types:
+        try:
+            _types[name] = gdb.lookup_type(name)
+        except gdb.error:
+            _types[name] = None
+    return _types[name]
+
+def _is_partial(text):
+    return '<partial: ' in text
+
+def _encode_child(name, child):
+    """Returns a child as stored in the cache, or None if it cannot be."""
+    if isinstance(child, gdb.Value):
+        if child.address is not None:
+            return [name, int(child.address), str(child.type.unqualified())]
+        text = str(child)
+    else:
+        text = str(child)
+    if _is_partial(text):
+        return None
+    return [name, text]
+
+def _decode_child(child):
+    if len(child) == 2:
+        return (child[0], child[1])
+    name, address, typename = child
+    typ = _lookup_type(typename)
+    if typ is None:
+        return None
+    return (name, gdb.Value(address).cast(typ.pointer()).dereference())
+
+class CachedPrinter:
+    """Prints a value from its cache entry."""
+
+    def __init__(self, entry, children):
+        self.entry = entry
+        if children is not None:
+            self.cached_children = children
+            self.children = self._children
+        if entry.get('h') is not None:
+            self.display_hint = self._display_hint
+
+    def to_string(self):
+        return self.entry.get('s')
+
+    def _children(self):
+        return iter(self.cached_children)
+
+    def _display_hint(self):
+        return self.entry['h']
+
+class RecordingPrinter:
+    """Wraps a printer, storing what it prints in a ValueCache.
+
+    Values with children are stored once gdb stops iterating their children,
+    with a 't' mark if it stopped before the last one; others are stored
+    once they have been converted to a string.
+    """
+
+    def __init__(self, cache, key, address, pp):
+        self.cache = cache
+        self.key = key
+        self.address = address
+        self.pp = pp
+        self.entry = {}
+        self.cacheable = True
+        if hasattr(pp, 'children'):
+            self.children = self._children
+        if hasattr(pp, 'display_hint'):
+            self.display_hint = pp.display_hint
+            self.entry['h'] = pp.display_hint()
+
+    def to_string(self):
+        result = self.pp.to_string() if hasattr(self.pp, 'to_string') else None
+        if result is not None:
+            if isinstance(result, gdb.Value) or _is_partial(str(result)):
+                self.cacheable = False
+            else:
+                result = str(result)
+        self.entry['s'] = result
+        if not hasattr(self, 'children'):
+            self.store()
+        return result
+
+    def _children(self):
+        children = []
+        try:
+            for name, child in self.pp.children():
+                if self.cacheable:
+                    encoded = _encode_child(name, child)
+                    if encoded is None or name == '...':
+                        self.cacheable = False
+                    else:
+                        children.append(encoded)
+                yield (name, child)
+        except GeneratorExit:
+            # gdb reached "print elements" and dropped the iterator
+            self.entry['c'] = children
+            self.entry['t'] = True
+            self.store()
+            raise
+        self.entry['c'] = children
+        self.store()
+
+    def store(self):
+        if not self.cacheable:
+            return
+        self.cacheable = False
+        try:
+            self.cache.store(self.key, self.address, self.entry)
+        except sqlite3.Error:
+            pass
+
+def wrap(val, pp):
+    """Returns a printer for val that goes through the value cache.
+
+    pp is the printer that would otherwise be used; it is returned as is if
+    the value cannot be cached.
+    """
+    cache = current()
+    if cache is None or val.address is None:
+        return pp
+    key = '{:} {:}'.format(str(val.type.unqualified()), _output_settings())
+    address = int(val.address)
+    try:
+        entry = cache.lookup(key, address)
+    except sqlite3.Error:
+        return pp
+    if entry is not None:
+        children = None
+        if 'c' in entry:
+            children = [_decode_child(child) for child in entry['c']]
+        if None not in (children or []):
+            return CachedPrinter(entry, children)
+    return RecordingPrinter(cache, key, address, pp)
+
+_flush_on_prompt = hasattr(gdb.events, 'before_prompt')
+
+_events_connected = False
+
+def connect_events():
+    """Flush the cache before each prompt and drop it when objfiles go away.
+
+    Called when the printers are registered; later calls do nothing.
+    """
+    global _events_connected
+    if _events_connected:
+        return
+    if _flush_on_prompt:
+        gdb.events.before_prompt.connect(_on_before_prompt)
+    gdb.events.clear_objfiles.connect(lambda event: _reset())
+    _events_connected = True
@@ -0,0 +1,175 @@
+#############################################################################
+##
+## Copyright (C) 2026 The qt5printers contributors
+##
+## This file is part of the GDB pretty printers for the Qt Toolkit.
+##
+## It is new code, not taken from the Qt Project, and may be used under the
+## same terms as the rest of this package: the GNU Lesser General Public
+## License version 2.1 (http://www.gnu.org/licenses/old-licenses/lgpl-2.1.html)
+## or the GNU General Public License version 3.0
+## (http://www.gnu.org/copyleft/gpl.html).
+##
+#############################################################################
+
+
+import gdb
+import os.path
+import re
+
+"""Qt5 version detection
+
+Some of the printers read private Qt structures whose layout depends on
+the exact Qt version. Rather than probing types on every print, this
+module detects the Qt5Core version once per inferior and caches a
+Profile describing it, which printers can use to pick a fast path.
+"""
+
+_objfile_version_re = re.compile(r'Qt5Core\.so\.(\d+)\.(\d+)\.(\d+)')
+_version_str_re = re.compile(r'^(\d+)\.(\d+)\.(\d+)')
+
+class Profile:
+    """Capabilities of the Qt5Core library loaded into an inferior."""
+
+    def __init__(self, version, source, objfile):
+        self.version = version
+        """The Qt version as a (major, minor, patch) tuple, or None."""
+        self.source = source
+        """How the version was determined (for diagnostics)."""
+        self.objfile = objfile
+        """The filename of the Qt5Core objfile, or None if not found."""
+        self.can_call_functions = True
+        """Whether calling functions in the inferior may work.
+
+        Cleared by the first printer whose call fails (eg: in a core file).
+        """
+        self._types = {}
+        self._memo = {}
+
+    def at_least(self, major, minor, patch=0):
+        """Return whether the Qt version is known to be at least the given one."""
+        return self.version is not None and self.version >= (major, minor, patch)
+
+    def lookup_type(self, name):
+        """Return the named gdb type, or None if there is no debug info for it.
+
+        Lookups are cached, including failed ones.
+        """
+        if name not in self._types:
+            try:
+                self._types[name] = gdb.lookup_type(name)
+            except gdb.error:
+                self._types[name] = None
+        return self._types[name]
+
+    def has_type(self, name):
+        """Return whether debug info for the named type is available."""
+        return self.lookup_type(name) is not None
+
+    def memo(self, key, compute):
+        """Return a cached per-profile value, computing it on first use.
+
+        compute is called with the profile as its only argument.
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = compute(self)
+            self._memo[key] = value
+            return value
+
+    def __str__(self):
+        if self.version is None:
+            version = 'unknown'
+        else:
+            version = '{:d}.{:d}.{:d}'.format(*self.version)
+        return 'Qt {:} (from {:})'.format(version, self.source)
+
+def _find_qtcore_objfile():
+    for objfile in gdb.objfiles():
+        name = objfile.filename or ''
+        if 'Qt5Core' in os.path.basename(name):
+            return name
+    return None
+
+def _version_from_objfile(filename):
+    # the loaded name is usually the libQt5Core.so.5 soname link, but the
+    # file it points to carries the full version
+    for name in (filename, os.path.realpath(filename)):
+        match = _objfile_version_re.search(os.path.basename(name))
+        if match:
+            return tuple(int(x) for x in match.groups())
+    return None
+
+def _version_from_memory():
+    # qVersion() returns QT_VERSION_STR; this needs a live process
+    try:
+        version_str = gdb.parse_and_eval(
+                '((const char *(*)(void))qVersion)()').string()
+    except (gdb.error, RuntimeError):
+        return None
+    match = _version_str_re.match(version_str)
+    if match:
+        return tuple(int(x) for x in match.groups())
+    return None
+
+def _version_from_symbols(profile):
+    # only a lower bound, but good enough to choose between layouts
+    if profile.has_type('QDateTime::ShortData'):
+        return (5, 7, 0)
+    if profile.has_type('QTimeZone'):
+        return (5, 2, 0)
+    if profile.has_type('QArrayData'):
+        return (5, 0, 0)
+    return None
+
+def detect():
+    """Detect the Qt5Core version of the selected inferior.
+
+    The objfile name is tried first, then QT_VERSION_STR (via qVersion())
+    and finally the types present in the debug info.
+    """
+    objfile = _find_qtcore_objfile()
+    if objfile:
+        version = _version_from_objfile(objfile)
+        if version:
+            return Profile(version, 'objfile', objfile)
+    version = _version_from_memory()
+    if version:
+        return Profile(version, 'qVersion', objfile)
+    profile = Profile(None, 'debug info', objfile)
+    profile.version = _version_from_symbols(profile)
+    return profile
+
+_profiles = {}
+
+def profile():
+    """Return the cached Profile of the selected inferior."""
+    num = gdb.selected_inferior().num
+    result = _profiles.get(num)
+    if result is None:
+        result = detect()
+        _profiles[num] = result
+    return result
+
+def reset(event=None):
+    """Forget all cached profiles, forcing detection to run again."""
+    _profiles.clear()
+
+def _on_new_objfile(event):
+    if 'Qt5Core' in os.path.basename(event.new_objfile.filename or ''):
+        reset()
+
+_events_connected = False
+
+def connect_events():
+    """Forget the cached profiles when Qt5Core is loaded or objfiles go away.
+
+    Called when the printers are registered; later calls do nothing.
+    """
+    global _events_connected
+    if _events_connected:
+        return
+    gdb.events.new_objfile.connect(_on_new_objfile)
+    gdb.events.clear_objfiles.connect(reset)
+    _events_connected = True